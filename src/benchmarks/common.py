@@ -0,0 +1,91 @@
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Sequence
+
+
+def percentiles(values: Sequence[int],
+                points: Sequence[float] = (50, 90, 99, 99.9)) -> dict:
+    """
+    Summarizes some nanosecond latencies in milliseconds, using the nearest
+    rank method.
+
+    :param values: The latencies, in nanoseconds.
+    :param points: The percentiles to report.
+    :return: A dict like {"count": 100, "p50": 1.2, ..., "max": 3.4}, with
+     None in place of the numbers if there were no values.
+    """
+    ordered = sorted(values)
+    summary: dict[str, Any] = {"count": len(ordered)}
+    for point in points:
+        key = f"p{point:g}"
+        if not ordered:
+            summary[key] = None
+            continue
+        rank = min(max(int(len(ordered) * point / 100 + 0.5), 1),
+                   len(ordered))
+        summary[key] = ordered[rank - 1] / 1_000_000
+    summary["max"] = ordered[-1] / 1_000_000 if ordered else None
+    return summary
+
+
+def peak_rss_kib() -> int:
+    """
+    Returns the peak resident set size of this process so far.
+
+    :return: An int, in KiB, or -1 if it can't be found on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return -1
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def git_commit() -> str:
+    """
+    Returns the commit the source tree is at, so results can be compared
+    across commits.
+
+    :return: A str, which is empty if it can't be found.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              cwd=Path(__file__).parent, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment() -> dict:
+    """
+    Describes where a benchmark was run.
+
+    :return: A dict.
+    """
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine()
+    }
+
+
+def write_results(results: dict, path: str):
+    """
+    Writes some results as JSON.
+
+    :param results: A dict that can be serialized to JSON.
+    :param path: A path to write to, or "-" for stdout.
+    """
+    text = json.dumps(results, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        Path(path).write_text(text + "\n")
@@ -0,0 +1,142 @@
+"""
+Micro-benchmark of NewlineTranslator against the chained bytes.replace()
+calls the read and write paths used to make on every chunk.
+
+Run from the src directory, for example:
+
+    python -m benchmarks.newline_translation --size 16777216 \\
+        --chunk-size 64 4096 65536 --output results.json
+
+For each line ending and chunk size this reports the MB/s of both ways, and
+whether they lose any carriage returns the translator keeps.
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+from utils.logger import move_logs_to_stderr
+
+# The results go to stdout
+move_logs_to_stderr()
+
+from benchmarks.common import environment, write_results
+from utils.newline import NewlineTranslator
+from utils.serial_config import NEWLINE_LF, NEWLINE_CR, NEWLINE_CRLF, \
+    LINE_ENDINGS
+
+
+def replace_translate(mode: int, data: bytes) -> bytes:
+    """
+    How newlines were translated before NewlineTranslator.
+
+    :param mode: An int, use the NEWLINE_* constants in utils/serial_config
+    :param data: The chunk.
+    :return: The translated chunk.
+    """
+    if mode == NEWLINE_CR:
+        data = data.replace(b"\r", b"\n")
+    elif mode == NEWLINE_LF:
+        pass
+    elif mode == NEWLINE_CRLF:
+        data = data.replace(b"\r", b"")
+    return data
+
+
+def make_payload(mode: int, size: int, seed: int = 0) -> bytes:
+    """
+    Makes log lines ending in the line ending, with a progress bar that
+    redraws itself with carriage returns every so often.
+
+    :param mode: An int, use the NEWLINE_* constants in utils/serial_config
+    :param size: How many bytes to make.
+    :param seed: The seed for the random parts.
+    :return: A bytes object exactly size bytes long.
+    """
+    ending = {NEWLINE_LF: b"\n", NEWLINE_CR: b"\r",
+              NEWLINE_CRLF: b"\r\n"}[mode]
+    rng = Random(seed)
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        if i % 50 == 0 and mode != NEWLINE_CR:
+            line = b"".join(b"\rprogress %3d%%" % p for p in range(0, 101, 10))
+        else:
+            line = b"[%08d] INFO sensor=%4d state=ok" % (
+                i, rng.randrange(1024))
+        lines.append(line + ending)
+        total += len(lines[-1])
+        i += 1
+    return b"".join(lines)[:size]
+
+
+def time_chunks(func, chunks: list[bytes], repeat: int) -> float:
+    """
+    Times translating all the chunks, taking the best of a few runs.
+
+    :param func: Called with each chunk.
+    :param chunks: The chunks.
+    :param repeat: How many runs.
+    :return: The fastest run, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        for chunk in chunks:
+            func(chunk)
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark newline translation.")
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024,
+                        help="How many bytes to translate per run")
+    parser.add_argument("--chunk-size", type=int, nargs="+",
+                        default=[64, 4096, 65536],
+                        help="The chunk sizes to translate in")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="How many runs to take the best of")
+    parser.add_argument("--output", type=str, default="-",
+                        help="Where to write the JSON results, defaults to "
+                             "stdout (-)")
+    args = parser.parse_args()
+
+    results = []
+    for label, mode in LINE_ENDINGS.items():
+        payload = make_payload(mode, args.size)
+        for chunk_size in args.chunk_size:
+            chunks = [payload[i:i + chunk_size]
+                      for i in range(0, len(payload), chunk_size)]
+            translator = NewlineTranslator(mode)
+            translated = b"".join(map(translator.translate, chunks)) + \
+                translator.flush()
+            replaced = b"".join(replace_translate(mode, c) for c in chunks)
+            old = time_chunks(lambda c: replace_translate(mode, c), chunks,
+                              args.repeat)
+            translator = NewlineTranslator(mode)
+            new = time_chunks(translator.translate, chunks, args.repeat)
+            results.append({
+                "line_ending": label.replace("&", ""),
+                "chunk_size": chunk_size,
+                "replace_mb_per_s": len(payload) / old / 1_000_000,
+                "translator_mb_per_s": len(payload) / new / 1_000_000,
+                "carriage_returns_kept": {
+                    "replace": replaced.count(b"\r"),
+                    "translator": translated.count(b"\r")
+                }
+            })
+    write_results({
+        "benchmark": "newline_translation",
+        "environment": environment(),
+        "config": {
+            "size": args.size,
+            "repeat": args.repeat
+        },
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
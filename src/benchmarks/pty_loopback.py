@@ -0,0 +1,320 @@
+"""
+End-to-end benchmark that connects a sercomModel to one side of a
+pseudo-terminal and writes synthetic traffic into the other side.
+
+Run from the src directory, for example:
+
+    python -m benchmarks.pty_loopback --profile text vt100 binary \\
+        --size 16777216 --rate 0 --output results.json
+
+For each profile this reports bytes/s and chunks/s, the latency from a chunk
+being written to the pty to it being emitted by received_text and to it being
+inserted into the terminal widget, and the peak RSS. Each profile runs in its
+own process so the peak RSS of one doesn't hide the next. Latencies at an
+unlimited rate include the time spent queued behind earlier data, so use a
+fixed --rate to measure latency without saturating the pipeline.
+
+Needs os.openpty, so this only runs on Linux and macOS.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tty
+from argparse import ArgumentParser, Namespace
+from array import array
+from pathlib import Path
+from random import Random
+from threading import Thread, Event
+from time import monotonic_ns, sleep
+
+from utils.logger import move_logs_to_stderr
+
+# The results go to stdout
+move_logs_to_stderr()
+
+from benchmarks.common import percentiles, peak_rss_kib, environment, \
+    write_results
+from utils.serial_config import NEWLINE_LF, IO_ENGINES, DEFAULT_IO_ENGINE, \
+    OVERLOAD_BLOCK, DEFAULT_RENDER_BUDGET
+
+PROFILES = ("text", "vt100", "binary")
+
+
+def make_payload(profile: str, size: int, seed: int = 0) -> bytes:
+    """
+    Makes some synthetic traffic.
+
+    :param profile: "text" for plain log lines, "vt100" for lines full of
+     colors, cursor movement and erases, or "binary" for random bytes.
+    :param size: How many bytes to make.
+    :param seed: The seed for the random parts.
+    :return: A bytes object exactly size bytes long.
+    """
+    rng = Random(seed)
+    if profile == "binary":
+        return rng.randbytes(size)
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        if profile == "text":
+            line = (f"[{i:08d}] INFO sensor={rng.randrange(1024):4d} "
+                    f"state=ok uptime={i * 16}ms\n").encode()
+        else:
+            color = 31 + i % 7
+            line = (f"\x1b[{color}m[{i:08d}]\x1b[0m \x1b[1mWARN\x1b[0m "
+                    f"progress {rng.randrange(100):3d}%\x1b[4D\x1b[K"
+                    f"done\b\b\b\bok  \x1b[32mOK\x1b[0m\n").encode()
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return b"".join(lines)[:size]
+
+
+class LatencyTracker:
+    """
+    Matches the bytes seen at one point of the pipeline up with the chunks
+    written to the pty, and records how long each chunk took to get there.
+    """
+
+    def __init__(self, write_times: array, chunk_ends: array):
+        """
+        Initialize the tracker.
+
+        :param write_times: When each chunk was written, shared with the
+         writer thread.
+        :param chunk_ends: The offset after the end of each chunk, shared
+         with the writer thread.
+        """
+        self.write_times = write_times
+        self.chunk_ends = chunk_ends
+        self.index = 0
+        self.seen = 0
+        self.batches = 0
+        self.last_time = 0
+        self.latencies = array("q")
+
+    def advance(self, count: int):
+        """
+        Records that some more bytes made it to this point.
+
+        :param count: How many bytes.
+        """
+        now = monotonic_ns()
+        self.seen += count
+        self.batches += 1
+        self.last_time = now
+        # The writer appends to write_times before chunk_ends, so every end
+        # we can see already has its time
+        while (self.index < len(self.chunk_ends) and
+               self.chunk_ends[self.index] <= self.seen):
+            self.latencies.append(now - self.write_times[self.index])
+            self.index += 1
+
+
+def write_traffic(master: int, payload: bytes, chunk_size: int, rate: int,
+                  write_times: array, chunk_ends: array):
+    """
+    Writes the payload into the master side of the pty in chunks.
+
+    :param master: The master file descriptor.
+    :param payload: What to write.
+    :param chunk_size: How much to write at a time.
+    :param rate: The bytes per second to pace the writes at, 0 for as fast
+     as possible.
+    :param write_times: Gets when each chunk was written.
+    :param chunk_ends: Gets the offset after the end of each chunk.
+    """
+    start = monotonic_ns()
+    for offset in range(0, len(payload), chunk_size):
+        if rate > 0:
+            due = start + offset * 1_000_000_000 // rate
+            wait = due - monotonic_ns()
+            if wait > 0:
+                sleep(wait / 1_000_000_000)
+        chunk = memoryview(payload)[offset:offset + chunk_size]
+        write_times.append(monotonic_ns())
+        chunk_ends.append(offset + len(chunk))
+        while chunk:
+            chunk = chunk[os.write(master, chunk):]
+
+
+def run_profile(args: Namespace) -> dict:
+    """
+    Runs one profile in this process.
+
+    :param args: The parsed arguments, with exactly one profile.
+    :return: A dict of results.
+    """
+    from PyQt5.QtCore import Qt, QTimer
+    from mvc.model import sercomModel
+
+    profile = args.profile[0]
+    payload = make_payload(profile, args.size, args.seed)
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+
+    app = None
+    text_edit = None
+    if args.render:
+        from PyQt5.QtWidgets import QApplication
+        from widgets.custom_plain_text_edit import CustomPlainTextEdit
+        app = QApplication(sys.argv[:1])
+        text_edit = CustomPlainTextEdit()
+        text_edit.resize(800, 600)
+        text_edit.show()
+
+    model = sercomModel(render=args.render)
+    model.set_newline_mode(NEWLINE_LF)
+    model.io_engine = args.io_engine
+    # Everything has to be rendered for the run to complete, so hold the
+    # port back instead of dropping what the terminal can't keep up with
+    model.set_render_limits(DEFAULT_RENDER_BUDGET, OVERLOAD_BLOCK)
+    write_times = array("q")
+    chunk_ends = array("q")
+    emitted = LatencyTracker(write_times, chunk_ends)
+    rendered = LatencyTracker(write_times, chunk_ends)
+    finished = Event()
+
+    def on_emitted(data: bytes, _):
+        emitted.advance(len(data))
+        if not args.render and emitted.seen >= len(payload):
+            finished.set()
+
+    def on_rendered(batches: list):
+        for data, ops, timestamps in batches:
+            text_edit.apply_ops(ops, timestamps)
+            rendered.advance(len(data))
+        text_edit.ensureCursorVisible()
+        model.render_batches_applied()
+        if rendered.seen >= len(payload):
+            app.quit()
+
+    # Runs on the thread that emits, so it's timed before any queueing
+    model.received_text.connect(on_emitted, Qt.DirectConnection)
+    if args.render:
+        model.render_batches.connect(on_rendered)
+    model.connect(os.ttyname(slave))
+
+    start = monotonic_ns()
+    writer = Thread(target=write_traffic,
+                    args=(master, payload, args.chunk_size, args.rate,
+                          write_times, chunk_ends), daemon=True)
+    writer.start()
+    if args.render:
+        QTimer.singleShot(int(args.timeout * 1000), app.quit)
+        app.exec_()
+    else:
+        finished.wait(args.timeout)
+    last = rendered if args.render else emitted
+    completed = last.seen >= len(payload)
+    end = last.last_time if completed else monotonic_ns()
+    model.disconnect()
+    os.close(master)
+    os.close(slave)
+
+    seconds = max(end - start, 1) / 1_000_000_000
+    return {
+        "profile": profile,
+        "completed": completed,
+        "bytes": last.seen,
+        "seconds": seconds,
+        "bytes_per_s": last.seen / seconds,
+        "chunks_written_per_s": len(chunk_ends) / seconds,
+        "batches_emitted_per_s": emitted.batches / seconds,
+        "latency_ms": {
+            "write_to_emit": percentiles(emitted.latencies),
+            "write_to_render": percentiles(rendered.latencies)
+            if args.render else None
+        },
+        "peak_rss_kib": peak_rss_kib()
+    }
+
+
+def child_command(args: Namespace, profile: str) -> list[str]:
+    """
+    Makes the command that runs one profile in a new process.
+
+    :param args: The parsed arguments.
+    :param profile: The profile to run.
+    :return: A list of str.
+    """
+    command = [sys.executable, "-m", "benchmarks.pty_loopback", "--child",
+               "--profile", profile, "--size", str(args.size),
+               "--chunk-size", str(args.chunk_size), "--rate", str(args.rate),
+               "--seed", str(args.seed), "--io-engine", str(args.io_engine),
+               "--timeout", str(args.timeout)]
+    if not args.render:
+        command.append("--no-render")
+    return command
+
+
+def main():
+    def describe(options: dict) -> str:
+        return ", ".join(f"{value} = {label.replace('&', '')}"
+                         for label, value in options.items())
+
+    parser = ArgumentParser(description="Benchmark sercom end to end "
+                                        "through a pseudo-terminal.")
+    parser.add_argument("--profile", nargs="+", choices=PROFILES,
+                        default=list(PROFILES),
+                        help="The kinds of traffic to send, defaults to all")
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024,
+                        help="How many bytes to send per profile")
+    parser.add_argument("--chunk-size", type=int, default=4096,
+                        help="How many bytes to write to the pty at a time")
+    parser.add_argument("--rate", type=int, default=0,
+                        help="The bytes per second to send at, 0 for as "
+                             "fast as possible")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed for the synthetic traffic")
+    parser.add_argument("--io-engine", type=int, default=DEFAULT_IO_ENGINE,
+                        choices=IO_ENGINES.values(),
+                        help=f"The I/O engine to use: "
+                             f"{describe(IO_ENGINES)}")
+    parser.add_argument("--no-render", dest="render", action="store_false",
+                        help="Don't feed the data to the terminal widget, "
+                             "which measures the model alone")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="How many seconds to give each profile")
+    parser.add_argument("--output", type=str, default="-",
+                        help="Where to write the JSON results, defaults to "
+                             "stdout (-)")
+    parser.add_argument("--child", action="store_true",
+                        help="Run exactly one profile in this process and "
+                             "print its results (used internally)")
+    args = parser.parse_args()
+    if not hasattr(os, "openpty"):
+        parser.error("This benchmark needs os.openpty, which isn't "
+                     "available on this platform")
+
+    if args.child:
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    for profile in args.profile:
+        output = subprocess.run(child_command(args, profile),
+                                cwd=Path(__file__).parents[1],
+                                stdout=subprocess.PIPE, check=True).stdout
+        results.append(json.loads(output))
+    write_results({
+        "benchmark": "pty_loopback",
+        "environment": environment(),
+        "config": {
+            "size": args.size,
+            "chunk_size": args.chunk_size,
+            "rate": args.rate,
+            "seed": args.seed,
+            "io_engine": args.io_engine,
+            "render": args.render
+        },
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
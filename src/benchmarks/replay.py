@@ -0,0 +1,167 @@
+"""
+Benchmark that replays session recordings through a sercomModel and into the
+terminal widget, to profile the view against real device traffic.
+
+Record a session with File > Start recording... (or --record in headless
+mode), then run from the src directory, for example:
+
+    python -m benchmarks.replay session.sercomrec --speed 0 \\
+        --output results.json
+
+For each recording this reports how long it took to replay and render,
+bytes/s, how many times the widget was handed render batches, and the peak
+RSS. Each recording is replayed in its own process so the peak RSS of one
+doesn't hide the next. A speed of 0 replays as fast as possible, which is
+what to use to catch performance regressions.
+"""
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from time import monotonic_ns
+
+from utils.logger import move_logs_to_stderr
+
+# The results go to stdout
+move_logs_to_stderr()
+
+from benchmarks.common import peak_rss_kib, environment, write_results
+from utils.recording import REPLAY_AS_FAST_AS_POSSIBLE
+from utils.serial_config import NEWLINE_LF, OVERLOAD_BLOCK, \
+    DEFAULT_RENDER_BUDGET
+
+
+def replay_recording(args: Namespace) -> dict:
+    """
+    Replays one recording in this process.
+
+    :param args: The parsed arguments, with exactly one recording.
+    :return: A dict of results.
+    """
+    from PyQt5.QtCore import Qt, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from mvc.model import sercomModel
+
+    path = args.recording[0]
+    app = QApplication(sys.argv[:1])
+    text_edit = None
+    if args.render:
+        from widgets.custom_plain_text_edit import CustomPlainTextEdit
+        text_edit = CustomPlainTextEdit()
+        text_edit.resize(800, 600)
+        text_edit.show()
+
+    model = sercomModel(render=args.render)
+    model.set_newline_mode(NEWLINE_LF)
+    # Replaying as fast as possible outruns the terminal, so hold the replay
+    # back instead of dropping what doesn't fit
+    model.set_render_limits(DEFAULT_RENDER_BUDGET, OVERLOAD_BLOCK)
+    stats = {"bytes": 0, "frames": 0, "reason": None, "end": 0}
+
+    def on_received(data: bytes, _):
+        stats["bytes"] += len(data)
+
+    def on_rendered(batches: list):
+        for data, ops, timestamps in batches:
+            text_edit.apply_ops(ops, timestamps)
+        text_edit.ensureCursorVisible()
+        stats["frames"] += 1
+        model.render_batches_applied()
+
+    def on_finished(reason: str):
+        stats["reason"] = reason
+        stats["end"] = monotonic_ns()
+        # The last render batches are queued before this, so they have been
+        # applied by the time the event loop gets here
+        app.quit()
+
+    # Runs on the thread that emits, so nothing is counted late
+    model.received_text.connect(on_received, Qt.DirectConnection)
+    model.replay_finished.connect(on_finished)
+    if args.render:
+        model.render_batches.connect(on_rendered)
+
+    start = monotonic_ns()
+    model.start_replay(path, args.speed)
+    QTimer.singleShot(int(args.timeout * 1000), model.stop_replay)
+    app.exec_()
+    completed = stats["reason"] == ""
+    end = stats["end"] or monotonic_ns()
+
+    seconds = max(end - start, 1) / 1_000_000_000
+    return {
+        "recording": path,
+        "completed": completed,
+        "bytes": stats["bytes"],
+        "seconds": seconds,
+        "bytes_per_s": stats["bytes"] / seconds,
+        "frames": stats["frames"],
+        "lines": text_edit.line_count() if args.render else None,
+        "peak_rss_kib": peak_rss_kib()
+    }
+
+
+def child_command(args: Namespace, recording: str) -> list[str]:
+    """
+    Makes the command that replays one recording in a new process.
+
+    :param args: The parsed arguments.
+    :param recording: The path of the recording to replay.
+    :return: A list of str.
+    """
+    command = [sys.executable, "-m", "benchmarks.replay", "--child",
+               str(Path(recording).resolve()), "--speed", str(args.speed),
+               "--timeout", str(args.timeout)]
+    if not args.render:
+        command.append("--no-render")
+    return command
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark sercom by replaying "
+                                        "session recordings.")
+    parser.add_argument("recording", nargs="+",
+                        help="The recordings to replay")
+    parser.add_argument("--speed", type=float,
+                        default=REPLAY_AS_FAST_AS_POSSIBLE,
+                        help="How many times faster than real time to "
+                             "replay, 0 (the default) for as fast as "
+                             "possible")
+    parser.add_argument("--no-render", dest="render", action="store_false",
+                        help="Don't feed the data to the terminal widget, "
+                             "which measures the model alone")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="How many seconds to give each recording")
+    parser.add_argument("--output", type=str, default="-",
+                        help="Where to write the JSON results, defaults to "
+                             "stdout (-)")
+    parser.add_argument("--child", action="store_true",
+                        help="Replay exactly one recording in this process "
+                             "and print its results (used internally)")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(replay_recording(args)))
+        return
+
+    results = []
+    for recording in args.recording:
+        output = subprocess.run(child_command(args, recording),
+                                cwd=Path(__file__).parents[1],
+                                stdout=subprocess.PIPE, check=True).stdout
+        results.append(json.loads(output))
+    write_results({
+        "benchmark": "replay",
+        "environment": environment(),
+        "config": {
+            "speed": args.speed,
+            "render": args.render
+        },
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
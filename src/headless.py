@@ -0,0 +1,171 @@
+import logging
+import os
+import sys
+from argparse import Namespace
+from threading import Event, Thread
+from time import monotonic
+from typing import BinaryIO
+
+from PyQt5.QtCore import Qt
+from serial import SerialException
+
+from mvc.model import sercomModel
+from utils.logger import create_logger
+from utils.metrics import MetricsExporter, METRICS_INTERVAL_MS
+from utils.triggers import Trigger, TRIGGER_ALERT, parse_triggers
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How much to read from the input at a time, and how much to buffer before
+# writing to the output
+HEADLESS_READ_SIZE = 64 * 1024
+HEADLESS_WRITE_BUFFER_SIZE = 1024 * 1024
+# How often, in seconds, whatever is left in the output buffer is written
+# out, so a slow trickle of data isn't held back until the buffer fills up
+HEADLESS_FLUSH_INTERVAL = 0.1
+
+
+def open_output(path: str) -> BinaryIO:
+    """
+    Opens where the received data should go.
+
+    :param path: A path to append to, or "-" for stdout.
+    :return: A binary file object.
+    """
+    if path == "-":
+        return open(sys.stdout.fileno(), "wb",
+                    buffering=HEADLESS_WRITE_BUFFER_SIZE, closefd=False)
+    return open(path, "ab", buffering=HEADLESS_WRITE_BUFFER_SIZE)
+
+
+def open_input(path: str) -> BinaryIO:
+    """
+    Opens where the data to send comes from.
+
+    :param path: A path to read from, or "-" for stdin.
+    :return: A binary file object.
+    """
+    if path == "-":
+        return open(sys.stdin.fileno(), "rb", buffering=0, closefd=False)
+    return open(path, "rb", buffering=0)
+
+
+def input_thread(model: sercomModel, source: BinaryIO):
+    """
+    Reads everything from the input and queues it to be sent through the
+    serial port, until the input runs out or the port is closed.
+
+    :param model: The model, which should already be connected.
+    :param source: The unbuffered binary file object to read from.
+    """
+    while model.connected:
+        data = source.read(HEADLESS_READ_SIZE)
+        if not data:
+            logger.debug("Reached end of input")
+            return
+        model.send(data)
+
+
+def on_triggered(hits: list[tuple[Trigger, int, int]]):
+    """
+    Logs the triggers that want to alert, as there is no status bar in
+    headless mode.
+
+    :param hits: Tuples of the Trigger, when its line started arriving and
+     which of the lines that started then it is.
+    """
+    for trigger, _, _ in hits:
+        if trigger.actions & TRIGGER_ALERT:
+            logger.warning(f"Trigger matched: {trigger.pattern}")
+
+
+def run_headless(parsed: Namespace) -> int:
+    """
+    Runs sercom without a GUI, bridging the serial port to stdin/stdout (or
+    files) until the port disconnects or we are interrupted.
+
+    :param parsed: The parsed arguments.
+    :return: The exit code.
+    """
+    logger.debug("Starting headless mode")
+    model = sercomModel(render=False)
+    model.port.baudrate = parsed.baud_rate
+    model.port.bytesize = parsed.byte_size
+    model.port.parity = parsed.parity
+    if int(parsed.stop_bits) == parsed.stop_bits:
+        parsed.stop_bits = int(parsed.stop_bits)
+    model.port.stopbits = parsed.stop_bits
+    model.set_flow_control(parsed.flow_control)
+    model.set_newline_mode(parsed.line_ending)
+    model.io_engine = parsed.io_engine
+    try:
+        model.set_triggers(parse_triggers("\n".join(parsed.trigger)))
+    except ValueError as e:
+        logger.error(f"Invalid trigger: {e}")
+        return 1
+
+    if parsed.record is not None:
+        try:
+            model.start_recording(parsed.record)
+        except OSError:
+            logger.exception(f"Failed to record to {parsed.record}!")
+            return 1
+
+    exporter = None
+    if parsed.metrics is not None:
+        try:
+            exporter = MetricsExporter(parsed.metrics)
+        except OSError:
+            logger.exception(f"Failed to export metrics to "
+                             f"{parsed.metrics}!")
+            model.stop_recording()
+            return 1
+
+    output = open_output(parsed.output)
+    source = open_input(parsed.input)
+    disconnected = Event()
+    # Someone is watching a terminal, so it's shown as soon as it arrives.
+    # Otherwise the buffer is only written once it fills up, or by the loop
+    # below.
+    interactive = output.isatty()
+
+    def on_received(data: bytes, _):
+        output.write(data)
+        if interactive:
+            output.flush()
+
+    # There is no event loop in headless mode, so the signals have to call
+    # straight into us from the serial threads
+    model.received_text.connect(on_received, Qt.DirectConnection)
+    model.disconnected.connect(disconnected.set, Qt.DirectConnection)
+    model.triggered.connect(on_triggered, Qt.DirectConnection)
+
+    try:
+        model.connect(parsed.port)
+    except SerialException:
+        logger.exception(f"Failed to connect to port {parsed.port}!")
+        model.stop_recording()
+        if exporter is not None:
+            exporter.close()
+        return 1
+
+    Thread(target=input_thread, args=(model, source), daemon=True).start()
+    try:
+        next_export = monotonic() + METRICS_INTERVAL_MS / 1000
+        while not disconnected.wait(HEADLESS_FLUSH_INTERVAL):
+            # Doesn't write anything if the buffer is empty
+            output.flush()
+            if exporter is not None and monotonic() >= next_export:
+                next_export += METRICS_INTERVAL_MS / 1000
+                exporter.write(model.metrics_snapshot())
+    except KeyboardInterrupt:
+        logger.info("Interrupted, disconnecting")
+        model.disconnect()
+        disconnected.wait(2)
+    finally:
+        output.flush()
+        model.stop_recording()
+        if exporter is not None:
+            exporter.write(model.metrics_snapshot())
+            exporter.close()
+    return 0
@@ -1,17 +1,34 @@
 import logging
 import sys
 from argparse import ArgumentParser, Namespace, ArgumentError
-from time import time as unix
+from threading import Thread
 from traceback import format_exception
 
-from PyQt5.QtWidgets import QApplication
-
-from mvc.controller import sercomController
-from mvc.model import sercomModel
-from mvc.view import sercomView
-from utils.dialogs import error_dlg
+from utils.logger import create_logger, move_logs_to_stderr, set_log_level, \
+    log_to_file, LOG_LEVELS, DEFAULT_LOG_LEVEL
+
+# In headless mode stdout is (probably) where the serial data goes, so this
+# has to happen before any other module logs something while being imported
+if "--headless" in sys.argv[1:]:
+    move_logs_to_stderr()
+# Likewise, the log level is set before anything else is imported, so what
+# is logged while importing is filtered too (argparse checks it later)
+for i, arg in enumerate(sys.argv[1:], start=1):
+    if arg.startswith("--log-level="):
+        level_name = arg.partition("=")[2]
+    elif arg == "--log-level" and i + 1 < len(sys.argv):
+        level_name = sys.argv[i + 1]
+    else:
+        continue
+    if level_name in LOG_LEVELS:
+        set_log_level(LOG_LEVELS[level_name])
+
+from utils.startup import startup_timer
 from utils.system_info import log_system_info
-from utils.logger import create_logger
+from utils.serial_config import log_serial_config, DEFAULT_BAUD_RATE, \
+    BYTE_SIZES, DEFAULT_BYTE_SIZE, PARITIES, DEFAULT_PARITY, STOP_BITS, \
+    DEFAULT_STOP_BIT, FLOW_CONTROLS, DEFAULT_FLOW_CONTROL, LINE_ENDINGS, \
+    DEFAULT_LINE_ENDING, IO_ENGINES, DEFAULT_IO_ENGINE
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
@@ -27,29 +44,127 @@ def process_my_args() -> tuple[Namespace, list[str]]:
 
     :return: A tuple of a Namespace and a list of strings for Qt.
     """
+    def describe(options: dict) -> str:
+        return ", ".join(f"{value} = {label.replace('&', '')}"
+                         for label, value in options.items())
+
     parser = ArgumentParser(description="A serial monitor in Qt. ")
     # Add arguments here
+    parser.add_argument("--log-level", type=str,
+                        default=logging.getLevelName(DEFAULT_LOG_LEVEL),
+                        choices=LOG_LEVELS.keys(),
+                        help="The lowest level of messages to log")
+    parser.add_argument("--log-file", type=str,
+                        help="A file to also write the log to, which is "
+                             "rotated when it gets big")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Log how long each phase of starting up took")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a GUI, sending stdin (or --input) "
+                             "to the port and writing what is received to "
+                             "stdout (or --output)")
+    parser.add_argument("--port", type=str,
+                        help="The serial port to connect to in headless "
+                             "mode, required for headless mode")
+    parser.add_argument("--baud-rate", type=int, default=DEFAULT_BAUD_RATE,
+                        help="The baud rate in headless mode")
+    parser.add_argument("--byte-size", type=int, default=DEFAULT_BYTE_SIZE,
+                        choices=BYTE_SIZES.values(),
+                        help="The byte size in headless mode")
+    parser.add_argument("--parity", type=str, default=DEFAULT_PARITY,
+                        choices=PARITIES.values(),
+                        help=f"The parity in headless mode: "
+                             f"{describe(PARITIES)}")
+    parser.add_argument("--stop-bits", type=float, default=DEFAULT_STOP_BIT,
+                        choices=STOP_BITS.values(),
+                        help="The number of stop bits in headless mode")
+    parser.add_argument("--flow-control", type=int,
+                        default=DEFAULT_FLOW_CONTROL,
+                        choices=FLOW_CONTROLS.values(),
+                        help=f"The flow control in headless mode: "
+                             f"{describe(FLOW_CONTROLS)}")
+    parser.add_argument("--line-ending", type=int,
+                        default=DEFAULT_LINE_ENDING,
+                        choices=LINE_ENDINGS.values(),
+                        help=f"The line ending in headless mode: "
+                             f"{describe(LINE_ENDINGS)}")
+    parser.add_argument("--io-engine", type=int,
+                        default=DEFAULT_IO_ENGINE,
+                        choices=IO_ENGINES.values(),
+                        help=f"How the port is read from and written to in "
+                             f"headless mode: {describe(IO_ENGINES)}")
+    parser.add_argument("--trigger", type=str, action="append", default=[],
+                        help="A string to watch for in headless mode, "
+                             "logged when it shows up (can be given more "
+                             "than once)")
+    parser.add_argument("--record", type=str,
+                        help="A file to record the raw data received and "
+                             "sent to in headless mode, to replay later")
+    parser.add_argument("--metrics", type=str,
+                        help="A file to append a JSON snapshot of the "
+                             "metrics to every second in headless mode")
+    parser.add_argument("--input", type=str, default="-",
+                        help="Where to read data to send from in headless "
+                             "mode, defaults to stdin (-)")
+    parser.add_argument("--output", type=str, default="-",
+                        help="Where to append received data to in headless "
+                             "mode, defaults to stdout (-)")
     logger.debug(f"Parsing arguments")
     parsed, un_parsed = parser.parse_known_args()
     logger.debug(f"Application arguments parsed: {parsed}")
     logger.debug(f"Unparsed arguments: {un_parsed}")
     # Check/fix arguments here, and raise ArgumentError if needed
+    if parsed.headless and parsed.port is None:
+        parser.error("--port is required in headless mode")
     logger.debug(f"Application arguments parsed after fixing: {parsed}")
     return parsed, un_parsed
 
 
+def log_environment():
+    """
+    Logs the system information and serial options on a background thread,
+    as some of it is slow to get and none of it is needed to start up.
+    """
+    def log():
+        log_system_info()
+        log_serial_config()
+
+    Thread(target=log, name="log_environment", daemon=True).start()
+
+
 def main():
     """
     The main function which is run when the program starts.
     """
     logger.debug(f"Starting application")
-
-    start_time = unix()
-
-    log_system_info()
+    startup_timer.lap("Imports")
 
     # https://stackoverflow.com/a/21166631/10291933
     parsed, un_parsed = process_my_args()
+    set_log_level(LOG_LEVELS[parsed.log_level])
+    if parsed.log_file is not None:
+        try:
+            log_to_file(parsed.log_file)
+        except OSError:
+            logger.exception(f"Failed to log to {parsed.log_file}!")
+    startup_timer.enabled = parsed.profile_startup
+    startup_timer.lap("Parsing arguments")
+
+    if parsed.headless:
+        log_environment()
+        # Skip importing the GUI entirely
+        from headless import run_headless
+        startup_timer.lap("Headless imports")
+        startup_timer.finish()
+        sys.exit(run_headless(parsed))
+
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    from mvc.session_manager import sercomSessionManager
+    from utils.dialogs import error_dlg
+    startup_timer.lap("GUI imports")
+
     qt_args = sys.argv[:1] + un_parsed
 
     app = QApplication(qt_args)
@@ -69,6 +184,7 @@ def main():
     QApplication.setApplicationName(APPLICATION_NAME)
     QApplication.setApplicationVersion(APPLICATION_VERSION)
     QApplication.setOrganizationName(ORGANIZATION_NAME)
+    startup_timer.lap("Qt initialization")
 
     def error(cls, exception, traceback):
         """
@@ -83,17 +199,19 @@ def main():
     # https://stackoverflow.com/a/33741755/10291933
     sys.excepthook = error
 
-    model = sercomModel()
-
-    view = sercomView()
-    view.show()
+    session_manager = sercomSessionManager()
+    session_manager.open_session()
 
-    controller = sercomController(model, view)
-
-    end_time = unix()
-    startup_time = end_time - start_time
+    def first_paint():
+        """
+        Runs once the window has been shown and painted, so anything not
+        needed to get there waits until now.
+        """
+        startup_timer.lap("First paint")
+        startup_timer.finish()
+        log_environment()
 
-    logger.debug(f"Took {startup_time:.3f} seconds to initialize")
+    QTimer.singleShot(0, first_paint)
 
     logger.debug("Starting main loop")
 
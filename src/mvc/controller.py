@@ -1,7 +1,7 @@
 import logging
-from typing import Union
+from typing import Optional, Union, TYPE_CHECKING
 
-from PyQt5.Qt import QKeyEvent
+from PyQt5.QtGui import QKeyEvent
 from PyQt5 import QtCore
 
 from mvc.model import sercomModel
@@ -10,6 +10,10 @@ from utils.logger import create_logger
 from utils.serial_config import NEWLINE_CR, NEWLINE_CRLF, \
     XON_XOFF_SOFT_FLOW_CONTROL, \
     RTS_CTS_HARD_FLOW_CONTROL, DSR_DTR_HARD_FLOW_CONTROL
+from utils.triggers import Trigger
+
+if TYPE_CHECKING:
+    from mvc.session_manager import sercomSessionManager
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
@@ -20,16 +24,19 @@ class sercomController:
     the model, and the model returns results which are passed to the view.
     """
 
-    def __init__(self, model: sercomModel, view: sercomView):
+    def __init__(self, model: sercomModel, view: sercomView,
+                 session_manager: "sercomSessionManager"):
         """
         Initialize the controller.
 
         :param model: The model.
         :param view: The view.
+        :param session_manager: The session manager this session belongs to.
         """
         logger.debug(f"Creating controller")
         self.model = model
         self.view = view
+        self.session_manager = session_manager
         self.model.controller = self
         self.view.controller = self
         self.model.after_controller_initialization()
@@ -38,18 +45,45 @@ class sercomController:
 
     def create_new_session(self):
         """
-        "Forks" this process to create a new session that is independent of
-        the current session.
+        Opens a new session, in a new window, that is independent of the
+        current session.
         """
         logger.debug("Creating new session")
-        self.model.create_new_session()
+        self.session_manager.open_session()
 
-    def get_serial_ports(self) -> list[tuple[str, str]]:
+    def close_session(self):
+        """
+        Cleans up this session, because its window was closed.
         """
-        Get the serial ports.
+        logger.debug("Closing session")
+        self.model.stop_capture()
+        self.model.stop_recording()
+        self.model.stop_replay()
+        if self.model.connected:
+            self.model.disconnect()
+        self.session_manager.close_session(self)
+
+    def get_serial_ports(self) -> Optional[list[tuple[str, str]]]:
+        """
+        Get the serial ports, as last enumerated in the background.
+
+        :return: A list of tuples of the path and a name to show, or None
+         if the ports haven't been enumerated yet.
         """
         return self.model.get_serial_ports()
 
+    def refresh_serial_ports(self):
+        """
+        Enumerate the serial ports again in the background.
+        """
+        self.model.refresh_serial_ports()
+
+    def watch_serial_ports(self):
+        """
+        Start watching for serial ports being plugged in or unplugged.
+        """
+        self.model.watch_serial_ports()
+
     def connect(self, path: str):
         """
         Attempts to connect to a serial port.
@@ -64,6 +98,55 @@ class sercomController:
         """
         self.model.disconnect()
 
+    def start_capture(self, path: str, max_size: int = 0, max_age: float = 0):
+        """
+        Starts capturing the raw data received to a file.
+
+        :param path: The path of the capture file.
+        :param max_size: Rotate to a new file after this many bytes, 0 for
+         never.
+        :param max_age: Rotate to a new file after this many seconds, 0 for
+         never.
+        """
+        self.model.start_capture(path, max_size, max_age)
+
+    def stop_capture(self):
+        """
+        Stops capturing, if we are capturing.
+        """
+        self.model.stop_capture()
+
+    def start_recording(self, path: str):
+        """
+        Starts recording the raw data received and sent to a file, to replay
+        later.
+
+        :param path: The path of the recording.
+        """
+        self.model.start_recording(path)
+
+    def stop_recording(self):
+        """
+        Stops recording, if we are recording.
+        """
+        self.model.stop_recording()
+
+    def start_replay(self, path: str, speed: float):
+        """
+        Replays a recording as if it was being received.
+
+        :param path: The path of the recording.
+        :param speed: How many times faster than real time to replay, 0 for
+         as fast as possible.
+        """
+        self.model.start_replay(path, speed)
+
+    def stop_replay(self):
+        """
+        Stops replaying, if we are replaying.
+        """
+        self.model.stop_replay()
+
     def set_baud_rate(self, rate: int):
         """
         Sets the baud rate.
@@ -111,18 +194,13 @@ class sercomController:
 
         :param control: An int, use the constants in utils/serial_config
         """
-        self.model.port.xonxoff = False
-        self.model.port.rtscts = False
-        self.model.port.dsrdtr = False
         if control == XON_XOFF_SOFT_FLOW_CONTROL:
             logger.info("Enabling XON/XOFF (software) flow control")
-            self.model.port.xonxoff = True
         elif control == RTS_CTS_HARD_FLOW_CONTROL:
             logger.info("Enabling RTS/CTS (hardware) flow control")
-            self.model.port.rtscts = True
         elif control == DSR_DTR_HARD_FLOW_CONTROL:
             logger.info("Enabling DSR/DTR (hardware) flow control")
-            self.model.port.dsrdtr = True
+        self.model.set_flow_control(control)
         self.changed_serial_param()
 
     def set_line_ending(self, ending: int):
@@ -132,9 +210,83 @@ class sercomController:
         :param ending: An int, use the constants in utils/serial_config
         """
         logger.info(f"Setting line ending to {ending}")
-        self.model.newline_mode = ending
+        self.model.set_newline_mode(ending)
         self.changed_serial_param()
 
+    def set_local_echo(self, do: bool):
+        """
+        Set whether what is sent is shown in the terminal too.
+
+        :param do: Whether to enable local echo or not.
+        """
+        self.model.local_echo = do
+
+    def set_io_engine(self, engine: int):
+        """
+        Set the I/O engine used the next time we connect.
+
+        :param engine: An int, use the constants in utils/serial_config
+        """
+        logger.info(f"Setting I/O engine to {engine}")
+        self.model.io_engine = engine
+
+    def set_send_pacing(self, pacing: int):
+        """
+        Set how files and pastes are paced when they are sent.
+
+        :param pacing: An int, use the constants in utils/serial_config
+        """
+        logger.info(f"Setting send pacing to {pacing}")
+        self.model.send_pacing = pacing
+
+    def set_render_limits(self, budget: int, policy: int):
+        """
+        Set how much received data can wait to be shown, and what to do with
+        what doesn't fit.
+
+        :param budget: The most bytes to have waiting.
+        :param policy: An int, use the constants in utils/serial_config
+        """
+        logger.info(f"Setting render budget to {budget} bytes and overload "
+                    f"policy to {policy}")
+        self.model.set_render_limits(budget, policy)
+
+    def set_send_rate(self, rate: int):
+        """
+        Set the bytes per second files and pastes are sent at.
+
+        :param rate: An int, 0 for the line rate of the port.
+        """
+        logger.info(f"Setting send rate to {rate} bytes per second")
+        self.model.send_rate = rate
+
+    def set_send_line_delay(self, ms: int):
+        """
+        Set how long to wait after each line of a file or paste.
+
+        :param ms: An int, in milliseconds.
+        """
+        logger.info(f"Setting send line delay to {ms} ms")
+        self.model.send_line_delay_ms = ms
+
+    def set_write_coalescing(self, ms: int):
+        """
+        Set how long the write thread waits for more data before writing.
+
+        :param ms: An int, in milliseconds.
+        """
+        logger.info(f"Setting write coalescing window to {ms} ms")
+        self.model.write_coalesce_ms = ms
+
+    def set_triggers(self, triggers: list[Trigger]):
+        """
+        Set the triggers to watch for in the data received.
+
+        :param triggers: A list of Trigger.
+        """
+        logger.info(f"Setting {len(triggers)} triggers")
+        self.model.set_triggers(triggers)
+
     def changed_serial_param(self):
         """
         Emits a signal on the model that we changed serial params.
@@ -166,3 +318,18 @@ class sercomController:
         :param data: A bytes object.
         """
         self.model.send(data)
+
+    def send_stream(self, source: Union[str, bytes]):
+        """
+        Streams a file or a large block of data through the serial
+        connection, paced with the send settings.
+
+        :param source: A path to a file, or a bytes object.
+        """
+        self.model.start_send(source)
+
+    def cancel_send(self):
+        """
+        Cancels streaming a file or block of data.
+        """
+        self.model.cancel_send()
@@ -1,14 +1,30 @@
 import logging
-from threading import Thread
-from queue import Queue
+from array import array
+from threading import Thread, Condition, Event, Lock, current_thread
+from typing import Callable, Optional, Union
+from time import monotonic_ns, monotonic
+from queue import Queue, Empty
 
 from PyQt5.QtCore import QObject, pyqtSignal
 from serial import Serial, SerialException
-from serial.tools.list_ports import comports
 
+from utils.batcher import ReceiveBatcher
+from utils.capture import CaptureWriter
 from utils.logger import create_logger
-from utils.process import launch_command, launch_detached
-from utils.serial_config import NEWLINE_LF, NEWLINE_CR, NEWLINE_CRLF
+from utils.metrics import SessionMetrics
+from utils.sender import StreamSender
+from utils.newline import NewlineTranslator
+from utils.port_enumerator import PortEnumerator
+from utils.recording import SessionRecorder, ReplaySource
+from utils.port_reader import PortReader, can_wait_for_readiness
+from utils.render_worker import RenderWorker
+from utils.triggers import Trigger, TRIGGER_MARK, make_engine
+from utils.serial_config import NEWLINE_CRLF, \
+    RECEIVE_BATCH_SIZE, RECEIVE_BATCH_DELAY, XON_XOFF_SOFT_FLOW_CONTROL, \
+    RTS_CTS_HARD_FLOW_CONTROL, DSR_DTR_HARD_FLOW_CONTROL, DEFAULT_IO_ENGINE, \
+    IO_ENGINE_ASYNCIO, WRITE_COALESCE_SIZE, DEFAULT_WRITE_COALESCE_MS, \
+    DEFAULT_SEND_PACING, DEFAULT_SEND_RATE, DEFAULT_SEND_LINE_DELAY_MS, \
+    DEFAULT_OVERLOAD_POLICY, DEFAULT_RENDER_BUDGET, HEX_DUMP_MAX_PENDING
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
@@ -17,42 +33,260 @@ class sercomModel(QObject):
     """
     sercom's model is where the serial port stuff happens.
     """
-    received_text = pyqtSignal(bytes)
+    # The data, and an array("q") of the time.monotonic_ns() each line that
+    # starts in the data started arriving at
+    received_text = pyqtSignal(bytes, object)
     local_echo_text = pyqtSignal(bytes)
+    # A list of tuples of the data, the operations to apply from utils/vt100
+    # and the line start timestamps (or None for now), for the data received
+    # and echoed, decoded and parsed off of the GUI thread
+    render_batches = pyqtSignal(list)
     disconnected = pyqtSignal()
     serial_params_changed = pyqtSignal(str)
+    # The bytes sent so far and the total
+    send_progress = pyqtSignal(int, int)
+    # An empty str if everything was sent, otherwise why not
+    send_finished = pyqtSignal(str)
+    # A list of tuples of a Trigger that matched, when its line started
+    # arriving and the index of its line among the lines that started then
+    triggered = pyqtSignal(list)
+    # A list of tuples of the path and a name to show, whenever a serial
+    # port is plugged in or unplugged
+    serial_ports_changed = pyqtSignal(list)
+    # An empty str if the whole recording was replayed, otherwise why not
+    replay_finished = pyqtSignal(str)
+    # Emitted when raw data received is waiting for take_raw_received(),
+    # once until it is taken
+    raw_received = pyqtSignal()
+    # Why the capture stopped, when writing it failed
+    capture_failed = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, render: bool = True):
         """
         Initialize the model.
+
+        :param render: Whether to decode and parse what is received and emit
+         it with render_batches, for showing it in a terminal.
         """
         logger.debug(f"Creating model")
         super().__init__()
         self.port = Serial()
         self.newline_mode = NEWLINE_CRLF
+        self.receive_translator = NewlineTranslator(self.newline_mode)
+        self.echo_translator = NewlineTranslator(self.newline_mode, echo=True)
         self.write_queue = Queue()
+        self.receive_batcher = None
+        self.render = render
+        self.render_worker = None
+        # What was received exactly as it was, for the hex dump, only
+        # collected while it is shown
+        self.collect_raw = False
+        self.raw_pending = bytearray()
+        self.raw_lock = Lock()
+        self.raw_dropped = 0
+        self.local_echo = False
+        self.capture = None
+        self.recorder: Optional[SessionRecorder] = None
+        self.replay: Optional[ReplaySource] = None
+        self.metrics = SessionMetrics()
+        self.io_engine = DEFAULT_IO_ENGINE
+        self.write_coalesce_ms = DEFAULT_WRITE_COALESCE_MS
+        self.async_connection = None
+        self.read_stopped = Event()
+        self.port_reader: Optional[PortReader] = None
+        self.reader_thread: Optional[Thread] = None
+        # Counts of bytes handed to send() and actually written to the port,
+        # so senders can wait for the port to catch up
+        self.write_condition = Condition()
+        self.bytes_queued = 0
+        self.bytes_written = 0
+        self.sender: Optional[StreamSender] = None
+        self.send_pacing = DEFAULT_SEND_PACING
+        self.send_rate = DEFAULT_SEND_RATE
+        self.send_line_delay_ms = DEFAULT_SEND_LINE_DELAY_MS
+        self.trigger_engine = None
+        self.overload_policy = DEFAULT_OVERLOAD_POLICY
+        self.render_budget = DEFAULT_RENDER_BUDGET
 
     def after_controller_initialization(self):
         """
         Stuff to run after the controller is initialized.
         """
 
-    def create_new_session(self):
+    def get_serial_ports(self) -> Optional[list[tuple[str, str]]]:
+        """
+        Get the serial ports, as last enumerated in the background. Never
+        waits on enumerating them.
+
+        :return: A list of tuples of the path and a name to show, or None
+         if the ports haven't been enumerated yet.
+        """
+        return PortEnumerator.get().ports
+
+    def refresh_serial_ports(self):
+        """
+        Enumerate the serial ports again in the background.
+        serial_ports_changed is emitted if they changed.
+        """
+        PortEnumerator.get().refresh()
+
+    def watch_serial_ports(self):
+        """
+        Start emitting serial_ports_changed when a serial port is plugged in
+        or unplugged.
+        """
+        PortEnumerator.get().ports_changed.connect(self.serial_ports_changed)
+
+    def set_flow_control(self, control: int):
+        """
+        Set the flow control on the port.
+
+        :param control: An int, use the constants in utils/serial_config
+        """
+        self.port.xonxoff = control == XON_XOFF_SOFT_FLOW_CONTROL
+        self.port.rtscts = control == RTS_CTS_HARD_FLOW_CONTROL
+        self.port.dsrdtr = control == DSR_DTR_HARD_FLOW_CONTROL
+
+    def set_newline_mode(self, mode: int):
+        """
+        Set the line ending translated to "\n" in the data received and
+        echoed.
+
+        :param mode: An int, use the constants in utils/serial_config
+        """
+        self.newline_mode = mode
+        # Changed in place, so a "\r" held back isn't lost
+        self.receive_translator.set_mode(mode)
+        self.echo_translator.set_mode(mode)
+
+    def set_triggers(self, triggers: list[Trigger]):
+        """
+        Set the triggers to watch for in the data received.
+
+        :param triggers: A list of Trigger, which may be empty.
+        """
+        old = self.trigger_engine
+        engine = make_engine(triggers)
+        if engine is not None and old is not None:
+            # Carry on counting lines where the old engine was
+            engine.at_line_start = old.at_line_start
+            engine.line_start_time = old.line_start_time
+            engine.line_start_index = old.line_start_index
+        self.trigger_engine = engine
+
+    def start_capture(self, path: str, max_size: int = 0, max_age: float = 0):
+        """
+        Starts capturing the raw data received to a file. Stops the current
+        capture if there is one.
+
+        :param path: The path of the capture file.
+        :param max_size: Rotate to a new file after this many bytes, 0 for
+         never.
+        :param max_age: Rotate to a new file after this many seconds, 0 for
+         never.
+        """
+        self.stop_capture()
+        logger.debug(f"Starting capture to {path}")
+        capture = CaptureWriter(path, max_size, max_age,
+                                self.handle_capture_failed)
+        capture.start()
+        self.capture = capture
+
+    def stop_capture(self):
+        """
+        Stops capturing, if we are capturing.
+        """
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            logger.debug(f"Stopping capture to {capture.path}")
+            capture.stop()
+
+    def handle_capture_failed(self, reason: str):
+        """
+        Called on the capture writer thread if writing the capture failed, to
+        stop capturing instead of dropping everything received from now on.
+
+        :param reason: Why it failed.
+        """
+        capture = self.capture
+        if capture is not None and capture.thread is current_thread():
+            self.capture = None
+            self.capture_failed.emit(reason)
+
+    def start_recording(self, path: str):
+        """
+        Starts recording the raw data received and sent, so the session can
+        be replayed later. Stops the current recording if there is one.
+
+        :param path: The path of the recording.
+        """
+        self.stop_recording()
+        logger.debug(f"Starting recording to {path}")
+        recorder = SessionRecorder(path)
+        recorder.start()
+        self.recorder = recorder
+
+    def stop_recording(self):
+        """
+        Stops recording, if we are.
+        """
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            logger.debug(f"Stopping recording to {recorder.path}")
+            recorder.stop()
+
+    def start_replay(self, path: str, speed: float):
+        """
+        Replays a recording as if it was being received from a port, which
+        can't be done while connected. replay_finished is emitted once it
+        stops.
+
+        :param path: The path of the recording.
+        :param speed: How many times faster than real time to replay, 0 for
+         as fast as possible.
+        """
+        self.stop_replay()
+        logger.debug(f"Starting replay of {path}")
+        engine = self.trigger_engine
+        if engine is not None:
+            engine.reset()
+        replay = ReplaySource(path, speed, self.handle_received,
+                              self.handle_written, self.handle_replay_finished)
+        self.receive_batcher = ReceiveBatcher(self.handle_batch,
+                                              RECEIVE_BATCH_SIZE,
+                                              RECEIVE_BATCH_DELAY,
+                                              self.metrics.add_batch_delay)
+        self.start_render_worker()
+        self.receive_batcher.start()
+        # Set first, as a short recording can finish before start() returns
+        self.replay = replay
+        try:
+            replay.start()
+        except (OSError, ValueError):
+            self.replay = None
+            self.stop_receiving()
+            raise
+
+    def stop_replay(self):
         """
-        "Forks" this process to create a new session that is independent of
-        the current session.
+        Stops replaying, if we are.
         """
-        logger.debug("Creating new session")
-        launch_detached(launch_command())
+        replay = self.replay
+        if replay is not None:
+            logger.debug(f"Stopping replay of {replay.path}")
+            self.unblock_render_worker()
+            replay.stop()
 
-    def get_serial_ports(self) -> list[tuple[str, str]]:
+    def handle_replay_finished(self, reason: str):
         """
-        Get the serial ports.
+        Called on the replay thread once the replay stops.
+
+        :param reason: An empty str if the whole recording was replayed,
+         otherwise why not.
         """
-        ports = []
-        for port in comports():
-            ports.append((port.device, f"{port.device} ({port.description})"))
-        return ports
+        self.stop_receiving()
+        self.replay = None
+        self.replay_finished.emit(reason)
 
     def connect(self, path: str):
         """
@@ -65,60 +299,360 @@ class sercomModel(QObject):
         self.port.open()
         self.port.timeout = 1
         logger.info(f"Successfully connect to port {self.port.name}!")
+        with self.write_condition:
+            self.bytes_queued = 0
+            self.bytes_written = 0
+        engine = self.trigger_engine
+        if engine is not None:
+            engine.reset()
+        if self.io_engine == IO_ENGINE_ASYNCIO:
+            if hasattr(self.port, "fd"):
+                self.start_async()
+                return
+            logger.warning("The asyncio engine needs a file descriptor, "
+                           "falling back to threads")
         self.start_threads()
 
+    def start_async(self):
+        """
+        Starts driving the port from the shared serial event loop.
+        """
+        # Only imported when used, as importing asyncio slows down starting up
+        from utils.async_serial import SerialEventLoop, \
+            AsyncSerialConnection, LoopReceiveBatcher
+
+        loop = SerialEventLoop.get()
+        self.receive_batcher = LoopReceiveBatcher(loop,
+                                                  self.handle_batch,
+                                                  RECEIVE_BATCH_SIZE,
+                                                  RECEIVE_BATCH_DELAY,
+                                                  self.metrics.add_batch_delay)
+        # The event loop reads every port using it, so instead of blocking
+        # it only this port stops being read
+        self.start_render_worker(self.pause_async_reading)
+        self.receive_batcher.start()
+        self.async_connection = AsyncSerialConnection(self.port.fd, loop,
+                                                      self.handle_received,
+                                                      self.handle_written,
+                                                      self.handle_async_closed)
+        logger.debug(f"Starting asyncio connection for fd {self.port.fd}")
+        self.async_connection.start()
+
+    def handle_async_closed(self):
+        """
+        Called on the serial event loop when the port stops working.
+        """
+        self.async_connection = None
+        self.stop_receiving()
+        self.disconnected.emit()
+
     def start_threads(self):
         """
-        Starts the read thread.
+        Starts the read and write threads, and the receive batcher.
         """
-        r = Thread(target=self.read_thread, daemon=True)
-        logger.debug(f"Starting read thread {r}")
-        r.start()
-        w = Thread(target=self.write_thread, daemon=True)
+        self.receive_batcher = ReceiveBatcher(self.handle_batch,
+                                              RECEIVE_BATCH_SIZE,
+                                              RECEIVE_BATCH_DELAY,
+                                              self.metrics.add_batch_delay)
+        self.start_render_worker()
+        self.receive_batcher.start()
+        # A fresh queue so nothing left over from the last connection is sent
+        self.write_queue = Queue()
+        self.read_stopped = Event()
+        self.port_reader = PortReader(self.port) \
+            if can_wait_for_readiness(self.port) else None
+        self.reader_thread = Thread(target=self.read_thread, daemon=True)
+        logger.debug(f"Starting read thread {self.reader_thread}")
+        self.reader_thread.start()
+        w = Thread(target=self.write_thread, args=(self.write_queue,),
+                   daemon=True)
         logger.debug(f"Starting write thread {w}")
         w.start()
 
     def read_thread(self):
         """
-        This function will read the data received and emit a signal.
+        This function will read the data received and hand it to the receive
+        batcher, which will emit a signal.
         """
+        reader = self.port_reader
         try:
-            while self.port.is_open:
-                b = self.port.read(self.port.in_waiting or 1)
-                if not b:
-                    continue
-                if self.newline_mode == NEWLINE_CR:
-                    b = b.replace(b"\r", b"\n")
-                elif self.newline_mode == NEWLINE_LF:
-                    pass
-                elif self.newline_mode == NEWLINE_CRLF:
-                    b = b.replace(b"\r", b"")
-                self.received_text.emit(b)
+            if reader is not None:
+                while not self.read_stopped.is_set():
+                    b = reader.read()
+                    if b is not None:
+                        self.handle_received(b, monotonic_ns())
+            else:
+                # Nothing to wait on, so let pyserial block in read()
+                while not self.read_stopped.is_set():
+                    b = self.port.read(self.port.in_waiting or 1)
+                    if not b:
+                        continue
+                    self.handle_received(b, monotonic_ns())
         except SerialException:
             logger.exception("Error reading from serial port!")
         finally:
+            if reader is not None:
+                reader.close()
+            self.stop_receiving()
             self.disconnected.emit()
 
-    def write_thread(self):
+    def stop_read_thread(self):
         """
-        This function will write the data queued up.
+        Wakes up the read thread and waits for it to finish, so the port can
+        be closed without it reading a file descriptor that was closed (and
+        maybe reused).
+        """
+        self.read_stopped.set()
+        reader = self.port_reader
+        if reader is not None:
+            reader.stop()
+        else:
+            self.port.cancel_read()
+        thread = self.reader_thread
+        if thread is not None and thread is not current_thread():
+            thread.join()
+        self.port_reader = None
+        self.reader_thread = None
+
+    def write_thread(self, queue: Queue):
+        """
+        This function will write the data queued up. Everything already
+        queued (and anything queued within the coalescing window) is written
+        with one call, so typing fast or sending a macro doesn't turn into a
+        write per byte.
+
+        :param queue: The queue to take data from. None is queued to stop.
         """
         try:
             while self.port.is_open:
-                data = self.write_queue.get()
-                self.port.write(data)
-                if self.newline_mode == NEWLINE_CR:
-                    data = data.replace(b"\r", b"\n")
-                elif self.newline_mode == NEWLINE_LF:
-                    pass
-                elif self.newline_mode == NEWLINE_CRLF:
-                    data = data.replace(b"\r", b"")
-                self.local_echo_text.emit(data)
+                data = queue.get()
+                if data is None:
+                    return
+                batch = bytearray(data)
+                coalesced = 0
+                stop = False
+                deadline = monotonic() + self.write_coalesce_ms / 1000
+                while len(batch) < WRITE_COALESCE_SIZE:
+                    try:
+                        remaining = deadline - monotonic()
+                        if remaining > 0:
+                            data = queue.get(timeout=remaining)
+                        else:
+                            data = queue.get_nowait()
+                    except Empty:
+                        break
+                    if data is None:
+                        stop = True
+                        break
+                    batch += data
+                    coalesced += 1
+                self.metrics.sends_coalesced += coalesced
+                batch = bytes(batch)
+                self.port.write(batch)
+                self.handle_written(batch)
+                if stop:
+                    return
         except SerialException:
             logger.exception("Error writing to serial port!")
         # finally:
         #     self.disconnected.emit()
 
+    def start_render_worker(self,
+                            pause: Optional[Callable[[bool], None]] = None):
+        """
+        Starts a render worker for this connection, if we are rendering.
+
+        :param pause: Called to stop and start reading instead of blocking
+         when the terminal falls behind, if not None.
+        """
+        if not self.render:
+            return
+        self.render_worker = RenderWorker(self.render_batches.emit,
+                                          self.render_budget,
+                                          self.overload_policy, pause)
+        self.render_worker.start()
+
+    def pause_async_reading(self, pause: bool):
+        """
+        Stops or starts reading the port with the asyncio engine, for when
+        the terminal falls behind.
+
+        :param pause: Whether to stop reading.
+        """
+        connection = self.async_connection
+        if connection is not None:
+            connection.pause_reading(pause)
+
+    def set_render_limits(self, budget: int, policy: int):
+        """
+        Set how much received data can wait to be shown, and what to do with
+        what doesn't fit.
+
+        :param budget: The most bytes to have waiting.
+        :param policy: An int, use the constants in utils/serial_config
+        """
+        self.render_budget = budget
+        self.overload_policy = policy
+        worker = self.render_worker
+        if worker is not None:
+            worker.set_limits(budget, policy)
+
+    def unblock_render_worker(self):
+        """
+        Stops the render worker holding back whatever is reading, so it can
+        stop.
+        """
+        worker = self.render_worker
+        if worker is not None:
+            worker.unblock()
+
+    def render_batches_applied(self):
+        """
+        Called by the view once it has applied the last render batches, so
+        the next ones can be sent.
+        """
+        worker = self.render_worker
+        if worker is not None:
+            worker.ready()
+
+    def stop_receiving(self):
+        """
+        Hands anything still held back by the newline translator to the
+        receive batcher, and stops the batcher and the render worker.
+        """
+        self.unblock_render_worker()
+        rest = self.receive_translator.flush()
+        if rest:
+            self.receive_batcher.add(rest, monotonic_ns())
+        self.receive_batcher.stop()
+        worker = self.render_worker
+        if worker is not None:
+            worker.stop()
+
+    def handle_batch(self, data: bytes, timestamps: array):
+        """
+        Handles a batch of data from the receive batcher.
+
+        :param data: The data received.
+        :param timestamps: When each line that starts in the data started
+         arriving.
+        """
+        self.received_text.emit(data, timestamps)
+        worker = self.render_worker
+        if worker is not None:
+            worker.add(data, timestamps)
+
+    def handle_received(self, b: Union[bytes, memoryview], timestamp: int):
+        """
+        Handles data that was just read from the port, from whichever engine
+        read it.
+
+        :param b: The data received. A memoryview is only valid until this
+         returns, so everything that keeps it copies it.
+        :param timestamp: When it was received, from time.monotonic_ns().
+        """
+        metrics = self.metrics
+        metrics.bytes_received += len(b)
+        metrics.chunks_received += 1
+        metrics.read_sizes.add(len(b))
+        capture = self.capture
+        if capture is not None:
+            capture.write(b, timestamp)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.received(b, timestamp)
+        sender = self.sender
+        if sender is not None:
+            sender.notice_received(b)
+        if self.collect_raw:
+            self.add_raw_received(b)
+        b = self.receive_translator.translate(b)
+        if b:
+            engine = self.trigger_engine
+            if engine is not None:
+                # The matcher needs the methods of bytes
+                self.handle_triggers(engine.feed(bytes(b), timestamp),
+                                     timestamp)
+            self.receive_batcher.add(b, timestamp)
+
+    def set_collect_raw(self, do: bool):
+        """
+        Set whether to hold the data received exactly as it was, for the hex
+        dump. Anything held is thrown away when turned off.
+
+        :param do: Whether to or not.
+        """
+        self.collect_raw = do
+        if not do:
+            with self.raw_lock:
+                self.raw_pending = bytearray()
+
+    def add_raw_received(self, b: Union[bytes, memoryview]):
+        """
+        Holds data exactly as it was received for the hex dump, until the
+        GUI takes it.
+
+        :param b: The data received, which is copied.
+        """
+        with self.raw_lock:
+            if len(self.raw_pending) + len(b) > HEX_DUMP_MAX_PENDING:
+                self.raw_dropped += len(b)
+                return
+            was_empty = not self.raw_pending
+            self.raw_pending += b
+        if was_empty:
+            self.raw_received.emit()
+
+    def take_raw_received(self) -> bytes:
+        """
+        Takes the data received since this was last called, exactly as it
+        was received.
+
+        :return: A bytes object, which is empty if nothing was received.
+        """
+        with self.raw_lock:
+            data = bytes(self.raw_pending)
+            self.raw_pending.clear()
+        return data
+
+    def handle_triggers(self, hits: list[tuple[Trigger, int, int]],
+                        timestamp: int):
+        """
+        Marks the capture for the triggers that matched that want it, and
+        lets the view know about them all.
+
+        :param hits: The hits from TriggerEngine.feed().
+        :param timestamp: When the data they matched in was received.
+        """
+        if not hits:
+            return
+        capture = self.capture
+        if capture is not None:
+            for trigger, _, _ in hits:
+                if trigger.actions & TRIGGER_MARK:
+                    capture.mark(f"trigger {trigger.pattern}", timestamp)
+        self.triggered.emit(hits)
+
+    def handle_written(self, data: bytes):
+        """
+        Handles data that was just written to the port, from whichever engine
+        wrote it.
+
+        :param data: The data written.
+        """
+        self.metrics.add_sent(len(data))
+        with self.write_condition:
+            self.bytes_written += len(data)
+            self.write_condition.notify_all()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.sent(data)
+        data = self.echo_translator.translate(data)
+        self.local_echo_text.emit(data)
+        worker = self.render_worker
+        if self.local_echo and worker is not None:
+            worker.add(data, None, echo=True)
+
     def send(self, data: bytes):
         """
         Queue data to send through the serial port if we are connected.
@@ -127,7 +661,96 @@ class sercomModel(QObject):
         """
         if not self.connected:
             return
-        self.write_queue.put(data)
+        with self.write_condition:
+            self.bytes_queued += len(data)
+        connection = self.async_connection
+        if connection is not None:
+            connection.send(data)
+        else:
+            self.write_queue.put(data)
+
+    def wait_for_writes(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until everything sent so far has been written to the port.
+
+        :param timeout: The most seconds to wait, None to wait forever.
+        :return: Whether everything was written.
+        """
+        with self.write_condition:
+            target = self.bytes_queued
+            return self.write_condition.wait_for(
+                lambda: self.bytes_written >= target, timeout)
+
+    def start_send(self, source: Union[str, bytes]):
+        """
+        Starts streaming a file or some data through the port, paced with the
+        current send settings. Cancels what is currently being sent.
+
+        :param source: A path to a file, or a bytes object.
+        """
+        self.cancel_send()
+        logger.debug(f"Starting to send "
+                     f"{source if isinstance(source, str) else 'data'}")
+        self.sender = StreamSender(self, source, self.send_pacing,
+                                   self.send_rate,
+                                   self.send_line_delay_ms / 1000,
+                                   self.send_progress.emit,
+                                   self.send_finished.emit)
+        self.sender.start()
+
+    def cancel_send(self):
+        """
+        Cancels what is currently being sent, if anything.
+        """
+        sender = self.sender
+        if sender is not None and sender.running:
+            logger.debug("Canceling send")
+            sender.cancel()
+
+    @property
+    def sending(self) -> bool:
+        """
+        Returns whether a file or some data is being streamed.
+
+        :return: A boolean.
+        """
+        return self.sender is not None and self.sender.running
+
+    def metrics_snapshot(self, gauges: Optional[dict] = None) -> dict:
+        """
+        Takes a snapshot of the metrics of this session.
+
+        :param gauges: Current values from elsewhere (like the view) to
+         include.
+        :return: A dict that can be turned into JSON.
+        """
+        with self.write_condition:
+            queued = self.bytes_queued - self.bytes_written
+        capture = self.capture
+        recorder = self.recorder
+        worker = self.render_worker
+        return self.metrics.snapshot({
+            "write_queue_bytes": queued,
+            "capture_dropped": capture.dropped if capture is not None else 0,
+            "recording_dropped": recorder.dropped
+            if recorder is not None else 0,
+            "render_backlog_bytes": worker.outstanding
+            if worker is not None else 0,
+            "render_dropped": worker.dropped if worker is not None else 0,
+            "render_blocked_ns": worker.blocked_ns
+            if worker is not None else 0,
+            "hex_dump_dropped": self.raw_dropped,
+            **(gauges or {})
+        })
+
+    @property
+    def replaying(self) -> bool:
+        """
+        Returns whether a recording is being replayed.
+
+        :return: A boolean.
+        """
+        return self.replay is not None
 
     @property
     def connected(self) -> bool:
@@ -144,5 +767,20 @@ class sercomModel(QObject):
         """
         port = self.port.name
         logger.debug(f"Attempting to disconnect from port {port}")
+        self.cancel_send()
+        self.unblock_render_worker()
+        connection, self.async_connection = self.async_connection, None
+        if connection is not None:
+            # The port has to be unregistered from the loop before its file
+            # descriptor is closed
+            connection.stop()
+            self.stop_receiving()
+        else:
+            # Wake up the write thread so it can exit
+            self.write_queue.put(None)
+            self.stop_read_thread()
         self.port.close()
         logger.info(f"Successfully disconnected from port {port}!")
+        if connection is not None:
+            # With threads the read thread emits this once it notices
+            self.disconnected.emit()
@@ -0,0 +1,58 @@
+import logging
+
+from PyQt5.QtCore import QPoint
+
+from mvc.controller import sercomController
+from mvc.model import sercomModel
+from mvc.view import sercomView
+from utils.logger import create_logger
+from utils.startup import startup_timer
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+class sercomSessionManager:
+    """
+    Keeps track of all the sessions open in this process. Each session is a
+    window with its own model, view, controller and serial threads, but they
+    all share the one QApplication, its fonts and the settings.
+    """
+
+    def __init__(self):
+        """
+        Initialize the session manager.
+        """
+        logger.debug("Creating session manager")
+        self.sessions: list[sercomController] = []
+
+    def open_session(self) -> sercomController:
+        """
+        Opens a new session in a new window.
+
+        :return: The controller of the new session.
+        """
+        logger.debug(f"Opening session #{len(self.sessions) + 1}")
+        model = sercomModel()
+        view = sercomView()
+        startup_timer.lap("Constructing the view")
+        if len(self.sessions) > 0:
+            # Cascade new windows so they don't cover the last one exactly
+            last = self.sessions[-1].view
+            view.resize(last.size())
+            view.move(last.pos() + QPoint(30, 30))
+        view.show()
+        startup_timer.lap("Showing the window")
+        controller = sercomController(model, view, self)
+        startup_timer.lap("Constructing the controller")
+        self.sessions.append(controller)
+        return controller
+
+    def close_session(self, controller: sercomController):
+        """
+        Forgets about a session whose window was closed.
+
+        :param controller: The controller of the session.
+        """
+        if controller in self.sessions:
+            self.sessions.remove(controller)
+        logger.debug(f"Closed session, {len(self.sessions)} left")
@@ -1,11 +1,15 @@
 import logging
 import sys
+from array import array
+from time import monotonic, monotonic_ns, perf_counter_ns
 from traceback import format_exception
 from typing import Callable, Union, Optional, Any
 
-from PyQt5.QtCore import QSettings
-from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QMainWindow, QMenu, QActionGroup, QFontDialog
+from PyQt5.QtCore import Qt, QSettings, QTimer
+from PyQt5.QtGui import QFont, QCloseEvent
+from PyQt5.QtWidgets import QMainWindow, QMenu, QActionGroup, QFontDialog, \
+    QInputDialog, QFileDialog, QStackedWidget, QProgressBar, QWidget, \
+    QVBoxLayout, QApplication, QLabel
 from serial.serialutil import SerialException
 
 from ui.autogenerated.main_window import Ui_main_window
@@ -13,15 +17,32 @@ from ui.wrappers.dialogs.enter_custom_port_dialog import EnterCustomPortDialog
 from ui.wrappers.dialogs.set_baud_rate_dialog import SetBaudRateDialog
 from utils.dialogs import error_dlg, confirm_dangerous_dlg
 from utils.logger import create_logger
+from utils.metrics import MetricsExporter, METRICS_INTERVAL_MS, \
+    describe_snapshot
+from utils.recording import DEFAULT_REPLAY_SPEED, MAX_REPLAY_SPEED
+from utils.startup import startup_timer
+from utils.triggers import Trigger, TRIGGER_HIGHLIGHT, TRIGGER_ALERT, \
+    TRIGGER_PAUSE, TRIGGERS_HELP, parse_triggers
 from utils.serial_config import \
     DEFAULT_BAUD_RATE, BYTE_SIZES, DEFAULT_BYTE_SIZE, \
     PARITIES, DEFAULT_PARITY, STOP_BITS, DEFAULT_STOP_BIT, \
-    FLOW_CONTROLS, DEFAULT_FLOW_CONTROL, LINE_ENDINGS, DEFAULT_LINE_ENDING
+    FLOW_CONTROLS, DEFAULT_FLOW_CONTROL, LINE_ENDINGS, DEFAULT_LINE_ENDING, \
+    IO_ENGINES, DEFAULT_IO_ENGINE, DEFAULT_WRITE_COALESCE_MS, SEND_PACINGS, \
+    DEFAULT_SEND_PACING, DEFAULT_SEND_RATE, DEFAULT_SEND_LINE_DELAY_MS, \
+    OVERLOAD_POLICIES, DEFAULT_OVERLOAD_POLICY, DEFAULT_RENDER_BUDGET, \
+    MIN_RENDER_BUDGET
 from widgets.custom_plain_text_edit import CustomPlainTextEdit, \
-    get_default_font
+    get_default_font, DEFAULT_SCROLLBACK_LINES, DEFAULT_SCROLLBACK_CHARS, \
+    DEFAULT_RENDER_FPS, MAX_RENDER_FPS
+from widgets.hex_dump_view import HexDumpView
+from widgets.search_bar import SearchBar
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
+# How long to keep trying to highlight a line a trigger matched on, in case
+# it hasn't been drawn yet
+TRIGGER_HIGHLIGHT_TIMEOUT_NS = 5_000_000_000
+
 
 class sercomView(QMainWindow, Ui_main_window):
     """
@@ -34,13 +55,55 @@ class sercomView(QMainWindow, Ui_main_window):
         """
         logger.debug(f"Creating view")
         super().__init__()
+        self.setAttribute(Qt.WA_DeleteOnClose)
         self.setupUi(self)
         self.text_edit = CustomPlainTextEdit()
-        self.setCentralWidget(self.text_edit)
+        self.hex_dump_view = HexDumpView()
+        self.search_bar = SearchBar(self.text_edit)
+        self.search_bar.hide()
+        self.stacked_widget = QStackedWidget()
+        self.stacked_widget.addWidget(self.text_edit)
+        self.stacked_widget.addWidget(self.hex_dump_view)
+        self.stacked_widget.addWidget(self.search_bar.filter_view)
+        central_widget = QWidget()
+        layout = QVBoxLayout(central_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.stacked_widget)
+        layout.addWidget(self.search_bar)
+        self.setCentralWidget(central_widget)
+        # Progress bars can only count to 2 ** 31 - 1, so this is a fraction
+        self.send_progress_bar = QProgressBar()
+        self.send_progress_bar.setRange(0, 1000)
+        self.send_progress_bar.setMaximumWidth(200)
+        self.send_progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.send_progress_bar)
+        self.metrics_label = QLabel()
+        self.status_bar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_INTERVAL_MS)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.last_metrics = None
+        self.metrics_exporter = None
+        # Render batches are held until the next frame, and drawn together
+        self.pending_batches = []
+        self.render_fps = DEFAULT_RENDER_FPS
+        self.last_frame = 0
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setTimerType(Qt.PreciseTimer)
+        self.render_timer.timeout.connect(self.render_frame)
+        # Tuples of when a line to highlight started arriving and which of
+        # the lines that started then it is
+        self.pending_highlights = []
+        self.triggers_text = ""
         self.create_configuration_menu()
         self.connect_signals()
         self.auto_scroll = True
         self.local_echo = False
+        self.capture_rotation_size = 0
+        self.capture_rotation_time = 0
+        self.replay_speed = DEFAULT_REPLAY_SPEED
         self.settings = QSettings()
 
     def connect_signals(self):
@@ -59,6 +122,26 @@ class sercomView(QMainWindow, Ui_main_window):
         Connects the signals and slots together for the file menu.
         """
         self.action_new_session.triggered.connect(self.create_new_session)
+        self.action_export_scrollback.triggered.connect(self.export_scrollback)
+        self.action_send_file.triggered.connect(self.send_file)
+        self.action_send_clipboard.triggered.connect(self.send_clipboard)
+        self.action_cancel_send.triggered.connect(self.cancel_send)
+        self.action_start_capture.triggered.connect(self.start_capture)
+        self.action_stop_capture.triggered.connect(self.stop_capture)
+        self.action_capture_rotation_size.triggered.connect(
+            self.open_set_capture_rotation_size_dialog)
+        self.action_capture_rotation_time.triggered.connect(
+            self.open_set_capture_rotation_time_dialog)
+        self.action_start_recording.triggered.connect(self.start_recording)
+        self.action_stop_recording.triggered.connect(self.stop_recording)
+        self.action_replay_recording.triggered.connect(self.replay_recording)
+        self.action_stop_replay.triggered.connect(self.stop_replay)
+        self.action_replay_speed.triggered.connect(
+            self.open_set_replay_speed_dialog)
+        self.action_start_metrics_export.triggered.connect(
+            self.start_metrics_export)
+        self.action_stop_metrics_export.triggered.connect(
+            self.stop_metrics_export)
         self.action_exit.triggered.connect(self.close)
 
     def connect_signals_port_menu(self):
@@ -73,6 +156,12 @@ class sercomView(QMainWindow, Ui_main_window):
         (that weren't already connected when making the menu)
         """
         self.action_baud_rate.triggered.connect(self.open_set_baud_rate_dialog)
+        self.action_write_coalescing.triggered.connect(
+            self.open_set_write_coalescing_dialog)
+        self.action_send_rate.triggered.connect(self.open_set_send_rate_dialog)
+        self.action_send_line_delay.triggered.connect(
+            self.open_set_send_line_delay_dialog)
+        self.action_triggers.triggered.connect(self.open_set_triggers_dialog)
 
     def connect_signals_view_menu(self):
         """
@@ -80,7 +169,20 @@ class sercomView(QMainWindow, Ui_main_window):
         """
         self.action_auto_scroll.toggled.connect(self.set_auto_scroll)
         self.action_local_echo.toggled.connect(self.set_local_echo)
+        self.action_hex_dump.toggled.connect(self.set_hex_dump)
+        self.action_timestamps.toggled.connect(self.set_show_timestamps)
+        self.action_show_metrics.toggled.connect(self.set_show_metrics)
         self.action_change_font.triggered.connect(self.change_font)
+        self.action_scrollback_lines.triggered.connect(
+            self.open_set_scrollback_lines_dialog)
+        self.action_scrollback_size.triggered.connect(
+            self.open_set_scrollback_chars_dialog)
+        self.action_render_fps.triggered.connect(
+            self.open_set_render_fps_dialog)
+        self.action_render_budget.triggered.connect(
+            self.open_set_render_budget_dialog)
+        self.action_find.triggered.connect(self.search_bar.open)
+        self.search_bar.filter_toggled.connect(self.show_current_view)
 
     def connect_signals_about_menu(self):
         """
@@ -94,7 +196,13 @@ class sercomView(QMainWindow, Ui_main_window):
         """
         self.menu_connect_to_port.clear()
         self.menu_connect_actions = []
-        for path, name in self.controller.get_serial_ports():
+        ports = self.controller.get_serial_ports()
+        if ports is None:
+            looking_action = self.menu_connect_to_port.addAction(
+                "Looking for ports...")
+            looking_action.setEnabled(False)
+            ports = []
+        for path, name in ports:
             port_action = self.menu_connect_to_port.addAction(name)
             port_action.triggered.connect(
                 lambda _, p=path: self.connect_to_port(p))
@@ -113,21 +221,45 @@ class sercomView(QMainWindow, Ui_main_window):
         self.menu_connect_to_port.addSeparator()
         self.refresh_ports_action = self.menu_connect_to_port.addAction(
             "&Refresh port list...")
-        self.refresh_ports_action.triggered.connect(self.update_serial_ports)
+        self.refresh_ports_action.triggered.connect(self.refresh_serial_ports)
         tip = "Refresh the list of serial ports. "
         self.refresh_ports_action.setStatusTip(tip)
         self.refresh_ports_action.setToolTip(tip)
         self.menu_connect_actions.append(self.refresh_ports_action)
 
+    def refresh_serial_ports(self):
+        """
+        Looks for serial ports again. The menu updates by itself if any were
+        plugged in or unplugged since they were last looked for.
+        """
+        self.controller.refresh_serial_ports()
+        self.set_status("Refreshing the serial port list...")
+
+    def on_serial_ports_changed(self):
+        """
+        Updates the "ports" menu when a serial port is plugged in or
+        unplugged.
+        """
+        self.update_serial_ports()
+        self.update_menu_states()
+
     def update_menu_states(self):
         """
         Updates the menu states.
         """
         connected = self.controller.model.connected
+        replaying = self.controller.model.replaying
         for action in self.menu_connect_actions:
             if action != self.refresh_ports_action:
-                action.setEnabled(not connected)
+                action.setEnabled(not connected and not replaying)
+        self.action_replay_recording.setEnabled(not connected and
+                                                not replaying)
+        self.action_stop_replay.setEnabled(replaying)
         self.action_disconnect.setEnabled(connected)
+        sending = self.controller.model.sending
+        self.action_send_file.setEnabled(connected and not sending)
+        self.action_send_clipboard.setEnabled(connected and not sending)
+        self.action_cancel_send.setEnabled(sending)
 
     def after_controller_initialization(self):
         """
@@ -135,14 +267,25 @@ class sercomView(QMainWindow, Ui_main_window):
         """
         self.text_edit.controller = self.controller
         self.text_edit.after_controller_initialization()
-        self.controller.model.received_text.connect(self.on_received_text)
-        self.controller.model.local_echo_text.connect(self.on_local_echo)
+        self.controller.model.render_batches.connect(self.on_render_batches)
+        self.controller.model.raw_received.connect(self.schedule_frame)
         self.controller.model.disconnected.connect(self.disconnect_from_port)
+        self.controller.model.send_progress.connect(self.on_send_progress)
+        self.controller.model.send_finished.connect(self.on_send_finished)
+        self.controller.model.triggered.connect(self.on_triggered)
+        self.controller.model.replay_finished.connect(self.on_replay_finished)
+        self.controller.model.capture_failed.connect(self.on_capture_failed)
         self.controller.model.serial_params_changed.connect(
             lambda n: self.action_serial_configuration.setText(n))
+        self.controller.model.serial_ports_changed.connect(
+            lambda _: self.on_serial_ports_changed())
+        self.controller.watch_serial_ports()
         self.update_serial_ports()
         self.update_menu_states()
+        self.update_metrics_timer()
+        startup_timer.lap("Connecting the view")
         self.load_settings()
+        startup_timer.lap("Loading settings")
 
     def create_configuration_menu(self):
         """
@@ -195,6 +338,16 @@ class sercomView(QMainWindow, Ui_main_window):
                      DEFAULT_LINE_ENDING, "Set the line ending sent and "
                                           "received to {thing}",
                      self.set_line_ending)
+        make_options(self.menu_io_engine, IO_ENGINES, DEFAULT_IO_ENGINE,
+                     "Use the {thing} to read from and write to the port",
+                     self.set_io_engine)
+        make_options(self.menu_send_pacing, SEND_PACINGS, DEFAULT_SEND_PACING,
+                     "Pace files and pastes that are sent by {thing}",
+                     self.set_send_pacing)
+        make_options(self.menu_overload_policy, OVERLOAD_POLICIES,
+                     DEFAULT_OVERLOAD_POLICY,
+                     "When the terminal falls behind: {thing}",
+                     self.set_overload_policy)
 
     def save_value(self, group: str, key: str, value: Any):
         """
@@ -241,13 +394,52 @@ class sercomView(QMainWindow, Ui_main_window):
                         self.set_flow_control, int)
         self.load_value("line_ending", DEFAULT_LINE_ENDING,
                         self.set_line_ending, int)
+        self.load_value("io_engine", DEFAULT_IO_ENGINE,
+                        self.set_io_engine, int)
+        self.load_value("write_coalesce_ms", DEFAULT_WRITE_COALESCE_MS,
+                        self.set_write_coalescing, int)
+        self.load_value("send_pacing", DEFAULT_SEND_PACING,
+                        self.set_send_pacing, int)
+        self.load_value("send_rate", DEFAULT_SEND_RATE,
+                        self.set_send_rate, int)
+        self.load_value("send_line_delay_ms", DEFAULT_SEND_LINE_DELAY_MS,
+                        self.set_send_line_delay, int)
         self.settings.endGroup()
         self.settings.beginGroup("view")
         self.load_value("auto_scroll", True,
                         self.action_auto_scroll.setChecked, bool)
         self.load_value("local_echo", False,
                         self.action_local_echo.setChecked, bool)
+        self.load_value("hex_dump", False,
+                        self.action_hex_dump.setChecked, bool)
+        self.load_value("timestamps", False,
+                        self.action_timestamps.setChecked, bool)
+        self.load_value("show_metrics", True,
+                        self.action_show_metrics.setChecked, bool)
         self.load_value("font", get_default_font(), self.set_font, QFont)
+        self.load_value("scrollback_lines", DEFAULT_SCROLLBACK_LINES,
+                        self.set_scrollback_lines, int)
+        self.load_value("scrollback_chars", DEFAULT_SCROLLBACK_CHARS,
+                        self.set_scrollback_chars, int)
+        self.load_value("render_fps", DEFAULT_RENDER_FPS,
+                        self.set_render_fps, int)
+        self.load_value("overload_policy", DEFAULT_OVERLOAD_POLICY,
+                        self.set_overload_policy, int)
+        self.load_value("render_budget", DEFAULT_RENDER_BUDGET,
+                        self.set_render_budget, int)
+        self.settings.endGroup()
+        self.settings.beginGroup("capture")
+        self.load_value("rotation_size", 0,
+                        self.set_capture_rotation_size, int)
+        self.load_value("rotation_time", 0,
+                        self.set_capture_rotation_time, int)
+        self.settings.endGroup()
+        self.settings.beginGroup("recording")
+        self.load_value("replay_speed", DEFAULT_REPLAY_SPEED,
+                        self.set_replay_speed, float)
+        self.settings.endGroup()
+        self.settings.beginGroup("triggers")
+        self.load_value("list", "", self.set_triggers, str)
         self.settings.endGroup()
 
     def set_status(self, status: str):
@@ -270,14 +462,25 @@ class sercomView(QMainWindow, Ui_main_window):
 
     def create_new_session(self):
         """
-        "Forks" this process to create a new session that is independent of
-        the current session.
+        Opens a new session, in a new window, that is independent of the
+        current session.
         """
         logger.debug("Creating new session")
         self.set_status("Creating new session...")
         self.controller.create_new_session()
         self.set_status("Created new session.")
 
+    def closeEvent(self, e: QCloseEvent):
+        """
+        Cleans up the session when the window is closed.
+        """
+        logger.debug("Closing window")
+        self.controller.close_session()
+        self.stop_metrics_export()
+        self.search_bar.close_worker()
+        self.text_edit.spill.close()
+        super().closeEvent(e)
+
     def enter_custom_port(self):
         """
         Pops up a dialog to type a custom port, and try to connect if the user
@@ -432,6 +635,148 @@ class sercomView(QMainWindow, Ui_main_window):
             self.set_status(f"Successfully set line ending to {label}!")
         self.save_value("serial_port", "line_ending", ending)
 
+    def set_io_engine(self, engine: int, label: Optional[str] = None):
+        """
+        Set the I/O engine, which is used from the next time we connect.
+
+        :param engine: An int, use the constants in utils/serial_config
+        :param label: The labeled value, optional.
+        """
+        if label is not None:
+            self.set_status(f"Setting I/O engine to {label}...")
+        self.controller.set_io_engine(engine)
+        if label is not None:
+            self.set_status(f"Successfully set I/O engine to {label}, "
+                            f"reconnect to use it!")
+        self.save_value("serial_port", "io_engine", engine)
+
+    def open_set_write_coalescing_dialog(self):
+        """
+        Pops up a dialog to change how long to wait for more data to send
+        before writing to the port.
+        """
+        logger.debug("Opening set write coalescing window dialog")
+        ms, success = QInputDialog.getInt(
+            self, "sercom: Set write coalescing window",
+            "Milliseconds to wait for more data before writing "
+            "(0 to only combine what is already queued):",
+            self.controller.model.write_coalesce_ms, 0, 1000)
+        if success:
+            self.set_write_coalescing(ms)
+        else:
+            logger.debug("User canceled setting write coalescing window")
+            self.set_status("Canceled setting write coalescing window.")
+
+    def set_write_coalescing(self, ms: int):
+        """
+        Sets how long to wait for more data to send before writing to the
+        port.
+
+        :param ms: An int, in milliseconds.
+        """
+        self.controller.set_write_coalescing(ms)
+        self.set_status(f"Successfully set write coalescing window to "
+                        f"{ms} ms!")
+        self.save_value("serial_port", "write_coalesce_ms", ms)
+
+    def set_send_pacing(self, pacing: int, label: Optional[str] = None):
+        """
+        Set how files and pastes are paced when they are sent.
+
+        :param pacing: An int, use the constants in utils/serial_config
+        :param label: The labeled value, optional.
+        """
+        if label is not None:
+            self.set_status(f"Setting send pacing to {label}...")
+        self.controller.set_send_pacing(pacing)
+        if label is not None:
+            self.set_status(f"Successfully set send pacing to {label}!")
+        self.save_value("serial_port", "send_pacing", pacing)
+
+    def open_set_send_rate_dialog(self):
+        """
+        Pops up a dialog to change how many bytes per second files and pastes
+        are sent at.
+        """
+        logger.debug("Opening set send rate dialog")
+        rate, success = QInputDialog.getInt(
+            self, "sercom: Set send rate",
+            "Bytes per second to send at (0 for the line rate of the port):",
+            self.controller.model.send_rate, 0, 2 ** 31 - 1)
+        if success:
+            self.set_send_rate(rate)
+        else:
+            logger.debug("User canceled setting send rate")
+            self.set_status("Canceled setting send rate.")
+
+    def set_send_rate(self, rate: int):
+        """
+        Sets how many bytes per second files and pastes are sent at.
+
+        :param rate: An int, 0 for the line rate of the port.
+        """
+        self.controller.set_send_rate(rate)
+        self.set_status(f"Successfully set send rate to {rate} bytes per "
+                        f"second!")
+        self.save_value("serial_port", "send_rate", rate)
+
+    def open_set_send_line_delay_dialog(self):
+        """
+        Pops up a dialog to change how long to wait after each line of a file
+        or paste.
+        """
+        logger.debug("Opening set send line delay dialog")
+        ms, success = QInputDialog.getInt(
+            self, "sercom: Set send line delay",
+            "Milliseconds to wait after each line:",
+            self.controller.model.send_line_delay_ms, 0, 60000)
+        if success:
+            self.set_send_line_delay(ms)
+        else:
+            logger.debug("User canceled setting send line delay")
+            self.set_status("Canceled setting send line delay.")
+
+    def set_send_line_delay(self, ms: int):
+        """
+        Sets how long to wait after each line of a file or paste.
+
+        :param ms: An int, in milliseconds.
+        """
+        self.controller.set_send_line_delay(ms)
+        self.set_status(f"Successfully set send line delay to {ms} ms!")
+        self.save_value("serial_port", "send_line_delay_ms", ms)
+
+    def open_set_triggers_dialog(self):
+        """
+        Pops up a dialog to edit the triggers.
+        """
+        logger.debug("Opening set triggers dialog")
+        text, success = QInputDialog.getMultiLineText(
+            self, "sercom: Set triggers", TRIGGERS_HELP, self.triggers_text)
+        if success:
+            self.set_triggers(text)
+        else:
+            logger.debug("User canceled setting triggers")
+            self.set_status("Canceled setting triggers.")
+
+    def set_triggers(self, text: str):
+        """
+        Sets the triggers to watch for.
+
+        :param text: The triggers, one per line, see parse_triggers().
+        """
+        try:
+            triggers = parse_triggers(text)
+        except ValueError as e:
+            logger.warning(f"Failed to parse triggers: {e}")
+            self.set_status(f"Failed to set triggers! ({e})")
+            return
+        self.triggers_text = text
+        self.controller.set_triggers(triggers)
+        self.set_status(f"Successfully set {len(triggers)} trigger"
+                        f"{'s' if len(triggers) != 1 else ''}!")
+        self.save_value("triggers", "list", text)
+
     def set_auto_scroll(self, do: bool):
         """
         Sets auto scroll.
@@ -439,6 +784,7 @@ class sercomView(QMainWindow, Ui_main_window):
         :param do: Whether to enable auto scroll or not.
         """
         self.auto_scroll = do
+        self.hex_dump_view.auto_scroll = do
         logger.debug(f"Set auto scroll to {do}")
         if do:
             self.set_status("Enabled auto scroll.")
@@ -453,6 +799,7 @@ class sercomView(QMainWindow, Ui_main_window):
         :param do: Whether to enable local echo or not.
         """
         self.local_echo = do
+        self.controller.set_local_echo(do)
         logger.debug(f"Set local echo to {do}")
         if do:
             self.set_status("Enabled local echo.")
@@ -460,6 +807,102 @@ class sercomView(QMainWindow, Ui_main_window):
             self.set_status("Disabled local echo.")
         self.save_value("view", "local_echo", do)
 
+    def set_show_timestamps(self, do: bool):
+        """
+        Sets whether to show when each line was received.
+
+        :param do: Whether to show timestamps or not.
+        """
+        logger.debug(f"Set show timestamps to {do}")
+        self.text_edit.set_show_timestamps(do)
+        if do:
+            self.set_status("Showing timestamps.")
+        else:
+            self.set_status("Hiding timestamps.")
+        self.save_value("view", "timestamps", do)
+
+    def set_show_metrics(self, do: bool):
+        """
+        Sets whether to show the metrics in the status bar.
+
+        :param do: Whether to show the metrics or not.
+        """
+        logger.debug(f"Set show metrics to {do}")
+        self.metrics_label.setVisible(do)
+        self.update_metrics_timer()
+        if do:
+            self.set_status("Showing metrics.")
+        else:
+            self.set_status("Hiding metrics.")
+        self.save_value("view", "show_metrics", do)
+
+    def update_metrics_timer(self):
+        """
+        Takes snapshots of the metrics only while they are shown or exported.
+        """
+        if self.action_show_metrics.isChecked() or \
+                self.metrics_exporter is not None:
+            if not self.metrics_timer.isActive():
+                self.update_metrics()
+                self.metrics_timer.start()
+        else:
+            self.metrics_timer.stop()
+            self.last_metrics = None
+
+    def update_metrics(self):
+        """
+        Takes a snapshot of the metrics, shows it and exports it.
+        """
+        snapshot = self.controller.model.metrics_snapshot({
+            "document_lines": self.text_edit.line_count(),
+            "document_chars": self.text_edit.document().characterCount(),
+            "pending_batches": len(self.pending_batches)
+        })
+        if self.action_show_metrics.isChecked():
+            self.metrics_label.setText(describe_snapshot(snapshot,
+                                                         self.last_metrics))
+        self.last_metrics = snapshot
+        exporter = self.metrics_exporter
+        if exporter is not None:
+            try:
+                exporter.write(snapshot)
+            except OSError as exc:
+                logger.exception(f"Failed to export metrics to "
+                                 f"{exporter.path}!")
+                self.stop_metrics_export()
+                self.set_status(f"Stopped exporting metrics! ({exc})")
+
+    def set_hex_dump(self, do: bool):
+        """
+        Sets whether to show the data received as a hex dump instead of in
+        the terminal.
+
+        :param do: Whether to show the hex dump or not.
+        """
+        logger.debug(f"Set hex dump view to {do}")
+        # Only kept while shown, so a hidden hex dump costs nothing
+        self.controller.model.set_collect_raw(do)
+        if not do:
+            self.hex_dump_view.clear()
+        self.show_current_view()
+        if do:
+            self.set_status("Showing hex dump.")
+        else:
+            self.set_status("Showing terminal.")
+        self.save_value("view", "hex_dump", do)
+
+    def show_current_view(self):
+        """
+        Shows the hex dump if it is turned on, otherwise the lines matching
+        the search if filtering, otherwise the terminal.
+        """
+        if self.action_hex_dump.isChecked():
+            self.stacked_widget.setCurrentWidget(self.hex_dump_view)
+        elif self.search_bar.filtering():
+            self.stacked_widget.setCurrentWidget(self.search_bar.filter_view)
+        else:
+            self.stacked_widget.setCurrentWidget(self.text_edit)
+
     def set_font(self, font: QFont):
         """
         Sets the text edit's current font.
@@ -472,6 +915,8 @@ class sercomView(QMainWindow, Ui_main_window):
                 display_name += f" {attr.lower()}"
         logger.debug(f"User selected font: {display_name}")
         self.text_edit.setFont(font)
+        self.hex_dump_view.setFont(font)
+        self.search_bar.filter_view.setFont(font)
         self.set_status(f"Successfully set font to {display_name}!")
         self.save_value("view", "font", font)
 
@@ -490,6 +935,525 @@ class sercomView(QMainWindow, Ui_main_window):
             logger.debug("User canceled selecting font")
             self.set_status("Canceled setting a font.")
 
+    def open_set_scrollback_lines_dialog(self):
+        """
+        Pops up a dialog to change the maximum number of lines kept in the
+        terminal.
+        """
+        logger.debug("Opening set scrollback line limit dialog")
+        lines, success = QInputDialog.getInt(
+            self, "sercom: Set scrollback line limit",
+            "Maximum number of lines to keep (0 for no limit):",
+            self.text_edit.scrollback_lines, 0, 2 ** 31 - 1)
+        if success:
+            self.set_scrollback_lines(lines)
+        else:
+            logger.debug("User canceled setting scrollback line limit")
+            self.set_status("Canceled setting scrollback line limit.")
+
+    def set_scrollback_lines(self, lines: int):
+        """
+        Sets the maximum number of lines kept in the terminal.
+
+        :param lines: An int, 0 for no limit.
+        """
+        logger.debug(f"Set scrollback line limit to {lines}")
+        self.text_edit.scrollback_lines = lines
+        self.text_edit.trim_scrollback()
+        self.set_status(f"Successfully set scrollback line limit to {lines}!")
+        self.save_value("view", "scrollback_lines", lines)
+
+    def open_set_scrollback_chars_dialog(self):
+        """
+        Pops up a dialog to change the maximum number of characters kept in
+        the terminal.
+        """
+        logger.debug("Opening set scrollback size limit dialog")
+        chars, success = QInputDialog.getInt(
+            self, "sercom: Set scrollback size limit",
+            "Maximum number of characters to keep (0 for no limit):",
+            self.text_edit.scrollback_chars, 0, 2 ** 31 - 1)
+        if success:
+            self.set_scrollback_chars(chars)
+        else:
+            logger.debug("User canceled setting scrollback size limit")
+            self.set_status("Canceled setting scrollback size limit.")
+
+    def set_scrollback_chars(self, chars: int):
+        """
+        Sets the maximum number of characters kept in the terminal.
+
+        :param chars: An int, 0 for no limit.
+        """
+        logger.debug(f"Set scrollback size limit to {chars}")
+        self.text_edit.scrollback_chars = chars
+        self.text_edit.trim_scrollback()
+        self.set_status(f"Successfully set scrollback size limit to {chars}!")
+        self.save_value("view", "scrollback_chars", chars)
+
+    def open_set_render_fps_dialog(self):
+        """
+        Pops up a dialog to change how many times a second received data is
+        drawn.
+        """
+        logger.debug("Opening set frame rate dialog")
+        fps, success = QInputDialog.getInt(
+            self, "sercom: Set frame rate",
+            "Maximum number of times a second to redraw the terminal:",
+            self.render_fps, 1, MAX_RENDER_FPS)
+        if success:
+            self.set_render_fps(fps)
+        else:
+            logger.debug("User canceled setting frame rate")
+            self.set_status("Canceled setting frame rate.")
+
+    def set_render_fps(self, fps: int):
+        """
+        Sets how many times a second received data is drawn, at most.
+
+        :param fps: An int from 1 to MAX_RENDER_FPS.
+        """
+        fps = min(max(fps, 1), MAX_RENDER_FPS)
+        logger.debug(f"Set frame rate to {fps}")
+        self.render_fps = fps
+        self.set_status(f"Successfully set frame rate to {fps} FPS!")
+        self.save_value("view", "render_fps", fps)
+
+    def set_overload_policy(self, policy: int, label: Optional[str] = None):
+        """
+        Set what to do with received data when the terminal falls behind.
+
+        :param policy: An int, use the constants in utils/serial_config
+        :param label: The labeled value, optional.
+        """
+        if label is not None:
+            self.set_status(f"Setting overload policy to {label}...")
+        model = self.controller.model
+        self.controller.set_render_limits(model.render_budget, policy)
+        if label is not None:
+            self.set_status(f"Successfully set overload policy to {label}!")
+        self.save_value("view", "overload_policy", policy)
+
+    def open_set_render_budget_dialog(self):
+        """
+        Pops up a dialog to change how much received data can wait to be
+        shown.
+        """
+        logger.debug("Opening set terminal backlog limit dialog")
+        budget, success = QInputDialog.getInt(
+            self, "sercom: Set terminal backlog limit",
+            "Maximum number of bytes received to wait to be shown:",
+            self.controller.model.render_budget, MIN_RENDER_BUDGET,
+            2 ** 31 - 1)
+        if success:
+            self.set_render_budget(budget)
+        else:
+            logger.debug("User canceled setting terminal backlog limit")
+            self.set_status("Canceled setting terminal backlog limit.")
+
+    def set_render_budget(self, budget: int):
+        """
+        Sets how much received data can wait to be shown.
+
+        :param budget: An int, in bytes.
+        """
+        budget = max(budget, MIN_RENDER_BUDGET)
+        model = self.controller.model
+        self.controller.set_render_limits(budget, model.overload_policy)
+        self.set_status(f"Successfully set terminal backlog limit to "
+                        f"{budget} bytes!")
+        self.save_value("view", "render_budget", budget)
+
+    def export_scrollback(self):
+        """
+        Pops up a dialog to choose a file and saves the session's history
+        there.
+        """
+        logger.debug("Choosing file to export scrollback to")
+        self.set_status("Exporting scrollback...")
+        path, _ = QFileDialog.getSaveFileName(self,
+                                              "sercom: Export scrollback",
+                                              "", "Text files (*.txt)")
+        if not path:
+            logger.debug("User canceled exporting scrollback")
+            self.set_status("Canceled exporting scrollback.")
+            return
+        try:
+            self.text_edit.export_scrollback(path)
+        except OSError as exc:
+            self.set_status(f"Failed to export scrollback to {path}! ({exc})")
+            logger.exception(f"Failed to export scrollback to {path}!")
+            error_dlg("sercom: Failed to export scrollback!",
+                      f"Failed to export scrollback to {path}!",
+                      "".join(format_exception(*sys.exc_info())))
+        else:
+            self.set_status(f"Successfully exported scrollback to {path}!")
+
+    def send_file(self):
+        """
+        Pops up a dialog to choose a file and starts sending it through the
+        port.
+        """
+        logger.debug("Choosing file to send")
+        self.set_status("Sending file...")
+        path, _ = QFileDialog.getOpenFileName(self, "sercom: Send file", "",
+                                              "All files (*)")
+        if not path:
+            logger.debug("User canceled sending file")
+            self.set_status("Canceled sending file.")
+            return
+        self.controller.send_stream(path)
+        self.set_status(f"Sending {path}...")
+
+    def send_clipboard(self):
+        """
+        Starts sending the text on the clipboard through the port.
+        """
+        self.text_edit.send_clipboard()
+
+    def cancel_send(self):
+        """
+        Cancels sending a file or the clipboard.
+        """
+        self.set_status("Canceling send...")
+        self.controller.cancel_send()
+
+    def on_send_progress(self, sent: int, total: int):
+        """
+        Callback when more of a file or the clipboard was sent.
+
+        :param sent: How many bytes have been sent.
+        :param total: How many bytes there are to send.
+        """
+        permille = sent * 1000 // total if total > 0 else 1000
+        if not self.send_progress_bar.isVisible():
+            # Sends can also be started by pasting
+            self.send_progress_bar.show()
+            self.update_menu_states()
+        self.send_progress_bar.setValue(permille)
+        self.send_progress_bar.setFormat(f"{permille // 10}% of {total} bytes")
+
+    def on_send_finished(self, reason: str):
+        """
+        Callback when sending a file or the clipboard stopped.
+
+        :param reason: An empty str if everything was sent, otherwise why not.
+        """
+        self.send_progress_bar.hide()
+        if reason:
+            self.set_status(f"Stopped sending! ({reason})")
+        else:
+            self.set_status("Successfully sent everything!")
+        self.update_menu_states()
+
+    def on_triggered(self, hits: list[tuple[Trigger, int, int]]):
+        """
+        Callback when triggers matched in the data received.
+
+        :param hits: Tuples of the Trigger, when its line started arriving
+         and which of the lines that started then it is.
+        """
+        alerts = []
+        pause = False
+        for trigger, timestamp, index in hits:
+            if trigger.actions & TRIGGER_HIGHLIGHT:
+                self.pending_highlights.append((timestamp, index))
+            if trigger.actions & TRIGGER_ALERT and \
+                    trigger.pattern not in alerts:
+                alerts.append(trigger.pattern)
+            pause |= bool(trigger.actions & TRIGGER_PAUSE)
+        if pause and self.auto_scroll:
+            logger.debug("Pausing auto scroll for a trigger")
+            self.action_auto_scroll.setChecked(False)
+        if alerts:
+            self.set_status(f"Trigger matched: {', '.join(alerts)}")
+            QApplication.alert(self)
+        self.highlight_pending_lines()
+
+    def highlight_pending_lines(self):
+        """
+        Highlights the lines triggers matched on that have been drawn.
+        """
+        if not self.pending_highlights:
+            return
+        now = monotonic_ns()
+        pending = []
+        for timestamp, index in self.pending_highlights:
+            if self.text_edit.highlight_line(timestamp, index):
+                continue
+            if now - timestamp < TRIGGER_HIGHLIGHT_TIMEOUT_NS:
+                pending.append((timestamp, index))
+        self.pending_highlights = pending
+
+    def start_capture(self):
+        """
+        Pops up a dialog to choose a file and starts capturing the raw data
+        received to it.
+        """
+        logger.debug("Choosing file to capture to")
+        self.set_status("Starting capture...")
+        # Captures are appended to, so there is nothing to overwrite
+        path, _ = QFileDialog.getSaveFileName(
+            self, "sercom: Start capture", "", "Capture files (*.bin)",
+            options=QFileDialog.DontConfirmOverwrite)
+        if not path:
+            logger.debug("User canceled starting capture")
+            self.set_status("Canceled starting capture.")
+            return
+        try:
+            self.controller.start_capture(
+                path, self.capture_rotation_size * 1024 * 1024,
+                self.capture_rotation_time * 60)
+        except OSError as exc:
+            self.set_status(f"Failed to start capture to {path}! ({exc})")
+            logger.exception(f"Failed to start capture to {path}!")
+            error_dlg("sercom: Failed to start capture!",
+                      f"Failed to start capture to {path}!",
+                      "".join(format_exception(*sys.exc_info())))
+        else:
+            self.set_status(f"Capturing to {path}.")
+            self.action_stop_capture.setEnabled(True)
+
+    def stop_capture(self):
+        """
+        Stops capturing the raw data received.
+        """
+        self.set_status("Stopping capture...")
+        self.controller.stop_capture()
+        self.action_stop_capture.setEnabled(False)
+        self.set_status("Successfully stopped capture!")
+
+    def on_capture_failed(self, reason: str):
+        """
+        Callback when capturing stopped because writing the capture failed.
+
+        :param reason: Why it failed.
+        """
+        self.action_stop_capture.setEnabled(False)
+        self.set_status(f"Stopped capturing! ({reason})")
+        error_dlg("sercom: Capture failed!",
+                  "Writing the capture failed, so capturing was stopped!",
+                  reason)
+
+    def open_set_capture_rotation_size_dialog(self):
+        """
+        Pops up a dialog to change how big a capture file can get before a new
+        one is started.
+        """
+        logger.debug("Opening set capture rotation size dialog")
+        size, success = QInputDialog.getInt(
+            self, "sercom: Set capture rotation size",
+            "Start a new capture file after this many MiB (0 to never):",
+            self.capture_rotation_size, 0, 2 ** 31 - 1)
+        if success:
+            self.set_capture_rotation_size(size)
+        else:
+            logger.debug("User canceled setting capture rotation size")
+            self.set_status("Canceled setting capture rotation size.")
+
+    def set_capture_rotation_size(self, size: int):
+        """
+        Sets how big a capture file can get before a new one is started. Takes
+        effect the next time a capture is started.
+
+        :param size: An int in MiB, 0 for never.
+        """
+        logger.debug(f"Set capture rotation size to {size} MiB")
+        self.capture_rotation_size = size
+        self.set_status(f"Successfully set capture rotation size to "
+                        f"{size} MiB!")
+        self.save_value("capture", "rotation_size", size)
+
+    def open_set_capture_rotation_time_dialog(self):
+        """
+        Pops up a dialog to change how long a capture file is written to
+        before a new one is started.
+        """
+        logger.debug("Opening set capture rotation time dialog")
+        minutes, success = QInputDialog.getInt(
+            self, "sercom: Set capture rotation time",
+            "Start a new capture file after this many minutes (0 to never):",
+            self.capture_rotation_time, 0, 2 ** 31 - 1)
+        if success:
+            self.set_capture_rotation_time(minutes)
+        else:
+            logger.debug("User canceled setting capture rotation time")
+            self.set_status("Canceled setting capture rotation time.")
+
+    def set_capture_rotation_time(self, minutes: int):
+        """
+        Sets how long a capture file is written to before a new one is
+        started. Takes effect the next time a capture is started.
+
+        :param minutes: An int in minutes, 0 for never.
+        """
+        logger.debug(f"Set capture rotation time to {minutes} minutes")
+        self.capture_rotation_time = minutes
+        self.set_status(f"Successfully set capture rotation time to "
+                        f"{minutes} minutes!")
+        self.save_value("capture", "rotation_time", minutes)
+
+    def start_metrics_export(self):
+        """
+        Pops up a dialog to choose a file and starts appending snapshots of
+        the metrics to it.
+        """
+        logger.debug("Choosing file to export metrics to")
+        self.set_status("Starting to export metrics...")
+        # Snapshots are appended to, so there is nothing to overwrite
+        path, _ = QFileDialog.getSaveFileName(
+            self, "sercom: Export metrics", "", "JSON lines (*.jsonl)",
+            options=QFileDialog.DontConfirmOverwrite)
+        if not path:
+            logger.debug("User canceled exporting metrics")
+            self.set_status("Canceled exporting metrics.")
+            return
+        self.stop_metrics_export()
+        try:
+            self.metrics_exporter = MetricsExporter(path)
+        except OSError as exc:
+            self.set_status(f"Failed to export metrics to {path}! ({exc})")
+            logger.exception(f"Failed to export metrics to {path}!")
+            error_dlg("sercom: Failed to export metrics!",
+                      f"Failed to export metrics to {path}!",
+                      "".join(format_exception(*sys.exc_info())))
+        else:
+            self.set_status(f"Exporting metrics to {path}.")
+            self.action_stop_metrics_export.setEnabled(True)
+            self.update_metrics_timer()
+
+    def stop_metrics_export(self):
+        """
+        Stops exporting metrics, if we are.
+        """
+        exporter, self.metrics_exporter = self.metrics_exporter, None
+        if exporter is None:
+            return
+        exporter.close()
+        self.action_stop_metrics_export.setEnabled(False)
+        self.update_metrics_timer()
+        self.set_status("Stopped exporting metrics.")
+
+    def start_recording(self):
+        """
+        Pops up a dialog to choose a file and starts recording the raw data
+        received and sent to it.
+        """
+        logger.debug("Choosing file to record to")
+        self.set_status("Starting recording...")
+        path, _ = QFileDialog.getSaveFileName(
+            self, "sercom: Start recording", "",
+            "Recordings (*.sercomrec)")
+        if not path:
+            logger.debug("User canceled starting recording")
+            self.set_status("Canceled starting recording.")
+            return
+        try:
+            self.controller.start_recording(path)
+        except OSError as exc:
+            self.set_status(f"Failed to start recording to {path}! ({exc})")
+            logger.exception(f"Failed to start recording to {path}!")
+            error_dlg("sercom: Failed to start recording!",
+                      f"Failed to start recording to {path}!",
+                      "".join(format_exception(*sys.exc_info())))
+        else:
+            self.set_status(f"Recording to {path}.")
+            self.action_stop_recording.setEnabled(True)
+
+    def stop_recording(self):
+        """
+        Stops recording the raw data received and sent.
+        """
+        self.set_status("Stopping recording...")
+        self.controller.stop_recording()
+        self.action_stop_recording.setEnabled(False)
+        self.set_status("Successfully stopped recording!")
+
+    def replay_recording(self):
+        """
+        Pops up a dialog to choose a recording and replays it as if it was
+        being received, at the replay speed.
+        """
+        logger.debug("Choosing recording to replay")
+        self.set_status("Replaying recording...")
+        path, _ = QFileDialog.getOpenFileName(
+            self, "sercom: Replay recording", "",
+            "Recordings (*.sercomrec);;All files (*)")
+        if not path:
+            logger.debug("User canceled replaying recording")
+            self.set_status("Canceled replaying recording.")
+            return
+        try:
+            self.controller.start_replay(path, self.replay_speed)
+        except (OSError, ValueError) as exc:
+            self.set_status(f"Failed to replay {path}! ({exc})")
+            logger.exception(f"Failed to replay {path}!")
+            error_dlg("sercom: Failed to replay recording!",
+                      f"Failed to replay {path}!",
+                      "".join(format_exception(*sys.exc_info())))
+        else:
+            self.set_status(f"Replaying {path}...")
+            self.set_port_status(f"Replaying {path}.")
+            self.text_edit.setPlaceholderText("Nothing was replayed.")
+            self.setWindowTitle(f"sercom - {path}")
+            self.update_menu_states()
+
+    def stop_replay(self):
+        """
+        Stops replaying the recording.
+        """
+        self.set_status("Stopping replay...")
+        self.controller.stop_replay()
+
+    def on_replay_finished(self, reason: str):
+        """
+        Callback when replaying a recording stopped.
+
+        :param reason: An empty str if the whole recording was replayed,
+         otherwise why not.
+        """
+        if reason:
+            self.set_status(f"Stopped replaying! ({reason})")
+        else:
+            self.set_status("Successfully replayed the recording!")
+        self.set_port_status("Finished replaying.")
+        self.text_edit.setPlaceholderText("Not connected to a port.")
+        self.setWindowTitle("sercom")
+        self.update_menu_states()
+
+    def open_set_replay_speed_dialog(self):
+        """
+        Pops up a dialog to change how fast recordings are replayed.
+        """
+        logger.debug("Opening set replay speed dialog")
+        speed, success = QInputDialog.getDouble(
+            self, "sercom: Set replay speed",
+            "Replay recordings this many times faster than real time (0 for "
+            "as fast as possible):",
+            self.replay_speed, 0, MAX_REPLAY_SPEED, 2)
+        if success:
+            self.set_replay_speed(speed)
+        else:
+            logger.debug("User canceled setting replay speed")
+            self.set_status("Canceled setting replay speed.")
+
+    def set_replay_speed(self, speed: float):
+        """
+        Sets how fast recordings are replayed. Takes effect the next time a
+        recording is replayed.
+
+        :param speed: How many times faster than real time, 0 for as fast as
+         possible.
+        """
+        logger.debug(f"Set replay speed to {speed}x")
+        self.replay_speed = speed
+        if speed == 0:
+            self.set_status("Successfully set replay speed to as fast as "
+                            "possible!")
+        else:
+            self.set_status(f"Successfully set replay speed to {speed:g}x!")
+        self.save_value("recording", "replay_speed", speed)
+
     def reset_app(self):
         """
         Clears the application data to reset the app.
@@ -515,22 +1479,57 @@ class sercomView(QMainWindow, Ui_main_window):
             logger.debug("User canceled application reset.")
             self.set_status("Canceled application reset.")
 
-    def on_received_text(self, data: bytes):
+    def on_render_batches(self, batches: list):
         """
-        Callback when we receive text.
+        Callback when data was received or echoed, and has been decoded and
+        parsed.
 
-        :param data: The data received
+        :param batches: A list of tuples of the data, the operations to
+         apply and the line start timestamps (or None for now).
         """
-        self.text_edit.process_tty_data(data)
-        if self.auto_scroll:
-            self.text_edit.ensureCursorVisible()
+        self.pending_batches.extend(batches)
+        self.schedule_frame()
 
-    def on_local_echo(self, text: bytes):
+    def schedule_frame(self):
         """
-        Callback when we actually send data, for "local echo."
-
-        :param text: A str.
+        Draws what arrived in the next frame.
         """
-        if not self.local_echo:
+        if self.render_timer.isActive():
             return
-        self.on_received_text(text)
+        # Draw right away if the last frame was long enough ago, otherwise
+        # wait for the next one
+        next_frame = self.last_frame + 1 / self.render_fps
+        self.render_timer.start(max(int((next_frame - monotonic()) * 1000),
+                                    0))
+
+    def render_frame(self):
+        """
+        Draws everything that arrived since the last frame, with the
+        terminal's updates turned off until it is all in and one scroll to
+        the cursor at the end, then lets the model send more.
+        """
+        self.last_frame = monotonic()
+        # The hex dump shows what came over the wire, before newlines are
+        # translated or anything is dropped
+        raw = self.controller.model.take_raw_received()
+        if raw:
+            self.hex_dump_view.append(raw)
+        batches = self.pending_batches
+        self.pending_batches = []
+        if not batches:
+            return
+        start = perf_counter_ns()
+        self.text_edit.setUpdatesEnabled(False)
+        try:
+            for _, ops, timestamps in batches:
+                self.text_edit.apply_ops(ops, timestamps)
+        finally:
+            self.text_edit.setUpdatesEnabled(True)
+        self.highlight_pending_lines()
+        if self.auto_scroll and not self.search_bar.holding_scroll():
+            self.text_edit.ensureCursorVisible()
+        metrics = self.controller.model.metrics
+        metrics.frames += 1
+        metrics.batches_coalesced += len(batches) - 1
+        metrics.apply_times.add(perf_counter_ns() - start)
+        self.controller.model.render_batches_applied()
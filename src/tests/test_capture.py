@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from threading import Event
+
+from mvc.model import sercomModel
+from utils.capture import CaptureWriter, find_offset, index_path_for, \
+    CAPTURE_INDEX_INTERVAL
+
+
+class FullDisk:
+    def write(self, data: bytes):
+        raise OSError(28, "No space left on device")
+
+    def close(self):
+        pass
+
+
+class CaptureTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "capture.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_find_offset(self):
+        capture = CaptureWriter(self.path)
+        capture.start()
+        for i in range(100):
+            capture.write(b"0123456789", (i + 1) * CAPTURE_INDEX_INTERVAL)
+        capture.stop()
+        self.assertEqual(find_offset(self.path, 0), 0)
+        self.assertEqual(find_offset(self.path, CAPTURE_INDEX_INTERVAL), 0)
+        self.assertEqual(find_offset(self.path,
+                                     50 * CAPTURE_INDEX_INTERVAL + 1), 490)
+        self.assertEqual(find_offset(self.path, 1000 * CAPTURE_INDEX_INTERVAL),
+                         990)
+
+    def test_find_offset_ignores_a_partly_written_entry(self):
+        capture = CaptureWriter(self.path)
+        capture.start()
+        capture.write(b"abc", CAPTURE_INDEX_INTERVAL)
+        capture.stop()
+        with open(index_path_for(self.path), "ab") as file:
+            file.write(b"\xff" * 12)
+        self.assertEqual(find_offset(self.path, 2 * CAPTURE_INDEX_INTERVAL),
+                         0)
+
+    def test_find_offset_with_an_empty_index(self):
+        open(index_path_for(self.path), "wb").close()
+        self.assertEqual(find_offset(self.path, 1), 0)
+
+    def test_write_failure_stops_the_capture(self):
+        failed = Event()
+        reasons = []
+
+        def on_failed(reason: str):
+            reasons.append(reason)
+            failed.set()
+
+        capture = CaptureWriter(self.path, on_failed=on_failed)
+        capture.start()
+        capture.file.close()
+        capture.file = FullDisk()
+        capture.write(b"abc")
+        self.assertTrue(failed.wait(5))
+        capture.thread.join(5)
+        self.assertFalse(capture.running)
+        self.assertIn("No space left on device", reasons[0])
+
+    def test_write_failure_detaches_the_capture(self):
+        model = sercomModel()
+        model.start_capture(self.path)
+        capture = model.capture
+        capture.file.close()
+        capture.file = FullDisk()
+        capture.write(b"abc")
+        capture.thread.join(5)
+        self.assertIsNone(model.capture)
+
+
+if __name__ == "__main__":
+    unittest.main()
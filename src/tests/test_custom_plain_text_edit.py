@@ -0,0 +1,25 @@
+import os
+import sys
+import unittest
+
+from PyQt5.QtWidgets import QApplication
+
+from utils.vt100 import VT100Parser
+from widgets.custom_plain_text_edit import CustomPlainTextEdit
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class ApplyOpsTest(unittest.TestCase):
+    def test_huge_cursor_moves_stay_in_the_document(self):
+        text_edit = CustomPlainTextEdit()
+        text_edit.apply_ops(VT100Parser().feed(
+            "hello\x1b[99999999999D\x1b[99999999999C\x1b[99999999999A"
+            "\x1b[99999999999B\x1b[99999999999DJ"
+        ))
+        self.assertEqual(text_edit.toPlainText(), "Jello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from time import monotonic_ns
+
+from mvc.model import sercomModel
+from utils.batcher import ReceiveBatcher
+from utils.serial_config import NEWLINE_CR
+
+
+class RawReceivedTest(unittest.TestCase):
+    def test_cr_mode_input_is_unmodified(self):
+        model = sercomModel()
+        model.set_collect_raw(True)
+        model.set_newline_mode(NEWLINE_CR)
+        batches = []
+        model.receive_batcher = ReceiveBatcher(
+            lambda data, _: batches.append(data), 1, 1
+        )
+        data = b"a\rb\r\n\x00\xff"
+        model.handle_received(memoryview(data), monotonic_ns())
+        self.assertEqual(model.take_raw_received(), data)
+        self.assertEqual(model.take_raw_received(), b"")
+        # Whereas the text shown is translated
+        self.assertNotEqual(b"".join(batches), data)
+
+    def test_nothing_is_collected_while_the_hex_dump_is_hidden(self):
+        model = sercomModel()
+        model.receive_batcher = ReceiveBatcher(lambda data, _: None, 1, 1)
+        model.handle_received(b"abc", monotonic_ns())
+        self.assertEqual(model.take_raw_received(), b"")
+        model.set_collect_raw(True)
+        model.handle_received(b"def", monotonic_ns())
+        model.set_collect_raw(False)
+        self.assertEqual(model.take_raw_received(), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from threading import Thread
+
+from utils.metrics import SessionMetrics
+
+
+class SessionMetricsTest(unittest.TestCase):
+    def test_sent_from_many_threads_is_all_counted(self):
+        metrics = SessionMetrics()
+
+        def send():
+            for _ in range(10000):
+                metrics.add_sent(3)
+                metrics.add_batch_delay(5)
+
+        threads = [Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["chunks_sent"], 40000)
+        self.assertEqual(snapshot["bytes_sent"], 120000)
+        self.assertEqual(snapshot["batch_delays"]["count"], 40000)
+
+
+if __name__ == "__main__":
+    unittest.main()
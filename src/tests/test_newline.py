@@ -0,0 +1,66 @@
+import unittest
+
+from utils.newline import NewlineTranslator
+from utils.serial_config import NEWLINE_LF, NEWLINE_CR, NEWLINE_CRLF
+
+
+def translate_all(translator: NewlineTranslator, *chunks: bytes) -> bytes:
+    return b"".join(bytes(translator.translate(memoryview(chunk)))
+                    for chunk in chunks) + translator.flush()
+
+
+class NewlineTranslatorTest(unittest.TestCase):
+    def test_crlf_split_across_chunks_is_one_line_ending(self):
+        translator = NewlineTranslator(NEWLINE_CRLF)
+        self.assertEqual(bytes(translator.translate(b"a\r")), b"a")
+        self.assertEqual(bytes(translator.translate(b"\nb")), b"\nb")
+
+    def test_lone_carriage_return_is_kept(self):
+        self.assertEqual(
+            translate_all(NewlineTranslator(NEWLINE_CRLF), b"1\r2\r\n"),
+            b"1\r2\n"
+        )
+
+    def test_trailing_carriage_return_is_held_back(self):
+        translator = NewlineTranslator(NEWLINE_CRLF)
+        self.assertEqual(bytes(translator.translate(b"50%\r")), b"50%")
+        self.assertEqual(bytes(translator.translate(b"60%")), b"\r60%")
+        self.assertEqual(bytes(translator.translate(b"\r")), b"")
+        self.assertEqual(translator.flush(), b"\r")
+
+    def test_carriage_return_mode(self):
+        self.assertEqual(
+            translate_all(NewlineTranslator(NEWLINE_CR), b"a\r", b"b\r\n"),
+            b"a\nb\n\n"
+        )
+
+    def test_line_feed_mode_is_unchanged(self):
+        for echo in (False, True):
+            translator = NewlineTranslator(NEWLINE_LF, echo)
+            self.assertEqual(translate_all(translator, b"a\rb\r\n"),
+                             b"a\rb\r\n")
+
+    def test_echo_carriage_return_is_a_new_line(self):
+        self.assertEqual(
+            translate_all(NewlineTranslator(NEWLINE_CRLF, echo=True),
+                          b"a\r", b"b\r\n"),
+            b"a\nb\n"
+        )
+
+    def test_held_back_carriage_return_survives_a_mode_switch(self):
+        for mode, expected in ((NEWLINE_CR, b"a\nb"),
+                               (NEWLINE_LF, b"a\rb"),
+                               (NEWLINE_CRLF, b"a\rb")):
+            translator = NewlineTranslator(NEWLINE_CRLF)
+            first = bytes(translator.translate(b"a\r"))
+            translator.set_mode(mode)
+            self.assertEqual(first + translate_all(translator, b"b"),
+                             expected)
+
+    def test_unchanged_memoryview_is_not_copied(self):
+        data = memoryview(b"no line endings")
+        self.assertIs(NewlineTranslator(NEWLINE_CRLF).translate(data), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from threading import Event
+from time import monotonic_ns
+
+from utils.recording import SessionRecorder, ReplaySource, read_header, \
+    read_records, RECORDING_HEADER, RECORDING_MAGIC, RECORDING_RECORD, \
+    RECORD_RECEIVED, RECORD_SENT, REPLAY_AS_FAST_AS_POSSIBLE
+
+MS = 1_000_000
+CHUNKS = [
+    (1000 * MS, RECORD_RECEIVED, b"hello\r\n"),
+    (1060 * MS, RECORD_SENT, b"ls\r"),
+    (1080 * MS, RECORD_RECEIVED, bytes(range(256))),
+    (1150 * MS, RECORD_RECEIVED, b"done\n")
+]
+
+
+class RecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "session.rec")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self):
+        recorder = SessionRecorder(self.path)
+        recorder.start()
+        for timestamp, direction, data in CHUNKS:
+            recorder.add(direction, data, timestamp)
+        recorder.stop()
+
+    def replay(self, speed: float) -> tuple[list, str]:
+        events = []
+        reasons = []
+        finished = Event()
+
+        def on_finished(reason: str):
+            reasons.append(reason)
+            finished.set()
+
+        replay = ReplaySource(
+            self.path, speed,
+            lambda data, _: events.append(
+                (monotonic_ns(), RECORD_RECEIVED, data)),
+            lambda data: events.append((monotonic_ns(), RECORD_SENT, data)),
+            on_finished
+        )
+        replay.start()
+        self.assertTrue(finished.wait(10))
+        replay.stop()
+        return events, reasons[0]
+
+    def test_records_read_back_the_same(self):
+        self.record()
+        with open(self.path, "rb") as file:
+            read_header(file)
+            self.assertEqual(list(read_records(file)), CHUNKS)
+
+    def test_replay_keeps_the_bytes_and_timing(self):
+        self.record()
+        events, reason = self.replay(1)
+        self.assertEqual(reason, "")
+        self.assertEqual([(direction, data) for _, direction, data in events],
+                         [(direction, data) for _, direction, data in CHUNKS])
+        start = events[0][0]
+        for (time, _, _), (recorded, _, _) in zip(events, CHUNKS):
+            expected = recorded - CHUNKS[0][0]
+            self.assertGreaterEqual(time - start, expected - MS)
+            self.assertLess(time - start, expected + 40 * MS)
+
+    def test_replay_as_fast_as_possible_joins_received_chunks(self):
+        self.record()
+        events, reason = self.replay(REPLAY_AS_FAST_AS_POSSIBLE)
+        self.assertEqual(reason, "")
+        self.assertEqual([(direction, data) for _, direction, data in events],
+                         [(RECORD_RECEIVED, b"hello\r\n"),
+                          (RECORD_SENT, b"ls\r"),
+                          (RECORD_RECEIVED, bytes(range(256)) + b"done\n")])
+
+    def test_truncated_recording_replays_what_is_complete(self):
+        self.record()
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 2)
+        events, reason = self.replay(REPLAY_AS_FAST_AS_POSSIBLE)
+        self.assertEqual(reason, "")
+        self.assertEqual(b"".join(data for _, _, data in events),
+                         b"hello\r\nls\r" + bytes(range(256)))
+
+    def test_corrupt_record_stops_the_replay(self):
+        with open(self.path, "wb") as file:
+            file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, 1, 0))
+            file.write(RECORDING_RECORD.pack(0, RECORD_RECEIVED, 2) + b"ok")
+            file.write(RECORDING_RECORD.pack(0, 7, 2 ** 32 - 1))
+        events, reason = self.replay(1)
+        self.assertEqual(reason, "Recording is corrupt")
+        self.assertEqual([data for _, _, data in events], [b"ok"])
+
+    def test_not_a_recording(self):
+        for header in (b"SERCOM", b"NOTSERCM" + bytes(10),
+                       RECORDING_HEADER.pack(RECORDING_MAGIC, 99, 0)):
+            with open(self.path, "wb") as file:
+                file.write(header)
+            with self.assertRaises(ValueError):
+                ReplaySource(self.path, 1, print, print, print).start()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from mmap import mmap, ACCESS_READ
+
+from utils.scrollback import ScrollbackSpill, SPILL_INDEX_INTERVAL
+from utils.search import SearchRequest, SearchWorker, make_pattern
+
+SPILLED = 3 * SPILL_INDEX_INTERVAL + 100
+NEEDLES = {0, 1, SPILL_INDEX_INTERVAL - 1, SPILL_INDEX_INTERVAL,
+           2 * SPILL_INDEX_INTERVAL, SPILLED - 1, SPILLED, SPILLED + 5}
+
+
+def line_text(i: int) -> str:
+    # Lines of different lengths, some of them not ASCII
+    text = f"line {i} " + "é" * (i % 7)
+    return text + " needle" if i in NEEDLES else text
+
+
+def make_spill() -> ScrollbackSpill:
+    spill = ScrollbackSpill()
+    lines = [line_text(i) + "\n" for i in range(SPILLED)]
+    # Appended in pieces of different sizes, some covering more than a block
+    i = 0
+    step = 1
+    while i < len(lines):
+        spill.append("".join(lines[i:i + step]))
+        i += step
+        step = step * 3 % 2500 + 1
+    return spill
+
+
+class ScrollbackSpillTest(unittest.TestCase):
+    def test_line_offsets_across_blocks(self):
+        spill = make_spill()
+        try:
+            spill.flush()
+            self.assertEqual(spill.line_count, SPILLED)
+            expected = [0]
+            for i in range(SPILLED):
+                expected.append(expected[-1] +
+                                len((line_text(i) + "\n").encode("utf-8")))
+            self.assertEqual(spill.size, expected[-1])
+            self.assertEqual(list(spill.index),
+                             expected[::SPILL_INDEX_INTERVAL])
+            with mmap(spill.file.fileno(), spill.size,
+                      access=ACCESS_READ) as data:
+                offsets = []
+                for block in range(len(spill.index)):
+                    block_offsets = spill.block_offsets(
+                        data, block, spill.line_count, spill.size)
+                    # Each block ends where the next one starts
+                    if offsets:
+                        self.assertEqual(offsets.pop(), block_offsets[0])
+                    offsets.extend(block_offsets)
+            self.assertEqual(offsets, expected)
+        finally:
+            spill.close()
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.spill = make_spill()
+        self.doc_lines = [line_text(i) for i in range(SPILLED, SPILLED + 50)]
+        self.worker = SearchWorker(lambda results: None)
+        self.worker.running = True
+
+    def tearDown(self):
+        self.spill.close()
+
+    def search(self, text: str, generation: int = 1, from_line: int = 0,
+               refine_below: int = 0) -> tuple:
+        request = SearchRequest(generation,
+                                make_pattern(text, False, False), True,
+                                from_line, refine_below, self.spill,
+                                SPILLED, self.doc_lines)
+        self.worker.generation = generation
+        return self.worker.run(request)
+
+    def test_spilled_and_document_lines(self):
+        _, _, found, texts = self.search("NEEDLE")
+        self.assertEqual(list(found), sorted(NEEDLES))
+        self.assertEqual(texts, [line_text(i) for i in sorted(NEEDLES)])
+
+    def test_from_a_line(self):
+        self.search("needle")
+        start = SPILL_INDEX_INTERVAL + 1
+        _, from_line, found, _ = self.search("needle", from_line=start)
+        self.assertEqual(from_line, start)
+        self.assertEqual(list(found), sorted(i for i in NEEDLES if i >= start))
+        self.assertEqual(list(self.worker.matches), sorted(NEEDLES))
+
+    def test_refine(self):
+        self.search("needle")
+        _, _, found, _ = self.search("é needle", generation=2,
+                                     refine_below=SPILLED)
+        self.assertEqual(list(found),
+                         sorted(i for i in NEEDLES if i % 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import mmap
+import os
+import tempfile
+import unittest
+from threading import Event
+from unittest import mock
+
+from utils.sender import StreamSender, TokenBucket
+from utils.serial_config import SEND_PACING_RATE, SEND_PACING_LINE_DELAY
+
+
+class FakeModel:
+    def __init__(self):
+        self.connected = True
+        self.sent = []
+
+    def send(self, data: bytes):
+        self.sent.append(data)
+
+    def wait_for_writes(self, timeout: float) -> bool:
+        return True
+
+
+def make_sender(model: FakeModel, pacing: int, rate: int = 0) -> StreamSender:
+    return StreamSender(model, b"", pacing, rate, 0, lambda sent, total: None,
+                        lambda reason: None)
+
+
+class FindLineEndTest(unittest.TestCase):
+    def test_line_endings(self):
+        find = StreamSender.find_line_end
+        self.assertEqual(find(b"ab\ncd", 0, 5), 3)
+        self.assertEqual(find(b"ab\rcd", 0, 5), 3)
+        self.assertEqual(find(b"ab\r\ncd", 0, 6), 4)
+        self.assertEqual(find(b"ab\n\rcd", 0, 6), 3)
+        self.assertEqual(find(b"abcd", 0, 4), -1)
+        self.assertEqual(find(b"ab\ncd", 3, 5), -1)
+        # Nothing after the "\r"
+        self.assertEqual(find(b"ab\r", 0, 3), 3)
+
+    def test_crlf_across_the_window_of_a_memory_map(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b"abc\r\ndef")
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                self.assertEqual(StreamSender.find_line_end(m, 0, 4), 5)
+                self.assertEqual(StreamSender.find_line_end(m, 0, 8), 5)
+                self.assertEqual(StreamSender.find_line_end(m, 5, 8), -1)
+
+
+class SendDataTest(unittest.TestCase):
+    def test_one_line_at_a_time(self):
+        model = FakeModel()
+        sender = make_sender(model, SEND_PACING_LINE_DELAY)
+        self.assertEqual(sender.send_data(b"one\r\ntwo\rthree\nfour"), "")
+        self.assertEqual(model.sent,
+                         [b"one\r\n", b"two\r", b"three\n", b"four"])
+
+    def test_lines_from_a_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            file.write(b"x" * 4095 + b"\r\n" + b"y\n")
+        try:
+            model = FakeModel()
+            sender = StreamSender(model, file.name, SEND_PACING_LINE_DELAY, 0,
+                                  0, lambda sent, total: None,
+                                  lambda reason: None)
+            sender.send_thread()
+            self.assertEqual(model.sent, [b"x" * 4095 + b"\r\n", b"y\n"])
+        finally:
+            os.remove(file.name)
+
+    def test_rate_pacing_sends_in_chunks(self):
+        model = FakeModel()
+        sender = make_sender(model, SEND_PACING_RATE, rate=1_000_000)
+        data = b"line\n" * 20000
+        self.assertEqual(sender.send_data(data), "")
+        self.assertEqual(b"".join(model.sent), data)
+        self.assertTrue(all(len(chunk) <= 4096 for chunk in model.sent))
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_refill(self):
+        with mock.patch("utils.sender.monotonic") as monotonic:
+            monotonic.return_value = 100.0
+            bucket = TokenBucket(1000, Event())
+            self.assertEqual(bucket.capacity, 50)
+            bucket.take(50)
+            self.assertEqual(bucket.tokens, 0)
+            monotonic.return_value = 100.02
+            bucket.refill()
+            self.assertAlmostEqual(bucket.tokens, 20)
+            # Never more than the capacity, however long it has been
+            monotonic.return_value = 200.0
+            bucket.refill()
+            self.assertEqual(bucket.tokens, 50)
+
+    def test_take_waits_for_tokens(self):
+        cancelled = mock.Mock()
+        with mock.patch("utils.sender.monotonic") as monotonic:
+            monotonic.return_value = 100.0
+            bucket = TokenBucket(1000, cancelled)
+            bucket.take(50)
+            cancelled.wait.side_effect = \
+                lambda timeout: setattr(monotonic, "return_value",
+                                        100.0 + timeout)
+            bucket.take(30)
+        self.assertAlmostEqual(cancelled.wait.call_args[0][0], 0.03)
+        self.assertAlmostEqual(bucket.tokens, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from mvc.model import sercomModel
+from utils.triggers import MultiPatternMatcher, Trigger, TriggerEngine, \
+    parse_triggers, TRIGGER_HIGHLIGHT, TRIGGER_MARK, DEFAULT_TRIGGER_ACTIONS
+
+
+class MultiPatternMatcherTest(unittest.TestCase):
+    def test_match_across_chunks(self):
+        matcher = MultiPatternMatcher([(b"panic", False)])
+        self.assertEqual(matcher.feed(b"kernel pa"), [])
+        self.assertEqual(matcher.feed(b"n"), [])
+        self.assertEqual(matcher.feed(b"ic!"), [(0, 2)])
+
+    def test_overlapping_patterns(self):
+        matcher = MultiPatternMatcher([(b"he", False), (b"she", False),
+                                       (b"his", False), (b"hers", False)])
+        self.assertEqual(sorted(matcher.feed(b"ushers")),
+                         [(0, 4), (1, 4), (3, 6)])
+
+    def test_repeated_pattern_overlapping_itself(self):
+        matcher = MultiPatternMatcher([(b"aa", False)])
+        self.assertEqual(matcher.feed(b"aaaa"), [(0, 2), (0, 3), (0, 4)])
+
+    def test_ignore_case(self):
+        matcher = MultiPatternMatcher([(b"Error", True), (b"OK", False)])
+        self.assertEqual(matcher.feed(b"ERROR ok Ok OK error"),
+                         [(0, 5), (1, 14), (0, 20)])
+
+    def test_case_is_checked_across_chunks(self):
+        matcher = MultiPatternMatcher([(b"Error", True), (b"OK", False)])
+        self.assertEqual(matcher.feed(b"xO"), [])
+        self.assertEqual(matcher.feed(b"k"), [])
+        self.assertEqual(matcher.feed(b" O"), [])
+        self.assertEqual(matcher.feed(b"K"), [(1, 1)])
+
+    def test_reset_forgets_a_partial_match(self):
+        matcher = MultiPatternMatcher([(b"panic", False)])
+        matcher.feed(b"pan")
+        matcher.reset()
+        self.assertEqual(matcher.feed(b"ic"), [])
+
+
+class TriggerEngineTest(unittest.TestCase):
+    def test_hits_are_on_the_line_they_end_on(self):
+        panic = Trigger("panic")
+        engine = TriggerEngine([panic])
+        self.assertEqual(engine.feed(b"ok\npa", 1), [])
+        self.assertEqual(engine.feed(b"nic\nok\npanic\n", 2),
+                         [(panic, 1, 1), (panic, 2, 1)])
+
+    @unittest.skipUnless(os.name == "posix", "needs a pseudo terminal")
+    def test_reset_on_reconnect(self):
+        import tty
+
+        model = sercomModel(render=False)
+        model.set_triggers([Trigger("panic")])
+        engine = model.trigger_engine
+        engine.feed(b"line\npan", 1)
+        master, slave = os.openpty()
+        tty.setraw(master)
+        try:
+            model.connect(os.ttyname(slave))
+            model.disconnect()
+        finally:
+            os.close(master)
+            os.close(slave)
+        self.assertEqual(engine.matcher.state, 0)
+        self.assertTrue(engine.at_line_start)
+        self.assertEqual(engine.feed(b"ic\n", 2), [])
+
+
+class ParseTriggersTest(unittest.TestCase):
+    def test_actions_and_options(self):
+        triggers = parse_triggers("highlight,mark,ignorecase: PANIC\n"
+                                  "\n# comment\nError: 5")
+        self.assertEqual([(t.pattern, t.actions, t.ignore_case)
+                          for t in triggers],
+                         [("PANIC", TRIGGER_HIGHLIGHT | TRIGGER_MARK, True),
+                          ("Error: 5", DEFAULT_TRIGGER_ACTIONS, False)])
+
+    def test_missing_pattern(self):
+        with self.assertRaises(ValueError):
+            parse_triggers("highlight:")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from utils.vt100 import VT100Parser, OP_TEXT, OP_CURSOR_LEFT, \
+    MAX_CURSOR_MOVE
+
+
+class VT100ParserTest(unittest.TestCase):
+    def test_private_marker_after_first_parameter_is_ignored(self):
+        self.assertEqual(VT100Parser().feed("x\x1b[1<A"), [(OP_TEXT, "x")])
+
+    def test_private_marker_inside_parameters_is_ignored(self):
+        self.assertEqual(VT100Parser().feed("x\x1b[1?2K"), [(OP_TEXT, "x")])
+
+    def test_huge_cursor_move_is_clamped(self):
+        self.assertEqual(VT100Parser().feed("hello\x1b[99999999999D"),
+                         [(OP_TEXT, "hello"),
+                          (OP_CURSOR_LEFT, MAX_CURSOR_MOVE)])
+
+    def test_merged_cursor_moves_are_clamped(self):
+        self.assertEqual(VT100Parser().feed("x" + "\x1b[2000000000D" * 3),
+                         [(OP_TEXT, "x"), (OP_CURSOR_LEFT, MAX_CURSOR_MOVE)])
+
+
+if __name__ == "__main__":
+    unittest.main()
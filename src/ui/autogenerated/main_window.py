@@ -35,6 +35,10 @@ class Ui_main_window(object):
         self.menu_configuration.setObjectName("menu_configuration")
         self.menu_byte_size = QtWidgets.QMenu(self.menu_configuration)
         self.menu_byte_size.setObjectName("menu_byte_size")
+        self.menu_send_pacing = QtWidgets.QMenu(self.menu_configuration)
+        self.menu_send_pacing.setObjectName("menu_send_pacing")
+        self.menu_io_engine = QtWidgets.QMenu(self.menu_configuration)
+        self.menu_io_engine.setObjectName("menu_io_engine")
         self.menu_flow_control = QtWidgets.QMenu(self.menu_configuration)
         self.menu_flow_control.setObjectName("menu_flow_control")
         self.menu_stop_bits = QtWidgets.QMenu(self.menu_configuration)
@@ -45,6 +49,8 @@ class Ui_main_window(object):
         self.menu_line_ending.setObjectName("menu_line_ending")
         self.menu_view = QtWidgets.QMenu(self.menu_bar)
         self.menu_view.setObjectName("menu_view")
+        self.menu_overload_policy = QtWidgets.QMenu(self.menu_view)
+        self.menu_overload_policy.setObjectName("menu_overload_policy")
         self.menu_about = QtWidgets.QMenu(self.menu_bar)
         self.menu_about.setObjectName("menu_about")
         main_window.setMenuBar(self.menu_bar)
@@ -86,7 +92,90 @@ class Ui_main_window(object):
         self.action_change_font.setObjectName("action_change_font")
         self.action_reset_application = QtWidgets.QAction(main_window)
         self.action_reset_application.setObjectName("action_reset_application")
+        self.action_export_scrollback = QtWidgets.QAction(main_window)
+        self.action_export_scrollback.setObjectName("action_export_scrollback")
+        self.action_scrollback_lines = QtWidgets.QAction(main_window)
+        self.action_scrollback_lines.setObjectName("action_scrollback_lines")
+        self.action_scrollback_size = QtWidgets.QAction(main_window)
+        self.action_scrollback_size.setObjectName("action_scrollback_size")
+        self.action_start_capture = QtWidgets.QAction(main_window)
+        self.action_start_capture.setObjectName("action_start_capture")
+        self.action_stop_capture = QtWidgets.QAction(main_window)
+        self.action_stop_capture.setEnabled(False)
+        self.action_stop_capture.setObjectName("action_stop_capture")
+        self.action_capture_rotation_size = QtWidgets.QAction(main_window)
+        self.action_capture_rotation_size.setObjectName("action_capture_rotation_size")
+        self.action_capture_rotation_time = QtWidgets.QAction(main_window)
+        self.action_capture_rotation_time.setObjectName("action_capture_rotation_time")
+        self.action_hex_dump = QtWidgets.QAction(main_window)
+        self.action_hex_dump.setCheckable(True)
+        self.action_hex_dump.setObjectName("action_hex_dump")
+        self.action_timestamps = QtWidgets.QAction(main_window)
+        self.action_timestamps.setCheckable(True)
+        self.action_timestamps.setObjectName("action_timestamps")
+        self.action_write_coalescing = QtWidgets.QAction(main_window)
+        self.action_write_coalescing.setObjectName("action_write_coalescing")
+        self.action_send_rate = QtWidgets.QAction(main_window)
+        self.action_send_rate.setObjectName("action_send_rate")
+        self.action_send_line_delay = QtWidgets.QAction(main_window)
+        self.action_send_line_delay.setObjectName("action_send_line_delay")
+        self.action_send_file = QtWidgets.QAction(main_window)
+        self.action_send_file.setEnabled(False)
+        self.action_send_file.setObjectName("action_send_file")
+        self.action_send_clipboard = QtWidgets.QAction(main_window)
+        self.action_send_clipboard.setEnabled(False)
+        self.action_send_clipboard.setObjectName("action_send_clipboard")
+        self.action_cancel_send = QtWidgets.QAction(main_window)
+        self.action_cancel_send.setEnabled(False)
+        self.action_cancel_send.setObjectName("action_cancel_send")
+        self.action_render_fps = QtWidgets.QAction(main_window)
+        self.action_render_fps.setObjectName("action_render_fps")
+        self.action_find = QtWidgets.QAction(main_window)
+        self.action_find.setObjectName("action_find")
+        self.action_triggers = QtWidgets.QAction(main_window)
+        self.action_triggers.setObjectName("action_triggers")
+        self.action_replay_speed = QtWidgets.QAction(main_window)
+        self.action_replay_speed.setObjectName("action_replay_speed")
+        self.action_stop_replay = QtWidgets.QAction(main_window)
+        self.action_stop_replay.setEnabled(False)
+        self.action_stop_replay.setObjectName("action_stop_replay")
+        self.action_replay_recording = QtWidgets.QAction(main_window)
+        self.action_replay_recording.setObjectName("action_replay_recording")
+        self.action_stop_recording = QtWidgets.QAction(main_window)
+        self.action_stop_recording.setEnabled(False)
+        self.action_stop_recording.setObjectName("action_stop_recording")
+        self.action_start_recording = QtWidgets.QAction(main_window)
+        self.action_start_recording.setObjectName("action_start_recording")
+        self.action_show_metrics = QtWidgets.QAction(main_window)
+        self.action_show_metrics.setCheckable(True)
+        self.action_show_metrics.setChecked(True)
+        self.action_show_metrics.setObjectName("action_show_metrics")
+        self.action_stop_metrics_export = QtWidgets.QAction(main_window)
+        self.action_stop_metrics_export.setEnabled(False)
+        self.action_stop_metrics_export.setObjectName("action_stop_metrics_export")
+        self.action_start_metrics_export = QtWidgets.QAction(main_window)
+        self.action_start_metrics_export.setObjectName("action_start_metrics_export")
+        self.action_render_budget = QtWidgets.QAction(main_window)
+        self.action_render_budget.setObjectName("action_render_budget")
         self.menu_file.addAction(self.action_new_session)
+        self.menu_file.addAction(self.action_export_scrollback)
+        self.menu_file.addAction(self.action_send_file)
+        self.menu_file.addAction(self.action_send_clipboard)
+        self.menu_file.addAction(self.action_cancel_send)
+        self.menu_file.addSeparator()
+        self.menu_file.addAction(self.action_start_capture)
+        self.menu_file.addAction(self.action_stop_capture)
+        self.menu_file.addAction(self.action_capture_rotation_size)
+        self.menu_file.addAction(self.action_capture_rotation_time)
+        self.menu_file.addSeparator()
+        self.menu_file.addAction(self.action_start_recording)
+        self.menu_file.addAction(self.action_stop_recording)
+        self.menu_file.addAction(self.action_replay_recording)
+        self.menu_file.addAction(self.action_stop_replay)
+        self.menu_file.addAction(self.action_replay_speed)
+        self.menu_file.addSeparator()
+        self.menu_file.addAction(self.action_start_metrics_export)
+        self.menu_file.addAction(self.action_stop_metrics_export)
         self.menu_file.addSeparator()
         self.menu_file.addAction(self.action_exit)
         self.menu_port.addAction(self.action_port_status)
@@ -101,10 +190,30 @@ class Ui_main_window(object):
         self.menu_configuration.addAction(self.menu_stop_bits.menuAction())
         self.menu_configuration.addAction(self.menu_flow_control.menuAction())
         self.menu_configuration.addAction(self.menu_line_ending.menuAction())
+        self.menu_configuration.addSeparator()
+        self.menu_configuration.addAction(self.menu_io_engine.menuAction())
+        self.menu_configuration.addAction(self.action_write_coalescing)
+        self.menu_configuration.addSeparator()
+        self.menu_configuration.addAction(self.menu_send_pacing.menuAction())
+        self.menu_configuration.addAction(self.action_send_rate)
+        self.menu_configuration.addAction(self.action_send_line_delay)
+        self.menu_configuration.addSeparator()
+        self.menu_configuration.addAction(self.action_triggers)
         self.menu_view.addAction(self.action_auto_scroll)
         self.menu_view.addAction(self.action_local_echo)
+        self.menu_view.addAction(self.action_hex_dump)
+        self.menu_view.addAction(self.action_timestamps)
+        self.menu_view.addAction(self.action_show_metrics)
         self.menu_view.addSeparator()
         self.menu_view.addAction(self.action_change_font)
+        self.menu_view.addSeparator()
+        self.menu_view.addAction(self.action_scrollback_lines)
+        self.menu_view.addAction(self.action_scrollback_size)
+        self.menu_view.addAction(self.action_render_fps)
+        self.menu_view.addAction(self.menu_overload_policy.menuAction())
+        self.menu_view.addAction(self.action_render_budget)
+        self.menu_view.addSeparator()
+        self.menu_view.addAction(self.action_find)
         self.menu_about.addAction(self.action_reset_application)
         self.menu_bar.addAction(self.menu_file.menuAction())
         self.menu_bar.addAction(self.menu_port.menuAction())
@@ -125,11 +234,14 @@ class Ui_main_window(object):
         self.menu_connect_to_port.setTitle(_translate("main_window", "&Connect to port"))
         self.menu_configuration.setTitle(_translate("main_window", "&Configuration"))
         self.menu_byte_size.setTitle(_translate("main_window", "&Byte size"))
+        self.menu_send_pacing.setTitle(_translate("main_window", "Send &pacing"))
+        self.menu_io_engine.setTitle(_translate("main_window", "&I/O engine"))
         self.menu_flow_control.setTitle(_translate("main_window", "&Flow control"))
         self.menu_stop_bits.setTitle(_translate("main_window", "&Stop bits"))
         self.menu_parity.setTitle(_translate("main_window", "&Parity"))
         self.menu_line_ending.setTitle(_translate("main_window", "&Line ending"))
         self.menu_view.setTitle(_translate("main_window", "&View"))
+        self.menu_overload_policy.setTitle(_translate("main_window", "When the terminal falls &behind"))
         self.menu_about.setTitle(_translate("main_window", "&About"))
         self.action_new_session.setText(_translate("main_window", "&New session..."))
         self.action_new_session.setToolTip(_translate("main_window", "Create a new session."))
@@ -157,3 +269,85 @@ class Ui_main_window(object):
         self.action_reset_application.setText(_translate("main_window", "&Reset application..."))
         self.action_reset_application.setToolTip(_translate("main_window", "Clears all the application data. "))
         self.action_reset_application.setStatusTip(_translate("main_window", "Clears all the application data. "))
+        self.action_export_scrollback.setText(_translate("main_window", "&Export scrollback..."))
+        self.action_export_scrollback.setToolTip(_translate("main_window", "Save everything received in this session to a file."))
+        self.action_export_scrollback.setStatusTip(_translate("main_window", "Save everything received in this session to a file."))
+        self.action_scrollback_lines.setText(_translate("main_window", "Scrollback &line limit..."))
+        self.action_scrollback_lines.setToolTip(_translate("main_window", "Set the maximum number of lines kept in the terminal."))
+        self.action_scrollback_lines.setStatusTip(_translate("main_window", "Set the maximum number of lines kept in the terminal."))
+        self.action_scrollback_size.setText(_translate("main_window", "Scrollback &size limit..."))
+        self.action_scrollback_size.setToolTip(_translate("main_window", "Set the maximum number of characters kept in the terminal."))
+        self.action_scrollback_size.setStatusTip(_translate("main_window", "Set the maximum number of characters kept in the terminal."))
+        self.action_start_capture.setText(_translate("main_window", "Start &capture..."))
+        self.action_start_capture.setToolTip(_translate("main_window", "Start saving the raw data received to a file."))
+        self.action_start_capture.setStatusTip(_translate("main_window", "Start saving the raw data received to a file."))
+        self.action_stop_capture.setText(_translate("main_window", "S&top capture"))
+        self.action_stop_capture.setToolTip(_translate("main_window", "Stop saving the raw data received to a file."))
+        self.action_stop_capture.setStatusTip(_translate("main_window", "Stop saving the raw data received to a file."))
+        self.action_capture_rotation_size.setText(_translate("main_window", "Capture rotation si&ze..."))
+        self.action_capture_rotation_size.setToolTip(_translate("main_window", "Set how big a capture file can get before a new one is started."))
+        self.action_capture_rotation_size.setStatusTip(_translate("main_window", "Set how big a capture file can get before a new one is started."))
+        self.action_capture_rotation_time.setText(_translate("main_window", "Capture rotation t&ime..."))
+        self.action_capture_rotation_time.setToolTip(_translate("main_window", "Set how long a capture file is written to before a new one is started."))
+        self.action_capture_rotation_time.setStatusTip(_translate("main_window", "Set how long a capture file is written to before a new one is started."))
+        self.action_hex_dump.setText(_translate("main_window", "&Hex dump view"))
+        self.action_hex_dump.setToolTip(_translate("main_window", "Show the data received as a hex dump."))
+        self.action_hex_dump.setStatusTip(_translate("main_window", "Show the data received as a hex dump."))
+        self.action_timestamps.setText(_translate("main_window", "Show &timestamps"))
+        self.action_timestamps.setToolTip(_translate("main_window", "Show when each line was received."))
+        self.action_timestamps.setStatusTip(_translate("main_window", "Show when each line was received."))
+        self.action_write_coalescing.setText(_translate("main_window", "&Write coalescing window..."))
+        self.action_write_coalescing.setToolTip(_translate("main_window", "Set how long to wait for more data to send before writing it to the port"))
+        self.action_write_coalescing.setStatusTip(_translate("main_window", "Set how long to wait for more data to send before writing it to the port"))
+        self.action_send_rate.setText(_translate("main_window", "Send &rate..."))
+        self.action_send_rate.setToolTip(_translate("main_window", "Set how many bytes per second to send files and pastes at"))
+        self.action_send_rate.setStatusTip(_translate("main_window", "Set how many bytes per second to send files and pastes at"))
+        self.action_send_line_delay.setText(_translate("main_window", "Send line &delay..."))
+        self.action_send_line_delay.setToolTip(_translate("main_window", "Set how long to wait after each line when sending files and pastes"))
+        self.action_send_line_delay.setStatusTip(_translate("main_window", "Set how long to wait after each line when sending files and pastes"))
+        self.action_send_file.setText(_translate("main_window", "Send &file..."))
+        self.action_send_file.setToolTip(_translate("main_window", "Send a file through the port"))
+        self.action_send_file.setStatusTip(_translate("main_window", "Send a file through the port"))
+        self.action_send_clipboard.setText(_translate("main_window", "Send c&lipboard"))
+        self.action_send_clipboard.setToolTip(_translate("main_window", "Send the contents of the clipboard through the port"))
+        self.action_send_clipboard.setStatusTip(_translate("main_window", "Send the contents of the clipboard through the port"))
+        self.action_cancel_send.setText(_translate("main_window", "Ca&ncel send"))
+        self.action_cancel_send.setToolTip(_translate("main_window", "Stop sending the file or clipboard"))
+        self.action_cancel_send.setStatusTip(_translate("main_window", "Stop sending the file or clipboard"))
+        self.action_render_fps.setText(_translate("main_window", "&Frame rate..."))
+        self.action_render_fps.setToolTip(_translate("main_window", "Set how many times a second the terminal is redrawn."))
+        self.action_render_fps.setStatusTip(_translate("main_window", "Set how many times a second the terminal is redrawn."))
+        self.action_find.setText(_translate("main_window", "F&ind..."))
+        self.action_find.setToolTip(_translate("main_window", "Find text in everything received in this session."))
+        self.action_find.setStatusTip(_translate("main_window", "Find text in everything received in this session."))
+        self.action_find.setShortcut(_translate("main_window", "Ctrl+F"))
+        self.action_triggers.setText(_translate("main_window", "&Triggers..."))
+        self.action_triggers.setToolTip(_translate("main_window", "Set the strings to watch for in the data received, and what to do when they show up."))
+        self.action_triggers.setStatusTip(_translate("main_window", "Set the strings to watch for in the data received, and what to do when they show up."))
+        self.action_replay_speed.setText(_translate("main_window", "Replay &speed..."))
+        self.action_replay_speed.setToolTip(_translate("main_window", "Change how many times faster than real time recordings are replayed."))
+        self.action_replay_speed.setStatusTip(_translate("main_window", "Change how many times faster than real time recordings are replayed."))
+        self.action_stop_replay.setText(_translate("main_window", "Stop repla&y"))
+        self.action_stop_replay.setToolTip(_translate("main_window", "Stop replaying the recording."))
+        self.action_stop_replay.setStatusTip(_translate("main_window", "Stop replaying the recording."))
+        self.action_replay_recording.setText(_translate("main_window", "Re&play recording..."))
+        self.action_replay_recording.setToolTip(_translate("main_window", "Replay a recording as if it was being received."))
+        self.action_replay_recording.setStatusTip(_translate("main_window", "Replay a recording as if it was being received."))
+        self.action_stop_recording.setText(_translate("main_window", "Sto&p recording"))
+        self.action_stop_recording.setToolTip(_translate("main_window", "Stop recording the data received and sent."))
+        self.action_stop_recording.setStatusTip(_translate("main_window", "Stop recording the data received and sent."))
+        self.action_start_recording.setText(_translate("main_window", "Start &recording..."))
+        self.action_start_recording.setToolTip(_translate("main_window", "Record the raw data received and sent to a file, to replay later."))
+        self.action_start_recording.setStatusTip(_translate("main_window", "Record the raw data received and sent to a file, to replay later."))
+        self.action_show_metrics.setText(_translate("main_window", "Show &metrics"))
+        self.action_show_metrics.setToolTip(_translate("main_window", "Show live metrics of the data received, sent and drawn in the status bar."))
+        self.action_show_metrics.setStatusTip(_translate("main_window", "Show live metrics of the data received, sent and drawn in the status bar."))
+        self.action_stop_metrics_export.setText(_translate("main_window", "Stop exportin&g metrics"))
+        self.action_stop_metrics_export.setToolTip(_translate("main_window", "Stop exporting metrics."))
+        self.action_stop_metrics_export.setStatusTip(_translate("main_window", "Stop exporting metrics."))
+        self.action_start_metrics_export.setText(_translate("main_window", "Start exporting &metrics..."))
+        self.action_start_metrics_export.setToolTip(_translate("main_window", "Append a JSON snapshot of the metrics to a file every second."))
+        self.action_start_metrics_export.setStatusTip(_translate("main_window", "Append a JSON snapshot of the metrics to a file every second."))
+        self.action_render_budget.setText(_translate("main_window", "Terminal &backlog limit..."))
+        self.action_render_budget.setToolTip(_translate("main_window", "Set how much received data can wait to be shown."))
+        self.action_render_budget.setStatusTip(_translate("main_window", "Set how much received data can wait to be shown."))
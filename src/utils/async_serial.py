@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+from threading import Thread, Lock
+from time import monotonic_ns
+from typing import Callable, Optional
+
+from utils.batcher import ReceiveBatcher
+from utils.logger import create_logger
+from utils.port_reader import ReadRing, READ_COALESCE_SIZE, \
+    READ_COALESCE_DELAY
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+class SerialEventLoop:
+    """
+    One asyncio event loop, running on one thread, that drives the file
+    descriptors of every port using the asyncio engine in this process.
+    """
+
+    instance: Optional["SerialEventLoop"] = None
+    instance_lock = Lock()
+
+    @classmethod
+    def get(cls) -> "SerialEventLoop":
+        """
+        Returns the shared event loop, starting it if needed.
+
+        :return: A SerialEventLoop.
+        """
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = SerialEventLoop()
+            return cls.instance
+
+    def __init__(self):
+        """
+        Initialize and start the event loop thread. Use get() instead.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        logger.debug(f"Starting serial event loop thread {self.thread}")
+        self.thread.start()
+
+    def call(self, func: Callable, *args):
+        """
+        Calls a function on the event loop thread, without waiting for it.
+
+        :param func: The function.
+        :param args: The arguments to pass to the function.
+        """
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def call_and_wait(self, func: Callable, *args):
+        """
+        Calls a function on the event loop thread and waits for it to
+        finish.
+
+        :param func: The function.
+        :param args: The arguments to pass to the function.
+        :return: Whatever the function returns.
+        """
+
+        async def run():
+            return func(*args)
+
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result()
+
+
+class LoopReceiveBatcher(ReceiveBatcher):
+    """
+    A receive batcher that uses a timer on the serial event loop to flush,
+    instead of a thread of its own. add() must be called from the loop.
+    """
+
+    def __init__(self, event_loop: SerialEventLoop, *args):
+        """
+        Initialize the batcher.
+
+        :param event_loop: The SerialEventLoop that calls add().
+        :param args: The arguments of ReceiveBatcher.
+        """
+        super().__init__(*args)
+        self.event_loop = event_loop
+
+    def start(self):
+        """
+        Starts the batcher. There is no thread to start.
+        """
+        self.running = True
+
+    def stop(self):
+        """
+        Flushes anything pending and stops the batcher.
+        """
+        self.running = False
+        self.flush()
+
+    def schedule_flush(self):
+        """
+        Flushes the batch that was just started once its time window runs
+        out.
+        """
+        self.event_loop.loop.call_later(self.max_delay, self.flush)
+
+
+class AsyncSerialConnection:
+    """
+    Drives one open port from the serial event loop, reading when the port
+    is readable and writing from a buffer when the port is writable.
+    """
+
+    def __init__(self, fd: int, event_loop: SerialEventLoop,
+                 on_received: Callable[[bytes, int], None],
+                 on_written: Callable[[bytes], None],
+                 on_closed: Callable[[], None]):
+        """
+        Initialize the connection.
+
+        :param fd: The file descriptor of the open port, in non-blocking mode.
+        :param event_loop: The SerialEventLoop to run on.
+        :param on_received: Called on the loop with a memoryview of the data
+         received, which is only valid during the call, and a
+         time.monotonic_ns() timestamp.
+        :param on_written: Called on the loop with the data that was written.
+        :param on_closed: Called on the loop if the port stops working.
+        """
+        self.fd = fd
+        self.event_loop = event_loop
+        self.on_received = on_received
+        self.on_written = on_written
+        self.on_closed = on_closed
+        self.write_buffer = bytearray()
+        self.read_ring = ReadRing()
+        self.attached = False
+        self.paused = False
+
+    def start(self):
+        """
+        Starts watching the port for data to read.
+        """
+        self.event_loop.call_and_wait(self.attach)
+
+    def stop(self):
+        """
+        Stops watching the port. Must be called before the port is closed.
+        """
+        self.event_loop.call_and_wait(self.detach)
+
+    def send(self, data: bytes):
+        """
+        Queues some data to be written to the port. Can be called from any
+        thread.
+
+        :param data: A bytes object.
+        """
+        self.event_loop.call(self.queue_write, data)
+
+    def pause_reading(self, pause: bool):
+        """
+        Stops or starts reading the port, leaving writing alone. Can be
+        called from any thread.
+
+        :param pause: Whether to stop reading.
+        """
+        self.event_loop.call(self.set_paused, pause)
+
+    def set_paused(self, pause: bool):
+        """
+        Stops or starts watching the port for data to read. Runs on the loop.
+
+        :param pause: Whether to stop reading.
+        """
+        if pause == self.paused:
+            return
+        self.paused = pause
+        if not self.attached:
+            return
+        if pause:
+            self.event_loop.loop.remove_reader(self.fd)
+        else:
+            self.event_loop.loop.add_reader(self.fd, self.on_readable)
+
+    def attach(self):
+        """
+        Registers the port with the event loop. Runs on the loop.
+        """
+        self.attached = True
+        if not self.paused:
+            self.event_loop.loop.add_reader(self.fd, self.on_readable)
+
+    def detach(self):
+        """
+        Unregisters the port from the event loop, dropping anything not
+        written yet. Runs on the loop.
+        """
+        if not self.attached:
+            return
+        self.attached = False
+        self.event_loop.loop.remove_reader(self.fd)
+        self.event_loop.loop.remove_writer(self.fd)
+        self.write_buffer.clear()
+
+    def fail(self):
+        """
+        Stops watching the port because reading or writing failed.
+        """
+        self.detach()
+        self.on_closed()
+
+    def on_readable(self):
+        """
+        Reads whatever is available once the port is readable. Runs on the
+        loop.
+        """
+        try:
+            size = os.readv(self.fd, [self.read_ring.reserve()])
+        except BlockingIOError:
+            return
+        except OSError:
+            logger.exception("Error reading from serial port!")
+            self.fail()
+            return
+        if size == 0:
+            logger.warning("Serial port reached end of file")
+            self.fail()
+            return
+        self.on_received(self.read_ring.commit(size), monotonic_ns())
+        if size < READ_COALESCE_SIZE and self.attached and not self.paused:
+            # More is probably on its way, so let it pile up for a moment
+            # instead of waking up for every few bytes
+            loop = self.event_loop.loop
+            loop.remove_reader(self.fd)
+            loop.call_later(READ_COALESCE_DELAY, self.resume_reading)
+
+    def resume_reading(self):
+        """
+        Starts watching the port for data to read again after waiting for
+        more to arrive, unless it was paused or detached meanwhile. Runs on
+        the loop.
+        """
+        if self.attached and not self.paused:
+            self.event_loop.loop.add_reader(self.fd, self.on_readable)
+
+    def queue_write(self, data: bytes):
+        """
+        Adds some data to the write buffer, and starts waiting for the port
+        to be writable if it wasn't already. Runs on the loop.
+
+        :param data: A bytes object.
+        """
+        if not self.attached:
+            return
+        was_empty = not self.write_buffer
+        self.write_buffer += data
+        if was_empty:
+            self.event_loop.loop.add_writer(self.fd, self.on_writable)
+
+    def on_writable(self):
+        """
+        Writes as much of the write buffer as the port will take once it is
+        writable. Runs on the loop.
+        """
+        try:
+            written = os.write(self.fd, self.write_buffer)
+        except BlockingIOError:
+            return
+        except OSError:
+            logger.exception("Error writing to serial port!")
+            self.fail()
+            return
+        data = bytes(self.write_buffer[:written])
+        del self.write_buffer[:written]
+        if not self.write_buffer:
+            self.event_loop.loop.remove_writer(self.fd)
+        self.on_written(data)
@@ -0,0 +1,152 @@
+import logging
+from array import array
+from threading import Thread, Condition, Lock
+from time import monotonic, monotonic_ns
+from typing import Callable, Optional
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+class ReceiveBatcher:
+    """
+    Coalesces lots of small chunks of received data into a few big ones, so
+    the GUI thread doesn't get flooded with signals.
+
+    Data is flushed once the amount pending reaches the size threshold, or
+    once the oldest pending byte has waited for the time window, whichever
+    comes first.
+
+    Each batch comes with an array of the time each line that starts in the
+    batch started arriving, from the timestamps of the chunks added.
+    """
+
+    def __init__(self, callback: Callable[[bytes, array], None],
+                 max_size: int, max_delay: float,
+                 count_delay: Optional[Callable[[int], None]] = None):
+        """
+        Initialize the batcher.
+
+        :param callback: A function that will be called with each batch, as a
+         bytes object, and an array("q") of line start timestamps. Called
+         from the flushing thread or the thread that called add().
+        :param max_size: Flush immediately once this many bytes are pending.
+        :param max_delay: The maximum number of seconds to hold data for.
+        :param count_delay: Called with how many nanoseconds each batch was
+         held for, from when its first chunk was received, if not None.
+         Called from the same threads as the callback.
+        """
+        self.callback = callback
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.buffer = bytearray()
+        self.line_starts = array("q")
+        # Whether the next byte added starts a new line
+        self.at_line_start = True
+        self.deadline = None
+        self.count_delay = count_delay
+        self.first_timestamp = 0
+        self.condition = Condition()
+        # Held while taking and emitting a batch so batches never get
+        # emitted out of order
+        self.emit_lock = Lock()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the flushing thread.
+        """
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = Thread(target=self.flush_thread, daemon=True)
+        logger.debug(f"Starting batcher flush thread {self.thread}")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Flushes anything pending and stops the flushing thread.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.flush()
+
+    def add(self, data: bytes, timestamp: int):
+        """
+        Adds some data to the current batch.
+
+        :param data: A bytes-like object, which is not empty. It is copied,
+         so it can be a memoryview that is reused after this returns.
+        :param timestamp: When the data was received, from
+         time.monotonic_ns().
+        """
+        with self.condition:
+            if not self.buffer:
+                self.first_timestamp = timestamp
+                self.deadline = monotonic() + self.max_delay
+                self.schedule_flush()
+            start = len(self.buffer)
+            self.buffer += data
+            # Counted in the buffer, as a memoryview can't search itself
+            starts = self.at_line_start + self.buffer.count(b"\n", start)
+            self.at_line_start = self.buffer.endswith(b"\n")
+            starts -= self.at_line_start
+            if starts > 0:
+                self.line_starts.extend(array("q", (timestamp,)) * starts)
+            if len(self.buffer) < self.max_size:
+                return
+        self.flush()
+
+    def schedule_flush(self):
+        """
+        Arranges for the batch that was just started to be flushed once its
+        time window runs out. The condition must be held.
+        """
+        self.condition.notify()
+
+    def take(self) -> tuple[bytes, array]:
+        """
+        Takes everything pending out of the batch. The condition must be held.
+
+        :return: A tuple of the bytes object and the array of line start
+         timestamps.
+        """
+        batch = bytes(self.buffer), self.line_starts
+        self.buffer.clear()
+        self.line_starts = array("q")
+        self.deadline = None
+        return batch
+
+    def flush(self):
+        """
+        Emits everything pending right now, if there is anything.
+        """
+        with self.emit_lock:
+            with self.condition:
+                if not self.buffer:
+                    return
+                batch, line_starts = self.take()
+                first_timestamp = self.first_timestamp
+            if self.count_delay is not None:
+                self.count_delay(max(monotonic_ns() - first_timestamp, 0))
+            self.callback(batch, line_starts)
+
+    def flush_thread(self):
+        """
+        Waits for the time window of each batch to run out and flushes it.
+        """
+        while True:
+            with self.condition:
+                while self.running and self.deadline is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                remaining = self.deadline - monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+            self.flush()
@@ -0,0 +1,282 @@
+import logging
+import mmap
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from threading import Thread, Condition
+from time import monotonic_ns
+from typing import Callable, Optional
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# The most we will hold in memory when the disk can't keep up, anything
+# received past this is dropped (and counted) instead of stalling the reader
+CAPTURE_MAX_PENDING = 64 * 1024 * 1024
+CAPTURE_WRITE_BUFFER_SIZE = 1024 * 1024
+# At most one index entry is made per this many nanoseconds
+CAPTURE_INDEX_INTERVAL = 10_000_000
+# The index file is a flat array of these, alternating between the
+# monotonic timestamp in nanoseconds and the offset in the capture file
+CAPTURE_INDEX_TYPECODE = "Q"
+# The size of one entry in the index file, in bytes
+CAPTURE_INDEX_ENTRY_SIZE = 2 * array(CAPTURE_INDEX_TYPECODE).itemsize
+
+
+def index_path_for(path: str) -> str:
+    """
+    Returns the path of the index file that goes with a capture file.
+
+    :param path: The path of the capture file.
+    :return: A str.
+    """
+    return path + ".idx"
+
+
+def marks_path_for(path: str) -> str:
+    """
+    Returns the path of the marks file that goes with a capture file. Each
+    line of it is the monotonic timestamp in nanoseconds, the offset in the
+    capture file and a label, separated by spaces.
+
+    :param path: The path of the capture file.
+    :return: A str.
+    """
+    return path + ".marks"
+
+
+def find_offset(path: str, timestamp: int) -> int:
+    """
+    Finds where in a capture file the data received at a certain moment is,
+    using its index file.
+
+    :param path: The path of the capture file.
+    :param timestamp: The time.monotonic_ns() timestamp to look for.
+    :return: The offset of the data received at or just before that moment,
+     which will be 0 if the moment is before the capture started.
+    """
+    with open(index_path_for(path), "rb") as file:
+        # Leaves out an entry that is still being written
+        size = file.seek(0, 2)
+        size -= size % CAPTURE_INDEX_ENTRY_SIZE
+        if size == 0:
+            return 0
+        # Searched in place, so only the pages the search touches are read
+        with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as m:
+            with memoryview(m) as view:
+                with view[:size].cast(CAPTURE_INDEX_TYPECODE) as entries:
+                    i = bisect_right(entries[0::2], timestamp)
+                    if i == 0:
+                        return 0
+                    return entries[(i - 1) * 2 + 1]
+
+
+class CaptureWriter:
+    """
+    Writes raw received data to disk, with an index of when that data was
+    received. The writing happens on its own thread so a slow disk never
+    stalls the serial port's read thread.
+    """
+
+    def __init__(self, path: str, max_size: int = 0, max_age: float = 0,
+                 on_failed: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the capture writer.
+
+        :param path: The path of the first capture file. If the capture is
+         rotated, the next files are named like "capture.1.bin".
+        :param max_size: Rotate to a new file once a file is bigger than this
+         many bytes. 0 to never rotate because of size.
+        :param max_age: Rotate to a new file once a file has been written to
+         for this many seconds. 0 to never rotate because of time.
+        :param on_failed: Called on the writer thread with why, if writing
+         fails and the capture stops.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.on_failed = on_failed
+        self.pending = bytearray()
+        self.pending_index = array(CAPTURE_INDEX_TYPECODE)
+        # Tuples of the timestamp, offset in pending and label
+        self.pending_marks = []
+        self.last_index_time = 0
+        self.dropped = 0
+        self.condition = Condition()
+        self.running = False
+        self.thread = None
+        self.file_number = 0
+        self.file = None
+        self.index_file = None
+        # Only opened once there is a mark to write
+        self.marks_file = None
+        self.file_size = 0
+        self.file_opened_time = 0
+
+    def current_path(self) -> str:
+        """
+        Returns the path of the capture file currently being written.
+
+        :return: A str.
+        """
+        if self.file_number == 0:
+            return self.path
+        path = Path(self.path)
+        return str(path.with_name(f"{path.stem}.{self.file_number}"
+                                  f"{path.suffix}"))
+
+    def open_files(self):
+        """
+        Opens the current capture file and its index for appending.
+        """
+        path = self.current_path()
+        logger.info(f"Capturing to {path}")
+        self.file = open(path, "ab", buffering=CAPTURE_WRITE_BUFFER_SIZE)
+        self.index_file = open(index_path_for(path), "ab")
+        self.file_size = self.file.tell()
+        self.file_opened_time = monotonic_ns()
+
+    def close_files(self):
+        """
+        Closes the current capture file and its index.
+        """
+        self.file.close()
+        self.index_file.close()
+        if self.marks_file is not None:
+            self.marks_file.close()
+            self.marks_file = None
+
+    def should_rotate(self) -> bool:
+        """
+        Returns whether we should move on to a new capture file.
+
+        :return: A bool.
+        """
+        if self.max_size > 0 and self.file_size >= self.max_size:
+            return True
+        age = (monotonic_ns() - self.file_opened_time) / 1_000_000_000
+        return self.max_age > 0 and age >= self.max_age
+
+    def start(self):
+        """
+        Opens the capture file and starts the writer thread.
+        """
+        self.open_files()
+        self.running = True
+        self.thread = Thread(target=self.writer_thread, daemon=True)
+        logger.debug(f"Starting capture writer thread {self.thread}")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Writes everything still pending, and closes the capture file.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        if self.dropped > 0:
+            logger.warning(f"Dropped {self.dropped} bytes because the disk "
+                           f"couldn't keep up with the capture")
+
+    def write(self, data: bytes, timestamp: Optional[int] = None):
+        """
+        Queues some received data to be captured. Never blocks on the disk.
+
+        :param data: A bytes-like object.
+        :param timestamp: When the data was received, from
+         time.monotonic_ns(). Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = monotonic_ns()
+        with self.condition:
+            if len(self.pending) + len(data) > CAPTURE_MAX_PENDING:
+                self.dropped += len(data)
+                return
+            # The start of every batch is indexed, so a rotated file always
+            # starts with an index entry
+            if not self.pending or \
+                    timestamp - self.last_index_time >= CAPTURE_INDEX_INTERVAL:
+                self.pending_index.append(timestamp)
+                self.pending_index.append(len(self.pending))
+                self.last_index_time = timestamp
+            self.pending += data
+            self.condition.notify()
+
+    def mark(self, label: str, timestamp: Optional[int] = None):
+        """
+        Marks the end of the data queued so far, like where a trigger
+        matched.
+
+        :param label: What the mark is for, on one line.
+        :param timestamp: When it happened, from time.monotonic_ns().
+         Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = monotonic_ns()
+        with self.condition:
+            self.pending_marks.append((timestamp, len(self.pending), label))
+            self.condition.notify()
+
+    def write_marks(self, marks: list[tuple[int, int, str]]):
+        """
+        Writes marks to the marks file of the current capture file.
+
+        :param marks: Tuples of the timestamp, offset in the current capture
+         file and label.
+        """
+        if self.marks_file is None:
+            self.marks_file = open(marks_path_for(self.current_path()), "a",
+                                   encoding="utf-8")
+        self.marks_file.writelines(f"{timestamp} {offset} {label}\n"
+                                   for timestamp, offset, label in marks)
+        self.marks_file.flush()
+
+    def writer_thread(self):
+        """
+        Waits for data to be queued and writes it to the capture file.
+        """
+        try:
+            while True:
+                with self.condition:
+                    while self.running and not self.pending and \
+                            not self.pending_marks:
+                        self.condition.wait()
+                    if not self.running and not self.pending and \
+                            not self.pending_marks:
+                        return
+                    data, self.pending = self.pending, bytearray()
+                    index = self.pending_index
+                    self.pending_index = array(CAPTURE_INDEX_TYPECODE)
+                    marks, self.pending_marks = self.pending_marks, []
+                if self.should_rotate():
+                    self.close_files()
+                    self.file_number += 1
+                    self.open_files()
+                # Make the index offsets relative to the start of the file
+                for i in range(1, len(index), 2):
+                    index[i] += self.file_size
+                self.file.write(data)
+                self.index_file.write(index.tobytes())
+                if marks:
+                    self.write_marks([(timestamp, offset + self.file_size,
+                                       label)
+                                      for timestamp, offset, label in marks])
+                self.file_size += len(data)
+        except OSError as e:
+            logger.exception("Error writing capture file!")
+            with self.condition:
+                # Nothing else will be written
+                self.running = False
+                self.dropped += len(self.pending)
+                self.pending = bytearray()
+                self.pending_index = array(CAPTURE_INDEX_TYPECODE)
+                self.pending_marks = []
+            if self.on_failed is not None:
+                self.on_failed(str(e))
+        finally:
+            try:
+                self.close_files()
+            except OSError:
+                logger.exception("Error closing capture file!")
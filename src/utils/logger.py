@@ -1,5 +1,60 @@
+import atexit
 import logging
 import sys
+from logging.handlers import QueueHandler, QueueListener, \
+    RotatingFileHandler
+from queue import SimpleQueue
+from typing import Optional
+
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL
+}
+# Debug messages are only made when asked for with --log-level, as some of
+# them come from the paths that handle every chunk and frame
+DEFAULT_LOG_LEVEL = logging.INFO
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# A log file is rotated when it gets this big, keeping this many old ones
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 3
+
+# Where messages up to INFO go, errors and warnings always go to stderr
+stdout_log_stream = sys.stdout
+# The lowest level logged, for every logger made here
+log_level = DEFAULT_LOG_LEVEL
+# The level each logger was created with, which log_level can only raise
+created_loggers: dict[logging.Logger, int] = {}
+
+# Loggers only put records in the queue, and one background thread formats
+# and writes them, so logging never blocks on a slow terminal or pipe
+log_queue = SimpleQueue()
+stdout_handler: Optional[logging.StreamHandler] = None
+file_handler: Optional[RotatingFileHandler] = None
+queue_handler: Optional[QueueHandler] = None
+listener: Optional[QueueListener] = None
+
+
+class FastQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves formatting to the background thread. The
+    standard one formats every record on the thread that logged it.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Returns the record as is. This means arguments to a logging call
+        shouldn't be changed after it, but everything here logs f-strings
+        anyway.
+
+        :param record: The record.
+        :return: The same record.
+        """
+        return record
 
 
 def create_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
@@ -11,29 +66,103 @@ def create_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
     `logger.exception` everywhere in that module.
     :param name: A string with the logger name.
     :param level: A integer with the logger level. Defaults to logging.DEBUG.
+     Raised to the level set with set_log_level(), if that is higher.
     :return: A logging.Logger which you can use as a regular logger.
     """
+    start_logging()
+
     logger = logging.getLogger(name=name)
-    logger.setLevel(level=level)
+    logger.setLevel(level=max(level, log_level))
     logger.propagate = False
 
-    console_formatter = logging.Formatter("%(asctime)s - %(name)s - "
-                                          "%(levelname)s - %(message)s")
+    if queue_handler not in logger.handlers:
+        logger.addHandler(hdlr=queue_handler)
+    created_loggers[logger] = level
+
+    logger.debug(f"Created logger named {repr(name)} with level {repr(level)}")
+    return logger
+
+
+def start_logging():
+    """
+    Starts the background thread that writes the log, if it isn't running.
+    """
+    global stdout_handler, queue_handler, listener
+    if listener is not None:
+        return
+
+    console_formatter = logging.Formatter(LOG_FORMAT)
 
     # https://stackoverflow.com/a/16066513/10291933
-    stdout_handler = logging.StreamHandler(stream=sys.stdout)
-    stdout_handler.setLevel(level=level)
+    stdout_handler = logging.StreamHandler(stream=stdout_log_stream)
     stdout_handler.addFilter(lambda record: record.levelno <= logging.INFO)
     stdout_handler.setFormatter(fmt=console_formatter)
-    if stdout_handler not in logger.handlers:
-        logger.addHandler(hdlr=stdout_handler)
 
     stderr_handler = logging.StreamHandler(stream=sys.stderr)
     stderr_handler.setLevel(level=logging.WARNING)
     stderr_handler.setFormatter(fmt=console_formatter)
-    if stderr_handler not in logger.handlers:
-        logger.addHandler(hdlr=stderr_handler)
 
-    logger.debug(f"Created logger named {repr(name)} with level {repr(level)}")
-    logger.debug(f"Handlers for {repr(name)}: {repr(logger.handlers)}")
-    return logger
+    queue_handler = FastQueueHandler(log_queue)
+    listener = QueueListener(log_queue, stdout_handler, stderr_handler,
+                             respect_handler_level=True)
+    listener.start()
+    # Write out whatever is still queued when exiting
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Writes out everything logged so far and stops the background thread.
+    """
+    global listener
+    if listener is None:
+        return
+    listener.stop()
+    listener = None
+    if file_handler is not None:
+        file_handler.close()
+
+
+def set_log_level(level: int):
+    """
+    Sets the lowest level logged by every logger, including ones already
+    created. Calls for levels below it return right away.
+
+    :param level: One of the values of LOG_LEVELS.
+    """
+    global log_level
+    log_level = level
+    for logger, created_level in created_loggers.items():
+        logger.setLevel(level=max(created_level, level))
+
+
+def log_to_file(path: str):
+    """
+    Also writes the log to a file, rotating it once it gets too big.
+
+    :param path: The path of the file, which is appended to.
+    """
+    global file_handler
+    start_logging()
+    handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES,
+                                  backupCount=LOG_FILE_BACKUP_COUNT,
+                                  encoding="utf-8")
+    handler.setFormatter(fmt=logging.Formatter(LOG_FORMAT))
+    # Only the background thread uses the handlers, so swap them around
+    # while it isn't running
+    listener.stop()
+    listener.handlers = listener.handlers + (handler,)
+    listener.start()
+    file_handler = handler
+
+
+def move_logs_to_stderr():
+    """
+    Sends all log messages to stderr, for when stdout is used for something
+    else. (like the serial data in headless mode) Affects loggers that were
+    already created and ones created later.
+    """
+    global stdout_log_stream
+    stdout_log_stream = sys.stderr
+    if stdout_handler is not None and stdout_handler.stream is sys.stdout:
+        stdout_handler.setStream(sys.stderr)
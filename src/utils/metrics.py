@@ -0,0 +1,236 @@
+import json
+import logging
+from threading import Lock
+from time import monotonic_ns, time_ns
+from typing import Optional
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How often the metrics are shown and exported, in ms
+METRICS_INTERVAL_MS = 1000
+# Values go in buckets by their number of bits, which covers anything up to
+# 2 ** 63
+HISTOGRAM_BUCKETS = 64
+
+
+class Histogram:
+    """
+    Counts values in power of two buckets, which is cheap enough to do for
+    every chunk. Percentiles are only as precise as the buckets, so they are
+    reported as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self):
+        """
+        Initialize the histogram.
+        """
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value: int):
+        """
+        Counts a value.
+
+        :param value: An int that is 0 or more.
+        """
+        self.buckets[value.bit_length()] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, point: float) -> int:
+        """
+        Estimates a percentile.
+
+        :param point: The percentile, from 0 to 100.
+        :return: The upper bound of the bucket the percentile is in, which is
+         never more than the largest value counted. 0 if nothing was counted.
+        """
+        if self.count == 0:
+            return 0
+        rank = max(int(self.count * point / 100 + 0.5), 1)
+        seen = 0
+        for bits, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << bits) - 1, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        """
+        Summarizes the histogram.
+
+        :return: A dict of the count, mean, 50th, 90th and 99th percentile
+         and max.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+
+class SessionMetrics:
+    """
+    Counters and histograms of what a session is doing, cheap enough to
+    stay on all the time. Most are only updated from one thread at a time,
+    with plain int operations and no locks, and reading them from another
+    thread may see a value that is a moment old, which is fine for showing
+    them. The ones more than one thread can update at once are only updated
+    through add_sent() and add_batch_delay(), which hold a lock.
+    """
+
+    def __init__(self):
+        """
+        Initialize the metrics.
+        """
+        self.started = monotonic_ns()
+        # Updated by whichever thread reads the port
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.read_sizes = Histogram()
+        # Guards bytes_sent, chunks_sent and batch_delays
+        self.lock = Lock()
+        # Updated by the write thread and the replay thread
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        # Updated by the write thread
+        self.sends_coalesced = 0
+        # How long each batch of received data was held, in ns, updated by
+        # the flushing thread and the thread that reads the port
+        self.batch_delays = Histogram()
+        # Updated by the GUI thread
+        self.frames = 0
+        self.batches_coalesced = 0
+        self.apply_times = Histogram()
+
+    def add_sent(self, size: int):
+        """
+        Counts a chunk that was sent. Can be called from any thread.
+
+        :param size: How many bytes were in it.
+        """
+        with self.lock:
+            self.bytes_sent += size
+            self.chunks_sent += 1
+
+    def add_batch_delay(self, delay: int):
+        """
+        Counts how long a batch of received data was held for. Can be called
+        from any thread.
+
+        :param delay: The time in ns.
+        """
+        with self.lock:
+            self.batch_delays.add(delay)
+
+    def snapshot(self, gauges: Optional[dict] = None) -> dict:
+        """
+        Takes a snapshot of the metrics, to show or export.
+
+        :param gauges: Current values that aren't counted here, like the
+         write queue depth and document size, to include.
+        :return: A dict that can be turned into JSON. Times are in ns.
+        """
+        with self.lock:
+            bytes_sent = self.bytes_sent
+            chunks_sent = self.chunks_sent
+            batch_delays = self.batch_delays.snapshot()
+        return {
+            "time": time_ns(),
+            "uptime": monotonic_ns() - self.started,
+            "bytes_received": self.bytes_received,
+            "chunks_received": self.chunks_received,
+            "read_sizes": self.read_sizes.snapshot(),
+            "bytes_sent": bytes_sent,
+            "chunks_sent": chunks_sent,
+            "sends_coalesced": self.sends_coalesced,
+            "batch_delays": batch_delays,
+            "frames": self.frames,
+            "batches_coalesced": self.batches_coalesced,
+            "apply_times": self.apply_times.snapshot(),
+            **(gauges or {})
+        }
+
+
+def format_size(size: float) -> str:
+    """
+    Formats a number of bytes to be read by people.
+
+    :param size: The number of bytes.
+    :return: A str like "1.5 MB".
+    """
+    for unit in ("B", "kB", "MB"):
+        if abs(size) < 1000:
+            return f"{size:.0f} {unit}" if unit == "B" else \
+                f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} GB"
+
+
+def describe_snapshot(snapshot: dict, last: Optional[dict]) -> str:
+    """
+    Describes a snapshot in a few words, for the status bar.
+
+    :param snapshot: The snapshot.
+    :param last: The snapshot before it, to work out rates from, or None.
+    :return: A str.
+    """
+    seconds = 1
+    received = snapshot["bytes_received"]
+    sent = snapshot["bytes_sent"]
+    if last is not None:
+        seconds = max(snapshot["uptime"] - last["uptime"], 1) / 1e9
+        received -= last["bytes_received"]
+        sent -= last["bytes_sent"]
+    else:
+        received = sent = 0
+    apply_p99 = snapshot["apply_times"]["p99"] / 1e6
+    description = (f"RX {format_size(received / seconds)}/s, "
+                   f"TX {format_size(sent / seconds)}/s, "
+                   f"queue {format_size(snapshot.get('write_queue_bytes', 0))}"
+                   f", frame p99 {apply_p99:.1f} ms, "
+                   f"{snapshot.get('document_lines', 0):,} lines")
+    dropped = snapshot.get("render_dropped", 0)
+    if dropped:
+        description += f", {format_size(dropped)} not shown"
+    return description
+
+
+class MetricsExporter:
+    """
+    Appends snapshots of the metrics to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the exporter, opening the file.
+
+        :param path: The path of the file, which is appended to.
+        """
+        self.path = path
+        logger.info(f"Exporting metrics to {path}")
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, snapshot: dict):
+        """
+        Appends a snapshot.
+
+        :param snapshot: The snapshot from SessionMetrics.snapshot().
+        """
+        self.file.write(json.dumps(snapshot) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        self.file.close()
@@ -0,0 +1,101 @@
+import logging
+import re
+from typing import Union
+
+from utils.logger import create_logger
+from utils.serial_config import NEWLINE_LF, NEWLINE_CR, NEWLINE_CRLF
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+CR_PATTERN = re.compile(rb"\r")
+CRLF_PATTERN = re.compile(rb"\r\n")
+# For data echoed back, where a "\r" on its own is return being pressed
+ECHO_PATTERN = re.compile(rb"\r\n?")
+
+
+class NewlineTranslator:
+    """
+    Translates the line endings of a stream of data to "\\n", one chunk at a
+    time in one pass, keeping enough state that a "\\r\\n" split across two
+    chunks is still treated as one line ending.
+
+    With the carriage return line ending every "\\r" is a line ending. With
+    the line feed line ending nothing is changed. With both, "\\r\\n"
+    becomes "\\n", and a "\\r" on its own is either kept as a carriage
+    return (for data received, so progress bars that redraw a line keep
+    working) or treated as return being pressed (for data echoed back
+    locally). Chunks that don't need changing are returned as is, without
+    being copied.
+    """
+
+    def __init__(self, mode: int, echo: bool = False):
+        """
+        Initialize the translator.
+
+        :param mode: An int, use the NEWLINE_* constants in
+         utils/serial_config
+        :param echo: Whether this translates data being sent, to be echoed
+         back locally. Data sent is written whole, so a "\\r" at the end of a
+         chunk is return being pressed and isn't held back.
+        """
+        self.mode = mode
+        self.echo = echo
+        self.pending_cr = False
+
+    def set_mode(self, mode: int):
+        """
+        Changes the line ending, keeping a "\\r" that was held back so it is
+        translated with the new one.
+
+        :param mode: An int, use the NEWLINE_* constants in
+         utils/serial_config
+        """
+        self.mode = mode
+
+    def translate(self, data: Union[bytes, memoryview]) \
+            -> Union[bytes, memoryview]:
+        """
+        Translates the next chunk of the stream.
+
+        :param data: The chunk, which is not empty. A memoryview is returned
+         as is when there is nothing to translate, and turned into bytes
+         otherwise.
+        :return: The translated chunk. A "\\r" at the end of the chunk is held
+         back until the next chunk shows whether a "\\n" follows it.
+        """
+        mode = self.mode
+        prefix = b""
+        if self.pending_cr:
+            self.pending_cr = False
+            if mode == NEWLINE_CR:
+                prefix = b"\n"
+            elif mode == NEWLINE_LF or data[:1] != b"\n":
+                prefix = b"\r"
+        if mode == NEWLINE_CRLF and not self.echo and data[-1:] == b"\r":
+            self.pending_cr = True
+            data = memoryview(data)[:-1]
+        # Searched first, as a memoryview is only copied when there is
+        # something to translate
+        if mode != NEWLINE_LF and CR_PATTERN.search(data) is not None:
+            if mode == NEWLINE_CR:
+                # Copying it first is only a memcpy, and bytes.replace() is
+                # much faster than a regex for one character
+                data = bytes(data).replace(b"\r", b"\n")
+            elif self.echo:
+                data = ECHO_PATTERN.sub(b"\n", data)
+            else:
+                data = CRLF_PATTERN.sub(b"\n", data)
+        if prefix:
+            return prefix + data
+        return data
+
+    def flush(self) -> bytes:
+        """
+        Returns anything held back, for when the stream ends.
+
+        :return: A bytes object, which is empty if nothing was held back.
+        """
+        if self.pending_cr:
+            self.pending_cr = False
+            return b"\r"
+        return b""
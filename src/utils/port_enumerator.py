@@ -0,0 +1,132 @@
+import logging
+import os
+from threading import Thread, Lock
+from time import perf_counter
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from serial.tools.list_ports import comports
+
+from utils.logger import create_logger
+from utils.startup import startup_timer
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Directories whose entries change when a serial port is plugged in or
+# unplugged
+PORT_WATCH_PATHS = ("/dev", "/sys/class/tty")
+# How long to let a burst of changes settle before enumerating, in ms
+PORT_WATCH_DEBOUNCE_MS = 300
+# How often to enumerate when there is nothing to watch (like on Windows),
+# in ms
+PORT_POLL_INTERVAL_MS = 2000
+
+
+def enumerate_ports() -> list[tuple[str, str]]:
+    """
+    Lists the serial ports. This can be slow with lots of ttys, so don't
+    call it on the GUI thread.
+
+    :return: A list of tuples of the path and a name to show.
+    """
+    return [(port.device, f"{port.device} ({port.description})")
+            for port in comports()]
+
+
+class PortEnumerator(QObject):
+    """
+    Keeps a cached list of the serial ports, shared by every session in
+    this process. Ports are enumerated on a background thread, and again
+    whenever the directories ports show up in change (or every so often
+    where there is nothing to watch), so the list stays up to date without
+    anyone waiting on it.
+    """
+
+    # The new list of ports, emitted from the background thread when it
+    # changes
+    ports_changed = pyqtSignal(list)
+
+    instance: Optional["PortEnumerator"] = None
+
+    @classmethod
+    def get(cls) -> "PortEnumerator":
+        """
+        Returns the shared enumerator, starting it if needed. Must be
+        called on the GUI thread.
+
+        :return: A PortEnumerator.
+        """
+        if cls.instance is None:
+            cls.instance = PortEnumerator()
+        return cls.instance
+
+    def __init__(self):
+        """
+        Initialize the enumerator and start the first enumeration. Use get()
+        instead.
+        """
+        super().__init__()
+        # None until the first enumeration finishes
+        self.ports: Optional[list[tuple[str, str]]] = None
+        self.lock = Lock()
+        self.scanning = False
+        self.rescan = False
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(PORT_WATCH_DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.refresh)
+        paths = [path for path in PORT_WATCH_PATHS if os.path.isdir(path)]
+        self.watcher = None
+        self.poll_timer = None
+        if paths:
+            logger.debug(f"Watching {paths} for serial ports")
+            self.watcher = QFileSystemWatcher(paths, self)
+            self.watcher.directoryChanged.connect(
+                lambda _: self.debounce_timer.start())
+        else:
+            logger.debug(f"Polling for serial ports every "
+                         f"{PORT_POLL_INTERVAL_MS} ms")
+            self.poll_timer = QTimer(self)
+            self.poll_timer.setInterval(PORT_POLL_INTERVAL_MS)
+            self.poll_timer.timeout.connect(self.refresh)
+            self.poll_timer.start()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Enumerates the ports again in the background. If an enumeration is
+        already running, another one runs right after it.
+        """
+        with self.lock:
+            if self.scanning:
+                self.rescan = True
+                return
+            self.scanning = True
+        Thread(target=self.scan_thread, daemon=True).start()
+
+    def scan_thread(self):
+        """
+        Enumerates the ports until nobody asked for another enumeration,
+        and emits ports_changed whenever the list changes.
+        """
+        while True:
+            start = perf_counter()
+            try:
+                ports = enumerate_ports()
+            except Exception:
+                logger.exception("Failed to enumerate serial ports!")
+                ports = self.ports or []
+            if self.ports is None:
+                startup_timer.record("Enumerating serial ports",
+                                     perf_counter() - start)
+            with self.lock:
+                changed = ports != self.ports
+                self.ports = ports
+                again = self.rescan
+                self.rescan = False
+                self.scanning = again
+            if changed:
+                logger.debug(f"Found {len(ports)} serial ports")
+                self.ports_changed.emit(ports)
+            if not again:
+                return
@@ -0,0 +1,166 @@
+import logging
+import os
+import select
+from threading import Event, Lock
+from typing import Optional
+
+from serial import Serial, SerialException
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Reads go into a buffer this big, at most this much at a time
+READ_RING_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# How long to wait for the port to be readable before checking whether it
+# is still open
+READ_WAIT_TIMEOUT = 1
+# After a read smaller than this, wait this many seconds before the next
+# one, so it reads everything that arrived in between instead of waking up
+# for every few bytes. Bigger reads mean data is arriving fast enough that
+# waiting would only let the OS buffers fill up.
+READ_COALESCE_SIZE = 1024
+READ_COALESCE_DELAY = 0.001
+
+
+class ReadRing:
+    """
+    A preallocated buffer that reads go straight into, one after the other,
+    going back to the start once there isn't room for a whole chunk. Each
+    read is handed out as a memoryview of the buffer instead of a new bytes
+    object. A memoryview stays valid until the ring comes back around to
+    it, so whatever keeps the data has to copy it before then.
+    """
+
+    def __init__(self, size: int = READ_RING_SIZE,
+                 chunk_size: int = READ_CHUNK_SIZE):
+        """
+        Initialize the ring.
+
+        :param size: The size of the buffer, in bytes.
+        :param chunk_size: The most to read at a time, which is no more than
+         the size.
+        """
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def reserve(self) -> memoryview:
+        """
+        Returns where the next read should go.
+
+        :return: A memoryview of chunk_size bytes.
+        """
+        if self.position + self.chunk_size > len(self.buffer):
+            self.position = 0
+        return self.view[self.position:self.position + self.chunk_size]
+
+    def commit(self, size: int) -> memoryview:
+        """
+        Takes what was read into the space from reserve().
+
+        :param size: How many bytes were read.
+        :return: A memoryview of them.
+        """
+        chunk = self.view[self.position:self.position + size]
+        self.position += size
+        return chunk
+
+
+def can_wait_for_readiness(port: Serial) -> bool:
+    """
+    Returns whether a port can be read with PortReader. Ports on Windows
+    have no file descriptor to wait on.
+
+    :param port: An open port.
+    :return: A bool.
+    """
+    return os.name == "posix" and getattr(port, "fd", None) is not None
+
+
+class PortReader:
+    """
+    Reads an open port by waiting for it to be readable, then reading as
+    much as is there straight into a ReadRing, instead of polling how much
+    is waiting and allocating a new bytes object for every read.
+
+    The port must not be closed while read() might be running, as its file
+    descriptor could be reused by something else: call stop(), wait for the
+    thread reading to finish, then close the port.
+    """
+
+    def __init__(self, port: Serial):
+        """
+        Initialize the reader.
+
+        :param port: An open port, that can_wait_for_readiness() is True
+         for.
+        """
+        self.port = port
+        self.fd = port.fd
+        # stop() writes to this to wake up the select()
+        self.wake_r, self.wake_w = os.pipe()
+        self.stopped = Event()
+        # So stop() never writes to the pipe once it is closed (and its file
+        # descriptor maybe reused)
+        self.lock = Lock()
+        self.closed = False
+        self.ring = ReadRing()
+        self.coalesce = False
+
+    def stop(self):
+        """
+        Makes read() return None from now on, waking it up if it is waiting.
+        Can be called from any thread.
+        """
+        self.stopped.set()
+        with self.lock:
+            if not self.closed:
+                os.write(self.wake_w, b"\0")
+
+    def close(self):
+        """
+        Closes the pipe used to wake up read(), once it won't be called
+        again.
+        """
+        with self.lock:
+            self.closed = True
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+
+    def read(self) -> Optional[memoryview]:
+        """
+        Waits for data and reads it.
+
+        :return: A memoryview of the data from the ring, or None if there
+         wasn't any before the timeout or the reader was stopped. Raises
+         SerialException if reading failed.
+        """
+        if self.coalesce:
+            self.stopped.wait(READ_COALESCE_DELAY)
+        if self.stopped.is_set():
+            return None
+        try:
+            ready, _, _ = select.select([self.fd, self.wake_r], [], [],
+                                        READ_WAIT_TIMEOUT)
+            if self.stopped.is_set():
+                return None
+            if not ready:
+                self.coalesce = False
+                return None
+            size = os.readv(self.fd, [self.ring.reserve()])
+        except BlockingIOError:
+            return None
+        except (OSError, ValueError) as e:
+            if self.stopped.is_set():
+                return None
+            raise SerialException(f"read failed: {e}")
+        if size == 0:
+            # Same as pyserial
+            raise SerialException("device reports readiness to read but "
+                                  "returned no data (device disconnected or "
+                                  "multiple access on port?)")
+        self.coalesce = size < READ_COALESCE_SIZE
+        return self.ring.commit(size)
@@ -0,0 +1,328 @@
+import logging
+import struct
+from threading import Thread, Condition, Event
+from time import monotonic_ns, time_ns
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# A recording starts with the magic, the format version and the Unix time in
+# nanoseconds it was started at, then has a record per chunk: the
+# time.monotonic_ns() it was received or sent at, which way it went, its
+# length and the chunk itself
+RECORDING_MAGIC = b"SERCOMRC"
+RECORDING_VERSION = 1
+RECORDING_HEADER = struct.Struct("<8sHq")
+RECORDING_RECORD = struct.Struct("<qBI")
+
+RECORD_RECEIVED = 0
+RECORD_SENT = 1
+
+# The most we will hold in memory when the disk can't keep up, anything past
+# this is dropped (and counted) instead of stalling the serial threads
+RECORDING_MAX_PENDING = 64 * 1024 * 1024
+RECORDING_WRITE_BUFFER_SIZE = 1024 * 1024
+RECORDING_READ_BUFFER_SIZE = 1024 * 1024
+
+# 0 as the replay speed replays as fast as possible
+REPLAY_AS_FAST_AS_POSSIBLE = 0
+DEFAULT_REPLAY_SPEED = 1.0
+MAX_REPLAY_SPEED = 1_000_000.0
+# When replaying as fast as possible, consecutive received chunks are joined
+# up to this size, so a recording of tiny reads doesn't replay a byte at a
+# time
+REPLAY_COALESCE_SIZE = 64 * 1024
+
+
+class SessionRecorder:
+    """
+    Records the raw chunks received and sent, with when each happened, so
+    the session can be replayed later. The writing happens on its own
+    thread so a slow disk never stalls the serial threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the recorder.
+
+        :param path: The path of the recording, which is overwritten.
+        """
+        self.path = path
+        self.pending = bytearray()
+        self.dropped = 0
+        self.condition = Condition()
+        self.running = False
+        self.thread = None
+        self.file = None
+
+    def start(self):
+        """
+        Creates the recording and starts the writer thread.
+        """
+        logger.info(f"Recording session to {self.path}")
+        self.file = open(self.path, "wb",
+                         buffering=RECORDING_WRITE_BUFFER_SIZE)
+        self.file.write(RECORDING_HEADER.pack(RECORDING_MAGIC,
+                                              RECORDING_VERSION, time_ns()))
+        self.running = True
+        self.thread = Thread(target=self.writer_thread, daemon=True)
+        logger.debug(f"Starting recording writer thread {self.thread}")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Writes everything still pending, and closes the recording.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        if self.dropped > 0:
+            logger.warning(f"Dropped {self.dropped} bytes because the disk "
+                           f"couldn't keep up with the recording")
+
+    def add(self, direction: int, data: bytes, timestamp: Optional[int]):
+        """
+        Queues a chunk to be recorded. Never blocks on the disk.
+
+        :param direction: RECORD_RECEIVED or RECORD_SENT.
+        :param data: A bytes-like object.
+        :param timestamp: When it happened, from time.monotonic_ns(). None
+         for now.
+        """
+        if timestamp is None:
+            timestamp = monotonic_ns()
+        with self.condition:
+            if len(self.pending) + len(data) > RECORDING_MAX_PENDING:
+                self.dropped += len(data)
+                return
+            self.pending += RECORDING_RECORD.pack(timestamp, direction,
+                                                  len(data))
+            self.pending += data
+            self.condition.notify()
+
+    def received(self, data: bytes, timestamp: Optional[int] = None):
+        """
+        Queues a chunk that was received to be recorded.
+
+        :param data: A bytes-like object.
+        :param timestamp: When it was received, from time.monotonic_ns().
+         Defaults to now.
+        """
+        self.add(RECORD_RECEIVED, data, timestamp)
+
+    def sent(self, data: bytes, timestamp: Optional[int] = None):
+        """
+        Queues a chunk that was sent to be recorded.
+
+        :param data: A bytes-like object.
+        :param timestamp: When it was sent, from time.monotonic_ns().
+         Defaults to now.
+        """
+        self.add(RECORD_SENT, data, timestamp)
+
+    def writer_thread(self):
+        """
+        Waits for chunks to be queued and writes them to the recording.
+        """
+        try:
+            while True:
+                with self.condition:
+                    while self.running and not self.pending:
+                        self.condition.wait()
+                    if not self.running and not self.pending:
+                        return
+                    data, self.pending = self.pending, bytearray()
+                self.file.write(data)
+        except OSError:
+            logger.exception("Error writing recording!")
+        finally:
+            self.file.close()
+
+
+def read_header(file: BinaryIO) -> int:
+    """
+    Reads and checks the header of a recording.
+
+    :param file: The recording, at its start.
+    :return: The Unix time in nanoseconds the recording started at. Raises
+     ValueError if the file isn't a recording this version can read.
+    """
+    header = file.read(RECORDING_HEADER.size)
+    if len(header) < RECORDING_HEADER.size:
+        raise ValueError("Not a sercom recording (too short)")
+    magic, version, started = RECORDING_HEADER.unpack(header)
+    if magic != RECORDING_MAGIC:
+        raise ValueError("Not a sercom recording")
+    if version != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {version}")
+    return started
+
+
+def read_records(file: BinaryIO) -> Iterator[tuple[int, int, bytes]]:
+    """
+    Reads the records of a recording, whose header was already read. A
+    record cut short (like by a crash while recording) ends the recording.
+
+    :param file: The recording, just after its header.
+    :return: An iterator of tuples of the timestamp, the direction and the
+     chunk. Raises ValueError when it gets to a record that can't be right.
+    """
+    size = RECORDING_RECORD.size
+    unpack = RECORDING_RECORD.unpack
+    while True:
+        head = file.read(size)
+        if len(head) < size:
+            if head:
+                logger.warning("Recording ends partway through a record")
+            return
+        timestamp, direction, length = unpack(head)
+        # Nothing longer is ever recorded, so this is checked before trying
+        # to read (and allocate) a length that is garbage
+        if direction not in (RECORD_RECEIVED, RECORD_SENT) or \
+                length > RECORDING_MAX_PENDING:
+            raise ValueError("Recording is corrupt")
+        data = file.read(length)
+        if len(data) < length:
+            logger.warning("Recording ends partway through a record")
+            return
+        yield timestamp, direction, data
+
+
+def coalesce_records(records: Iterator[tuple[int, int, bytes]]) \
+        -> Iterator[tuple[int, int, bytes]]:
+    """
+    Joins consecutive received chunks, up to REPLAY_COALESCE_SIZE.
+
+    :param records: An iterator from read_records().
+    :return: An iterator of tuples like it, with the timestamp of the first
+     chunk joined.
+    """
+    joined = bytearray()
+    joined_timestamp = 0
+    for timestamp, direction, data in records:
+        if direction == RECORD_RECEIVED and \
+                len(joined) + len(data) <= REPLAY_COALESCE_SIZE:
+            if not joined:
+                joined_timestamp = timestamp
+            joined += data
+            continue
+        if joined:
+            yield joined_timestamp, RECORD_RECEIVED, bytes(joined)
+            joined = bytearray()
+        if direction == RECORD_RECEIVED:
+            joined_timestamp = timestamp
+            joined += data
+        else:
+            yield timestamp, direction, data
+    if joined:
+        yield joined_timestamp, RECORD_RECEIVED, bytes(joined)
+
+
+class ReplaySource:
+    """
+    Replays a recording on its own thread, as if its chunks were being
+    received and sent right now. The gaps between chunks are kept (divided
+    by the speed), or skipped to replay as fast as possible.
+    """
+
+    def __init__(self, path: str, speed: float,
+                 on_received: Callable[[bytes, int], None],
+                 on_sent: Callable[[bytes], None],
+                 on_finished: Callable[[str], None]):
+        """
+        Initialize the replay.
+
+        :param path: The path of the recording.
+        :param speed: How many times faster than real time to replay, or
+         REPLAY_AS_FAST_AS_POSSIBLE.
+        :param on_received: Called on the replay thread with each chunk
+         received and the time.monotonic_ns() it is replayed at.
+        :param on_sent: Called on the replay thread with each chunk sent.
+        :param on_finished: Called on the replay thread once the replay
+         stops, with an empty str if it reached the end, otherwise why not.
+        """
+        self.path = path
+        self.speed = speed
+        self.on_received = on_received
+        self.on_sent = on_sent
+        self.on_finished = on_finished
+        self.cancelled = Event()
+        self.file = None
+        self.thread = None
+        self.replayed = 0
+
+    def start(self):
+        """
+        Opens the recording and starts replaying it. Raises OSError or
+        ValueError if it can't be read.
+        """
+        self.file = open(self.path, "rb",
+                         buffering=RECORDING_READ_BUFFER_SIZE)
+        try:
+            read_header(self.file)
+        except ValueError:
+            self.file.close()
+            raise
+        self.thread = Thread(target=self.replay_thread, daemon=True)
+        logger.debug(f"Starting replay thread {self.thread} for "
+                     f"{self.path} at {self.speed}x")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops replaying, and waits for the replay thread to finish.
+        """
+        self.cancelled.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    @property
+    def running(self) -> bool:
+        """
+        Returns whether the recording is still being replayed.
+
+        :return: A bool.
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def replay_thread(self):
+        """
+        Feeds the chunks of the recording to the callbacks, paced like they
+        were recorded.
+        """
+        reason = ""
+        start_time = monotonic_ns()
+        try:
+            records = read_records(self.file)
+            if self.speed == REPLAY_AS_FAST_AS_POSSIBLE:
+                records = coalesce_records(records)
+            first = None
+            for timestamp, direction, data in records:
+                if self.cancelled.is_set():
+                    reason = "Canceled"
+                    break
+                if self.speed != REPLAY_AS_FAST_AS_POSSIBLE:
+                    if first is None:
+                        first = timestamp
+                    due = start_time + int((timestamp - first) / self.speed)
+                    wait = due - monotonic_ns()
+                    if wait > 0 and self.cancelled.wait(wait / 1e9):
+                        reason = "Canceled"
+                        break
+                if direction == RECORD_SENT:
+                    self.on_sent(data)
+                else:
+                    self.on_received(data, monotonic_ns())
+                self.replayed += len(data)
+        except (OSError, ValueError) as e:
+            logger.exception(f"Error reading recording {self.path}!")
+            reason = str(e)
+        finally:
+            self.file.close()
+        seconds = (monotonic_ns() - start_time) / 1e9
+        logger.info(f"Replayed {self.replayed} bytes of {self.path} in "
+                    f"{seconds:.3f} seconds ({reason or 'complete'})")
+        self.on_finished(reason)
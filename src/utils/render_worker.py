@@ -0,0 +1,269 @@
+import logging
+from array import array
+from codecs import getincrementaldecoder
+from threading import Thread, Condition
+from time import monotonic_ns
+from typing import Callable, Optional
+
+from utils.logger import create_logger
+from utils.serial_config import OVERLOAD_BLOCK, OVERLOAD_DROP, \
+    OVERLOAD_CAPTURE_ONLY, DEFAULT_OVERLOAD_POLICY, DEFAULT_RENDER_BUDGET
+from utils.vt100 import VT100Parser
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+class RenderWorker:
+    """
+    Decodes and parses the data to show on its own thread, so the GUI thread
+    only has to apply the operations the parser made.
+
+    Only one list of render batches is ever waiting for the GUI. While the
+    GUI is busy applying it, whatever arrives is parsed and held, and handed
+    over in one go once the GUI says it is ready, so the GUI's event queue
+    never fills up with work and it stays responsive.
+
+    The data received that is waiting to be shown, from when it is added
+    until the GUI has applied it, is limited to the budget. What happens to
+    data that doesn't fit depends on the overload policy:
+
+        - OVERLOAD_BLOCK: add() waits for room, which stops the port being
+          read. With flow control on, that holds the device back, without
+          it the OS drops what doesn't fit in its buffer.
+        - OVERLOAD_DROP: the data is dropped, and a line saying how much was
+          dropped is shown in its place.
+        - OVERLOAD_CAPTURE_ONLY: nothing more is shown (it still goes to the
+          capture and recording) until the GUI has caught up with everything,
+          then a line saying how much wasn't shown is.
+
+    Data echoed locally is always shown.
+    """
+
+    def __init__(self, callback: Callable[[list], None],
+                 budget: int = DEFAULT_RENDER_BUDGET,
+                 policy: int = DEFAULT_OVERLOAD_POLICY,
+                 pause: Optional[Callable[[bool], None]] = None):
+        """
+        Initialize the worker.
+
+        :param callback: Called on the worker thread with a list of render
+         batches, each a tuple of the data, the list of operations from
+         utils/vt100 and an array("q") of when each line that starts in the
+         data started arriving (or None for now).
+        :param budget: The most bytes received to have waiting to be shown.
+        :param policy: What to do with data that doesn't fit in the budget,
+         use the constants in utils/serial_config.
+        :param pause: For sources that must not block (like the serial event
+         loop), called with True instead of blocking add() to stop reading,
+         and with False once there is room again. Called from the thread
+         that called add() or ready().
+        """
+        self.callback = callback
+        self.budget = budget
+        self.policy = policy
+        self.pause = pause
+        # Bytes added that the GUI hasn't applied yet, how many of them have
+        # been parsed and how many are in the list it is applying
+        self.outstanding = 0
+        self.parsed_size = 0
+        self.handed = 0
+        # Bytes dropped or not shown since the last marker, and in total
+        self.skipped = 0
+        self.dropped = 0
+        self.overloaded = False
+        self.paused = False
+        self.blocking = True
+        # How long add() has waited for room in total, in ns
+        self.blocked_ns = 0
+        self.decoder = getincrementaldecoder("utf8")("replace")
+        # So a character split across two reads isn't broken up by what is
+        # echoed in between
+        self.echo_decoder = getincrementaldecoder("utf8")("replace")
+        self.parser = VT100Parser()
+        self.pending = []
+        self.parsed = []
+        self.gui_ready = True
+        self.condition = Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        self.running = True
+        self.thread = Thread(target=self.render_thread, daemon=True)
+        logger.debug(f"Starting render worker thread {self.thread}")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the worker thread, once everything added so far has been
+        handed to the GUI.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    def unblock(self):
+        """
+        Stops add() from waiting for room from now on, and wakes it up if it
+        is, so what is still being received can be handed over while
+        stopping.
+        """
+        with self.condition:
+            self.blocking = False
+            self.condition.notify_all()
+
+    def set_limits(self, budget: int, policy: int):
+        """
+        Changes the budget and the overload policy.
+
+        :param budget: The most bytes received to have waiting to be shown.
+        :param policy: Use the constants in utils/serial_config.
+        """
+        with self.condition:
+            self.budget = budget
+            self.policy = policy
+            self.overloaded = False
+            self.condition.notify_all()
+        self.check_room()
+
+    def add(self, data: bytes, timestamps: Optional[array],
+            echo: bool = False):
+        """
+        Adds some data to be decoded and parsed, unless there is no room for
+        it.
+
+        :param data: The data.
+        :param timestamps: When each line that starts in the data started
+         arriving, or None for now.
+        :param echo: Whether the data was sent and is being echoed locally,
+         rather than received.
+        """
+        pause = False
+        with self.condition:
+            if not echo:
+                if self.policy == OVERLOAD_BLOCK:
+                    if self.pause is not None:
+                        pause = not self.paused and \
+                            self.outstanding + len(data) > self.budget
+                        self.paused = self.paused or pause
+                    elif not self.has_room(len(data)):
+                        start = monotonic_ns()
+                        self.condition.wait_for(
+                            lambda: self.has_room(len(data)) or
+                            not self.blocking or not self.running)
+                        self.blocked_ns += monotonic_ns() - start
+                elif self.overloaded or not self.has_room(len(data)):
+                    self.overloaded = self.policy == OVERLOAD_CAPTURE_ONLY
+                    self.skipped += len(data)
+                    self.dropped += len(data)
+                    return
+                self.add_marker()
+                self.outstanding += len(data)
+            self.pending.append((data, timestamps, echo, None))
+            self.condition.notify_all()
+        if pause:
+            logger.debug("Pausing reading until the terminal catches up")
+            self.pause(True)
+
+    def has_room(self, size: int) -> bool:
+        """
+        Returns whether there is room for some more data. Something always
+        fits once the GUI has caught up, even if it is bigger than the
+        budget. The condition must be held.
+
+        :param size: How many bytes.
+        :return: A bool.
+        """
+        return self.outstanding == 0 or self.outstanding + size <= self.budget
+
+    def add_marker(self):
+        """
+        Adds a line saying how much wasn't shown, if anything wasn't since
+        the last one. The condition must be held.
+        """
+        if self.skipped == 0:
+            return
+        if self.policy == OVERLOAD_DROP:
+            text = f"\n[sercom: dropped {self.skipped:,} bytes]\n"
+        else:
+            text = f"\n[sercom: {self.skipped:,} bytes received while " \
+                   f"catching up not shown]\n"
+        self.skipped = 0
+        self.pending.append((b"", None, False, text))
+
+    def check_room(self):
+        """
+        Shows the marker for what wasn't shown, and resumes reading, once
+        there is room again.
+        """
+        resume = False
+        with self.condition:
+            if self.overloaded and self.outstanding == 0:
+                self.overloaded = False
+            if not self.overloaded and self.has_room(0):
+                self.add_marker()
+            if self.paused and self.outstanding < self.budget:
+                self.paused = False
+                resume = True
+            self.condition.notify_all()
+        if resume:
+            logger.debug("Resuming reading")
+            self.pause(False)
+
+    def ready(self):
+        """
+        Called once the GUI has applied the last list of render batches.
+        """
+        with self.condition:
+            self.gui_ready = True
+            self.outstanding -= self.handed
+            self.handed = 0
+        self.check_room()
+
+    def render_thread(self):
+        """
+        Parses data as it arrives, and hands it to the GUI when it is ready.
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.pending or not self.running or
+                    (self.parsed and self.gui_ready))
+                items = self.pending
+                self.pending = []
+                stopping = not self.running
+            for data, timestamps, echo, marker in items:
+                if not echo and marker is None:
+                    self.parsed_size += len(data)
+                try:
+                    if marker is not None:
+                        ops = self.parser.feed(marker)
+                    elif echo:
+                        ops = self.parser.feed(self.echo_decoder.decode(data))
+                    else:
+                        ops = self.parser.feed(self.decoder.decode(data))
+                except Exception:
+                    # Still handed over empty, so its bytes come off the
+                    # budget once the GUI is ready
+                    logger.exception("Error parsing data to show!")
+                    self.parser = VT100Parser()
+                    ops = []
+                self.parsed.append((data, ops, timestamps))
+            with self.condition:
+                batches = None
+                if self.parsed and (self.gui_ready or stopping):
+                    batches = self.parsed
+                    self.parsed = []
+                    self.gui_ready = False
+                    self.handed = self.parsed_size
+                    self.parsed_size = 0
+                done = stopping and not self.pending
+            if batches is not None:
+                self.callback(batches)
+            if done:
+                return
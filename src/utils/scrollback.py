@@ -0,0 +1,105 @@
+import logging
+import re
+from array import array
+from mmap import mmap
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from typing import BinaryIO, Union
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+NEWLINE_REGEX = re.compile(b"\n")
+# Where every this many lines start in the spill file is kept in memory,
+# and the lines in between are found by scanning from there
+SPILL_INDEX_INTERVAL = 1024
+
+
+class ScrollbackSpill:
+    """
+    An append-only file on disk that holds the lines that were trimmed off
+    the top of the terminal, so history isn't lost when the scrollback is
+    limited.
+    """
+
+    def __init__(self):
+        """
+        Initialize the spill file. It is a temporary file that is deleted
+        when closed.
+        """
+        self.file = TemporaryFile(prefix="sercom-scrollback-")
+        logger.debug(f"Created scrollback spill file {self.file.name}")
+        self.line_count = 0
+        self.size = 0
+        # Where every SPILL_INDEX_INTERVAL lines start in the file, so line
+        # i * SPILL_INDEX_INTERVAL starts at index[i]
+        self.index = array("q", (0,))
+
+    def append(self, text: str):
+        """
+        Appends some lines to the end of the spill file.
+
+        :param text: The text to append, which should end with a newline.
+        """
+        data = text.encode("utf-8")
+        self.file.write(data)
+        count = data.count(b"\n")
+        next_indexed = len(self.index) * SPILL_INDEX_INTERVAL
+        if self.line_count + count >= next_indexed:
+            line = self.line_count
+            for match in NEWLINE_REGEX.finditer(data):
+                line += 1
+                if line == next_indexed:
+                    self.index.append(self.size + match.end())
+                    next_indexed += SPILL_INDEX_INTERVAL
+        self.line_count += count
+        self.size += len(data)
+
+    def block_offsets(self, data: Union[bytes, mmap], block: int,
+                      line_count: int, size: int) -> array:
+        """
+        Finds where each line in a block of SPILL_INDEX_INTERVAL lines
+        starts, by scanning from where the block starts.
+
+        :param data: What is in the spill file, like a mmap of it.
+        :param block: Which block, the first is 0.
+        :param line_count: How many lines data holds.
+        :param size: How many bytes data holds.
+        :return: An array("q") of where each line in the block starts in
+         data, plus where the line after the last one would start.
+        """
+        start = self.index[block]
+        if (block + 1) * SPILL_INDEX_INTERVAL <= line_count:
+            end = self.index[block + 1]
+        else:
+            end = size
+        offsets = array("q", (start,))
+        offsets.extend(match.end() for match in
+                       NEWLINE_REGEX.finditer(data, start, end))
+        return offsets
+
+    def flush(self):
+        """
+        Flushes what was appended to the file, so it can be read (or memory
+        mapped) from elsewhere.
+        """
+        self.file.flush()
+
+    def export(self, dest: BinaryIO):
+        """
+        Copies everything spilled so far into another file.
+
+        :param dest: A file opened for writing in binary mode.
+        """
+        self.file.flush()
+        self.file.seek(0)
+        copyfileobj(self.file, dest)
+        self.file.seek(0, 2)
+
+    def close(self):
+        """
+        Closes and deletes the spill file.
+        """
+        logger.debug(f"Closing scrollback spill file {self.file.name}")
+        self.file.close()
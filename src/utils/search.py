@@ -0,0 +1,305 @@
+import logging
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from mmap import mmap, ACCESS_READ
+from threading import Thread, Condition
+from typing import Callable, Optional, Union
+
+from utils.logger import create_logger
+from utils.scrollback import ScrollbackSpill, SPILL_INDEX_INTERVAL
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How many lines to scan between checks for a newer search
+SEARCH_CHUNK_LINES = 65536
+
+
+def make_pattern(text: str, regex: bool, case_sensitive: bool,
+                 binary: bool = True) -> re.Pattern:
+    """
+    Compiles what the user searched for.
+
+    :param text: The text to find, or a regular expression.
+    :param regex: Whether the text is a regular expression.
+    :param case_sensitive: Whether to match case.
+    :param binary: Whether to make a pattern over UTF-8 bytes (for
+     scanning the line store) instead of over str (for highlighting a line).
+     Only ASCII letters ignore case in a bytes pattern.
+    :return: The compiled pattern. Raises re.error if the regular
+     expression is invalid.
+    """
+    flags = re.MULTILINE
+    if not case_sensitive:
+        flags |= re.IGNORECASE
+    source = text.encode("utf-8") if binary else text
+    if not regex:
+        source = re.escape(source)
+    return re.compile(source, flags)
+
+
+class SearchRequest:
+    """
+    A snapshot of the line store to search, taken on the GUI thread. Lines
+    are numbered from the start of the session, so the lines spilled to
+    disk come first, then the lines in the document.
+    """
+
+    def __init__(self, generation: int, pattern: re.Pattern, filter: bool,
+                 from_line: int, refine_below: int, spill: ScrollbackSpill,
+                 doc_first: int, doc_lines: list[str]):
+        """
+        Initialize the request.
+
+        :param generation: Which search this is. A request with the same
+         generation as the last one updates its results, a new generation
+         starts over.
+        :param pattern: The pattern from make_pattern().
+        :param filter: Whether to return the text of the matching lines too.
+        :param from_line: The first line that needs searching, as lines
+         before it haven't changed since the last results.
+        :param refine_below: For a new search that only narrows down the
+         last one (like typing another character), the lines before this
+         only need the last search's matches checked again. 0 to search
+         everything.
+        :param spill: The spill file of the lines trimmed off the document.
+        :param doc_first: The line number of the first line in doc_lines.
+        :param doc_lines: The text of the lines in the document from
+         doc_first on.
+        """
+        self.generation = generation
+        self.pattern = pattern
+        self.filter = filter
+        self.from_line = from_line
+        self.refine_below = refine_below
+        spill.flush()
+        self.spill = spill
+        self.spill_size = spill.size
+        self.spill_lines = spill.line_count
+        self.doc_first = doc_first
+        self.doc_lines = doc_lines
+
+
+class SearchWorker:
+    """
+    Searches the line store on its own thread. Results are kept between
+    requests so only the lines that changed are searched again as data
+    streams in, and a search that only narrows down the last one checks the
+    last one's matches instead of scanning all of history again.
+    """
+
+    def __init__(self, callback: Callable[[tuple], None]):
+        """
+        Initialize the worker.
+
+        :param callback: Called on the worker thread with a tuple of the
+         generation, the first line searched (matches from it on replace
+         the ones before), an array("q") of the new matching line numbers
+         and a list of their text (or None if the request isn't filtering).
+        """
+        self.callback = callback
+        self.request = None
+        self.generation = None
+        self.matches = array("q")
+        self.condition = Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        self.running = True
+        self.thread = Thread(target=self.search_thread, daemon=True)
+        logger.debug(f"Starting search worker thread {self.thread}")
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the worker thread, giving up on any search in progress.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def search(self, request: SearchRequest):
+        """
+        Queues a request, giving up on any older search in progress.
+
+        :param request: The request.
+        """
+        with self.condition:
+            self.request = request
+            self.generation = request.generation
+            self.condition.notify()
+
+    def cancel(self):
+        """
+        Gives up on any search in progress or queued.
+        """
+        with self.condition:
+            self.request = None
+            self.generation = None
+
+    def search_thread(self):
+        """
+        Runs requests as they arrive.
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.request is not None or not self.running)
+                if not self.running:
+                    return
+                request = self.request
+                self.request = None
+            try:
+                results = self.run(request)
+            except Exception:
+                logger.exception("Search failed!")
+                continue
+            if results is not None:
+                self.callback(results)
+
+    def cancelled(self, request: SearchRequest) -> bool:
+        """
+        Returns whether a request has been superseded.
+
+        :param request: The request.
+        :return: A bool.
+        """
+        return self.generation != request.generation or not self.running
+
+    def run(self, request: SearchRequest) -> Optional[tuple]:
+        """
+        Searches what changed in the line store.
+
+        :param request: The request.
+        :return: The results to pass to the callback, or None if the request
+         was superseded.
+        """
+        candidates = None
+        if request.from_line == 0:
+            if request.refine_below > 0:
+                candidates = self.matches
+            self.matches = array("q")
+        else:
+            del self.matches[bisect_left(self.matches, request.from_line):]
+        found = array("q")
+        texts = [] if request.filter else None
+
+        if request.from_line < request.spill_lines and request.spill_size:
+            spill = request.spill
+            with open_spill(request) as data:
+                # Only the start of every block of lines is kept, so each
+                # one is searched on its own
+                for block in range(
+                        request.from_line // SPILL_INDEX_INTERVAL,
+                        (request.spill_lines - 1) // SPILL_INDEX_INTERVAL + 1):
+                    offsets = spill.block_offsets(data, block,
+                                                  request.spill_lines,
+                                                  request.spill_size)
+                    base = block * SPILL_INDEX_INTERVAL
+                    if not self.search_lines(request, data, offsets, base,
+                                             request.from_line,
+                                             base + len(offsets) - 1,
+                                             candidates, found, texts):
+                        return None
+
+        encoded = [line.encode("utf-8") for line in request.doc_lines]
+        data = b"\n".join(encoded) + b"\n"
+        offsets = array("q", accumulate((len(line) + 1 for line in encoded),
+                                        initial=0))
+        if not self.search_lines(request, data, offsets, request.doc_first,
+                                 request.doc_first,
+                                 request.doc_first + len(encoded),
+                                 candidates, found, texts):
+            return None
+
+        self.matches.extend(found)
+        return request.generation, request.from_line, found, texts
+
+    def search_lines(self, request: SearchRequest,
+                     data: Union[bytes, mmap], offsets: array, base: int,
+                     first: int, last: int, candidates: Optional[array],
+                     found: array, texts: Optional[list[str]]) -> bool:
+        """
+        Searches a range of lines in a buffer.
+
+        :param request: The request.
+        :param data: The buffer of lines, each ending in a newline.
+        :param offsets: Where each line in the buffer starts, with one more
+         for the end of the last line.
+        :param base: The line number of the first line in the buffer.
+        :param first: The line number of the first line to search.
+        :param last: The line number after the last line to search.
+        :param candidates: The last search's matches to check again for the
+         lines before request.refine_below, or None to search every line.
+        :param found: Gets the matching line numbers.
+        :param texts: Gets the text of the matching lines, if not None.
+        :return: False if the request was superseded partway.
+        """
+        pattern = request.pattern
+        first = max(first, base)
+        split = first
+        if candidates is not None:
+            split = min(max(request.refine_below, first), last)
+            start = bisect_left(candidates, first)
+            end = bisect_left(candidates, split)
+            for i in range(start, end):
+                if i % SEARCH_CHUNK_LINES == 0 and self.cancelled(request):
+                    return False
+                line = candidates[i] - base
+                if pattern.search(data, offsets[line],
+                                  offsets[line + 1]) is not None:
+                    self.add_match(data, offsets, base, line, found, texts)
+        for chunk in range(split, last, SEARCH_CHUNK_LINES):
+            if self.cancelled(request):
+                return False
+            lo = chunk - base
+            hi = min(chunk + SEARCH_CHUNK_LINES, last) - base
+            pos = offsets[lo]
+            end = offsets[hi]
+            while True:
+                match = pattern.search(data, pos, end)
+                if match is None:
+                    break
+                # Only the first match on each line matters
+                line = bisect_right(offsets, match.start(), lo, hi) - 1
+                self.add_match(data, offsets, base, line, found, texts)
+                pos = offsets[line + 1]
+                if pos >= end:
+                    break
+        return True
+
+    @staticmethod
+    def add_match(data: Union[bytes, mmap], offsets: array, base: int,
+                  line: int, found: array, texts: Optional[list[str]]):
+        """
+        Records a matching line.
+
+        :param data: The buffer of lines.
+        :param offsets: Where each line in the buffer starts.
+        :param base: The line number of the first line in the buffer.
+        :param line: The index of the matching line in the buffer.
+        :param found: Gets the line number.
+        :param texts: Gets the text of the line, if not None.
+        """
+        found.append(base + line)
+        if texts is not None:
+            texts.append(data[offsets[line]:offsets[line + 1] - 1].decode(
+                "utf-8", "replace"))
+
+
+def open_spill(request: SearchRequest) -> mmap:
+    """
+    Memory maps the part of the spill file a request covers.
+
+    :param request: The request, with a spill_size over 0.
+    :return: A read only mmap, to use in a with statement.
+    """
+    return mmap(request.spill.file.fileno(), request.spill_size,
+                access=ACCESS_READ)
@@ -0,0 +1,263 @@
+import logging
+import mmap
+import re
+from threading import Thread, Event
+from time import monotonic
+from typing import Callable, Union, TYPE_CHECKING
+
+from utils.logger import create_logger
+from utils.serial_config import SEND_PACING_RATE, SEND_PACING_ECHO, \
+    SEND_CHUNK_SIZE, SEND_ECHO_TIMEOUT
+
+if TYPE_CHECKING:
+    from mvc.model import sercomModel
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How often to report progress, in seconds
+SEND_PROGRESS_INTERVAL = 0.1
+# How often to check for cancellation while waiting on the port, in seconds
+SEND_POLL_INTERVAL = 0.1
+# Searched for in what is received, which can be a memoryview (that has no
+# find() of its own), and in what is sent, to find where each line ends in
+# one scan
+LINE_END_PATTERN = re.compile(rb"[\r\n]")
+
+
+class TokenBucket:
+    """
+    Paces a stream of bytes to a rate, while allowing small bursts so the
+    port is never left idle between chunks.
+    """
+
+    def __init__(self, rate: int, cancelled: Event):
+        """
+        Initialize the bucket.
+
+        :param rate: The rate in bytes per second.
+        :param cancelled: Waiting stops early once this is set.
+        """
+        self.rate = rate
+        # Hold 50 ms worth of bytes
+        self.capacity = max(rate // 20, 1)
+        self.tokens = self.capacity
+        self.last = monotonic()
+        self.cancelled = cancelled
+
+    def refill(self):
+        """
+        Adds the tokens earned since the last refill.
+        """
+        now = monotonic()
+        self.tokens = min(self.tokens + (now - self.last) * self.rate,
+                          self.capacity)
+        self.last = now
+
+    def take(self, count: int):
+        """
+        Waits until there are enough tokens to send some bytes, then takes
+        them.
+
+        :param count: How many bytes, at most the capacity.
+        """
+        self.refill()
+        if self.tokens < count:
+            self.cancelled.wait((count - self.tokens) / self.rate)
+            self.refill()
+        self.tokens -= count
+
+
+class StreamSender:
+    """
+    Streams a file or a block of data through the model's write path on its
+    own thread, paced so the device on the other end can keep up. Files are
+    memory mapped so they are never read into memory all at once.
+    """
+
+    def __init__(self, model: "sercomModel", source: Union[str, bytes],
+                 pacing: int, rate: int, line_delay: float,
+                 on_progress: Callable[[int, int], None],
+                 on_finished: Callable[[str], None]):
+        """
+        Initialize the sender.
+
+        :param model: The connected model to send through.
+        :param source: A path to a file to send, or a bytes object.
+        :param pacing: An int, use the SEND_PACING_* constants in
+         utils/serial_config
+        :param rate: The bytes per second when pacing by rate, 0 for the line
+         rate of the port.
+        :param line_delay: The seconds to wait after each line when pacing by
+         line delay.
+        :param on_progress: Called with the bytes sent so far and the total.
+        :param on_finished: Called once done, with an empty str if everything
+         was sent, otherwise with why not.
+        """
+        self.model = model
+        self.source = source
+        self.pacing = pacing
+        self.rate = rate
+        self.line_delay = line_delay
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.cancelled = Event()
+        self.echoed = Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Starts sending.
+        """
+        self.thread = Thread(target=self.send_thread, daemon=True)
+        logger.debug(f"Starting send thread {self.thread}")
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Stops sending after the chunk currently being written.
+        """
+        self.cancelled.set()
+
+    @property
+    def running(self) -> bool:
+        """
+        Returns whether we are still sending.
+
+        :return: A boolean.
+        """
+        return self.thread is not None and self.thread.is_alive()
+
+    def notice_received(self, data: Union[bytes, memoryview]):
+        """
+        Called by the model with everything received, so we can tell when a
+        line has been echoed back.
+
+        :param data: The data received.
+        """
+        if LINE_END_PATTERN.search(data) is not None:
+            self.echoed.set()
+
+    def line_rate(self) -> int:
+        """
+        Returns how many bytes per second the port can actually carry, or 0
+        if flow control is on and the device will tell us when to stop.
+
+        :return: An int.
+        """
+        port = self.model.port
+        if port.xonxoff or port.rtscts or port.dsrdtr:
+            return 0
+        bits = 1 + port.bytesize + (port.parity != "N") + port.stopbits
+        return int(port.baudrate / bits)
+
+    def wait_for_writes(self) -> bool:
+        """
+        Waits until everything sent has been written to the port, which is
+        where flow control holds us back if the device asks it to.
+
+        :return: Whether we should keep sending.
+        """
+        while not self.model.wait_for_writes(SEND_POLL_INTERVAL):
+            if self.cancelled.is_set() or not self.model.connected:
+                return False
+        return not self.cancelled.is_set() and self.model.connected
+
+    def send_thread(self):
+        """
+        Sends the source, reporting progress as it goes.
+        """
+        reason = ""
+        mapped = None
+        try:
+            if isinstance(self.source, str):
+                with open(self.source, "rb") as file:
+                    # Empty files can't be mapped
+                    if file.seek(0, 2) > 0:
+                        mapped = mmap.mmap(file.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+                data = mapped if mapped is not None else b""
+            else:
+                data = self.source
+            reason = self.send_data(data)
+        except OSError as exc:
+            logger.exception("Error sending data!")
+            reason = str(exc)
+        finally:
+            if mapped is not None:
+                mapped.close()
+        logger.debug(f"Finished sending ({reason or 'complete'})")
+        self.on_finished(reason)
+
+    @staticmethod
+    def find_line_end(data: Union[bytes, mmap.mmap], start: int,
+                      end: int) -> int:
+        """
+        Finds the end of the first line in part of the data, where a line
+        ends with "\n", "\r" or "\r\n".
+
+        :param data: A bytes object or a memory map.
+        :param start: Where to start looking.
+        :param end: Where to stop looking.
+        :return: The offset just past the line ending, or -1 if there isn't
+         one.
+        """
+        found = LINE_END_PATTERN.search(data, start, end)
+        if found is None:
+            return -1
+        i = found.end()
+        # The "\n" of a "\r\n" can be just past where to stop looking
+        if data[i - 1] == ord("\r") and data[i:i + 1] == b"\n":
+            return i + 1
+        return i
+
+    def send_data(self, data: Union[bytes, mmap.mmap]) -> str:
+        """
+        Sends all the data, paced.
+
+        :param data: A bytes object or a memory map.
+        :return: An empty str if everything was sent, otherwise why not.
+        """
+        total = len(data)
+        sent = 0
+        last_progress = 0
+        bucket = None
+        chunk_size = SEND_CHUNK_SIZE
+        if self.pacing == SEND_PACING_RATE:
+            rate = self.rate or self.line_rate()
+            if rate > 0:
+                bucket = TokenBucket(rate, self.cancelled)
+                chunk_size = min(chunk_size, bucket.capacity)
+            logger.debug(f"Sending {total} bytes at "
+                         f"{rate or 'unlimited'} bytes per second")
+        self.on_progress(0, total)
+        while sent < total:
+            end = min(sent + chunk_size, total)
+            line_ended = False
+            if self.pacing != SEND_PACING_RATE:
+                newline = self.find_line_end(data, sent, end)
+                if newline != -1:
+                    end = newline
+                    line_ended = True
+            if bucket is not None:
+                bucket.take(end - sent)
+            if self.cancelled.is_set():
+                return "Canceled"
+            self.echoed.clear()
+            self.model.send(bytes(data[sent:end]))
+            if not self.wait_for_writes():
+                return "Canceled" if self.cancelled.is_set() else \
+                    "Disconnected"
+            sent = end
+            if line_ended or sent == total:
+                if self.pacing == SEND_PACING_ECHO:
+                    if not self.echoed.wait(SEND_ECHO_TIMEOUT):
+                        logger.warning("Timed out waiting for line to be "
+                                       "echoed")
+                elif self.pacing != SEND_PACING_RATE:
+                    self.cancelled.wait(self.line_delay)
+            now = monotonic()
+            if now - last_progress >= SEND_PROGRESS_INTERVAL:
+                last_progress = now
+                self.on_progress(sent, total)
+        self.on_progress(sent, total)
+        return ""
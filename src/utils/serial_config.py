@@ -13,18 +13,15 @@ logger = create_logger(name=__name__, level=logging.DEBUG)
 # )
 
 COMMON_BAUD_RATES = Serial.BAUDRATES
-logger.debug(f"Ccommon baud rates available: {COMMON_BAUD_RATES}")
 
 HIGH_SPEED_BAUD_RATES = (
     230400, 460800, 500000, 576000, 921600, 1000000, 1152000, 1500000, 2000000,
     2500000, 3000000, 3500000, 4000000
 )
-logger.debug(f"High speed baud rates: {HIGH_SPEED_BAUD_RATES}")
 
 ALL_BAUD_RATES = COMMON_BAUD_RATES + HIGH_SPEED_BAUD_RATES
 
 DEFAULT_BAUD_RATE = 9600
-logger.debug(f"Default baud rate: {DEFAULT_BAUD_RATE}")
 
 # BYTE_SIZES = {
 #     "&5 bits": FIVEBITS,
@@ -36,10 +33,8 @@ BYTE_SIZES = dict(zip(
     (f"&{s} bits" for s in Serial.BYTESIZES),
     Serial.BYTESIZES
 ))
-logger.debug(f"Byte sizes available: {BYTE_SIZES}")
 
 DEFAULT_BYTE_SIZE = EIGHTBITS
-logger.debug(f"Default byte size: {DEFAULT_BYTE_SIZE}")
 
 # PARITIES = {
 #     "&No parity": PARITY_NONE,
@@ -58,10 +53,8 @@ PARITIES = dict(filter(
         "&Space parity": PARITY_SPACE
     }.items()
 ))
-logger.debug(f"Parities available: {PARITIES}")
 
 DEFAULT_PARITY = PARITY_NONE
-logger.debug(f"Default parity: {DEFAULT_PARITY}")
 
 STOP_BITS = dict(filter(
     lambda b: b[1] in Serial.STOPBITS,
@@ -71,10 +64,8 @@ STOP_BITS = dict(filter(
         "&2 stop bits": STOPBITS_TWO
     }.items()
 ))
-logger.debug(f"Stop bits available: {STOP_BITS}")
 
 DEFAULT_STOP_BIT = STOPBITS_ONE
-logger.debug(f"Default stop bit: {DEFAULT_STOP_BIT}")
 
 NO_FLOW_CONTROL = 0
 XON_XOFF_SOFT_FLOW_CONTROL = 1
@@ -87,10 +78,8 @@ FLOW_CONTROLS = {
     "&RTS/CTS (hardware) flow control": RTS_CTS_HARD_FLOW_CONTROL,
     "&DSR/DTR (hardware) flow control": DSR_DTR_HARD_FLOW_CONTROL
 }
-logger.debug(f"Flow control methods available: {FLOW_CONTROLS}")
 
 DEFAULT_FLOW_CONTROL = NO_FLOW_CONTROL
-logger.debug(f"Default flow control: {DEFAULT_FLOW_CONTROL}")
 
 NEWLINE_LF = 0
 NEWLINE_CR = 1
@@ -101,7 +90,6 @@ LINE_ENDINGS = {
     "&Carriage return (\\r)": NEWLINE_CR,
     "Carriage return &and line feed (\\r\\n)": NEWLINE_CRLF
 }
-logger.debug(f"Line endings available: {LINE_ENDINGS}")
 
 DEFAULT_LINE_ENDING = NEWLINE_LF
 # Possible values of platform.system():
@@ -112,4 +100,108 @@ DEFAULT_LINE_ENDING = NEWLINE_LF
 if system() == "Windows":
     DEFAULT_LINE_ENDING = NEWLINE_CRLF
 
-logger.debug(f"Default line ending: {DEFAULT_LINE_ENDING}")
+
+# Received data is batched up before being handed to the GUI, flushed when
+# either of these limits is hit
+RECEIVE_BATCH_SIZE = 64 * 1024
+
+RECEIVE_BATCH_DELAY = 0.016
+
+# Everything queued to send is written to the port in one go, up to this many
+# bytes, optionally waiting this many milliseconds for more to be queued
+WRITE_COALESCE_SIZE = 64 * 1024
+
+DEFAULT_WRITE_COALESCE_MS = 0
+
+# How the serial port is read from and written to
+IO_ENGINE_THREADS = 0
+IO_ENGINE_ASYNCIO = 1
+
+IO_ENGINES = {
+    "&Threads (a read and a write thread per port)": IO_ENGINE_THREADS,
+    "&asyncio (one event loop for all ports)": IO_ENGINE_ASYNCIO
+}
+
+DEFAULT_IO_ENGINE = IO_ENGINE_THREADS
+
+# How files and pastes are paced when they are sent
+SEND_PACING_RATE = 0
+SEND_PACING_LINE_DELAY = 1
+SEND_PACING_ECHO = 2
+
+SEND_PACINGS = {
+    "&Bytes per second": SEND_PACING_RATE,
+    "&Delay after each line": SEND_PACING_LINE_DELAY,
+    "&Wait for each line to be echoed": SEND_PACING_ECHO
+}
+
+DEFAULT_SEND_PACING = SEND_PACING_RATE
+
+# 0 means the line rate of the port, which is unlimited with flow control
+DEFAULT_SEND_RATE = 0
+
+DEFAULT_SEND_LINE_DELAY_MS = 10
+
+SEND_CHUNK_SIZE = 4096
+
+SEND_ECHO_TIMEOUT = 1
+
+# What to do when data arrives faster than the terminal can show it, once
+# the backlog waiting to be shown reaches the render budget
+OVERLOAD_BLOCK = 0
+OVERLOAD_DROP = 1
+OVERLOAD_CAPTURE_ONLY = 2
+
+OVERLOAD_POLICIES = {
+    "&Stop reading (lets flow control hold the device back)": OVERLOAD_BLOCK,
+    "&Drop what doesn't fit and mark it": OVERLOAD_DROP,
+    "Only &capture until the terminal catches up": OVERLOAD_CAPTURE_ONLY
+}
+
+DEFAULT_OVERLOAD_POLICY = OVERLOAD_DROP
+
+# The most received data, in bytes, waiting to be shown at once
+DEFAULT_RENDER_BUDGET = 4 * 1024 * 1024
+
+MIN_RENDER_BUDGET = 64 * 1024
+
+# The most raw data received to hold for the hex dump until the GUI takes
+# it, anything past this is dropped (and counted)
+HEX_DUMP_MAX_PENDING = 4 * 1024 * 1024
+
+
+def log_serial_config():
+    """
+    Log the serial options available and their defaults. Not done while
+    importing, as it slows down starting up.
+    """
+    logger.debug(f"Ccommon baud rates available: {COMMON_BAUD_RATES}")
+    logger.debug(f"High speed baud rates: {HIGH_SPEED_BAUD_RATES}")
+    logger.debug(f"Default baud rate: {DEFAULT_BAUD_RATE}")
+    logger.debug(f"Byte sizes available: {BYTE_SIZES}")
+    logger.debug(f"Default byte size: {DEFAULT_BYTE_SIZE}")
+    logger.debug(f"Parities available: {PARITIES}")
+    logger.debug(f"Default parity: {DEFAULT_PARITY}")
+    logger.debug(f"Stop bits available: {STOP_BITS}")
+    logger.debug(f"Default stop bit: {DEFAULT_STOP_BIT}")
+    logger.debug(f"Flow control methods available: {FLOW_CONTROLS}")
+    logger.debug(f"Default flow control: {DEFAULT_FLOW_CONTROL}")
+    logger.debug(f"Line endings available: {LINE_ENDINGS}")
+    logger.debug(f"Default line ending: {DEFAULT_LINE_ENDING}")
+    logger.debug(f"Receive batch size: {RECEIVE_BATCH_SIZE} bytes")
+    logger.debug(f"Receive batch delay: {RECEIVE_BATCH_DELAY} seconds")
+    logger.debug(f"Write coalesce size: {WRITE_COALESCE_SIZE} bytes")
+    logger.debug(f"Default write coalescing window: "
+                 f"{DEFAULT_WRITE_COALESCE_MS} ms")
+    logger.debug(f"I/O engines available: {IO_ENGINES}")
+    logger.debug(f"Default I/O engine: {DEFAULT_IO_ENGINE}")
+    logger.debug(f"Send pacings available: {SEND_PACINGS}")
+    logger.debug(f"Default send pacing: {DEFAULT_SEND_PACING}")
+    logger.debug(f"Default send rate: {DEFAULT_SEND_RATE} bytes per second")
+    logger.debug(f"Default send line delay: {DEFAULT_SEND_LINE_DELAY_MS} ms")
+    logger.debug(f"Send chunk size: {SEND_CHUNK_SIZE} bytes")
+    logger.debug(f"Send echo timeout: {SEND_ECHO_TIMEOUT} seconds")
+    logger.debug(f"Overload policies available: {OVERLOAD_POLICIES}")
+    logger.debug(f"Default overload policy: {DEFAULT_OVERLOAD_POLICY}")
+    logger.debug(f"Default render budget: {DEFAULT_RENDER_BUDGET} bytes")
+    logger.debug(f"Hex dump max pending: {HEX_DUMP_MAX_PENDING} bytes")
@@ -0,0 +1,85 @@
+import logging
+from threading import Lock
+from time import perf_counter
+
+from utils.logger import create_logger
+
+# Imported as early as possible, so this is close to when the process started
+PROCESS_START = perf_counter()
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+
+class StartupTimer:
+    """
+    Times each phase of starting up, from the imports to the first paint of
+    the window, so it is easy to see where the time goes. Phases are laps:
+    each one runs from the end of the last one, so calling lap() at the end
+    of every phase accounts for all the time. Work done in the background
+    while starting up is recorded on its own.
+    """
+
+    def __init__(self):
+        """
+        Initialize the timer.
+        """
+        self.enabled = False
+        self.finished = False
+        self.last_lap = PROCESS_START
+        self.phases: list[tuple[str, float]] = []
+        self.background: list[tuple[str, float]] = []
+        self.lock = Lock()
+
+    def lap(self, name: str):
+        """
+        Ends a phase. Does nothing once starting up has finished, so it is
+        safe to call from code that also runs later (like opening another
+        session).
+
+        :param name: What the phase did.
+        """
+        if self.finished:
+            return
+        now = perf_counter()
+        self.phases.append((name, now - self.last_lap))
+        self.last_lap = now
+
+    def record(self, name: str, seconds: float):
+        """
+        Records work done in the background while starting up. Can be
+        called from any thread.
+
+        :param name: What the work did.
+        :param seconds: How long it took.
+        """
+        with self.lock:
+            if not self.finished:
+                self.background.append((name, seconds))
+                return
+        if self.enabled:
+            logger.info(f"Startup (in the background): {name} took "
+                        f"{seconds * 1000:.1f} ms")
+
+    def finish(self):
+        """
+        Ends the last phase, and logs the report if it was asked for.
+        """
+        if self.finished:
+            return
+        with self.lock:
+            self.finished = True
+        total = self.last_lap - PROCESS_START
+        logger.debug(f"Took {total:.3f} seconds to start up")
+        if not self.enabled:
+            return
+        logger.info("Startup phases:")
+        for name, seconds in self.phases:
+            logger.info(f"  {name}: {seconds * 1000:.1f} ms "
+                        f"({seconds / total:.0%})")
+        logger.info(f"  Total: {total * 1000:.1f} ms")
+        for name, seconds in self.background:
+            logger.info(f"Startup (in the background): {name} took "
+                        f"{seconds * 1000:.1f} ms")
+
+
+startup_timer = StartupTimer()
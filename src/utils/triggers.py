@@ -0,0 +1,306 @@
+import logging
+import re
+from collections import deque
+from typing import Optional
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# What a trigger does when it matches, combined as flags
+TRIGGER_HIGHLIGHT = 1
+TRIGGER_ALERT = 2
+TRIGGER_MARK = 4
+TRIGGER_PAUSE = 8
+
+TRIGGER_ACTIONS = {
+    "highlight": TRIGGER_HIGHLIGHT,
+    "alert": TRIGGER_ALERT,
+    "mark": TRIGGER_MARK,
+    "pause": TRIGGER_PAUSE
+}
+DEFAULT_TRIGGER_ACTIONS = TRIGGER_HIGHLIGHT | TRIGGER_ALERT
+# Not an action, makes the trigger ignore case
+TRIGGER_IGNORE_CASE_OPTION = "ignorecase"
+
+# An example of the format, shown when editing the triggers
+TRIGGERS_HELP = (
+    "One trigger per line. Start a line with a comma separated list of "
+    "what to do and a colon to choose, otherwise it will highlight and "
+    "alert.\n"
+    "Actions: highlight (the line), alert (in the status bar), mark (the "
+    "capture file), pause (auto scroll). Add ignorecase to ignore case.\n"
+    "Example: highlight,pause,ignorecase: guru meditation"
+)
+
+
+class Trigger:
+    """
+    A string to watch for in the data received, and what to do when it
+    shows up.
+    """
+
+    def __init__(self, pattern: str, actions: int = DEFAULT_TRIGGER_ACTIONS,
+                 ignore_case: bool = False):
+        """
+        Initialize the trigger.
+
+        :param pattern: The string to watch for, which is not empty.
+        :param actions: The TRIGGER_* flags of what to do.
+        :param ignore_case: Whether to ignore the case of ASCII letters.
+        """
+        self.pattern = pattern
+        self.actions = actions
+        self.ignore_case = ignore_case
+
+    def __repr__(self) -> str:
+        return f"Trigger({self.pattern!r}, {self.actions}, " \
+               f"{self.ignore_case})"
+
+
+def parse_triggers(text: str) -> list[Trigger]:
+    """
+    Parses triggers, one per line, like "highlight,mark: PANIC". Empty
+    lines and lines starting with "#" are skipped.
+
+    :param text: The text to parse.
+    :return: A list of Trigger. Raises ValueError for a line that can't be
+     parsed.
+    """
+    triggers = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        actions = DEFAULT_TRIGGER_ACTIONS
+        ignore_case = False
+        prefix, colon, pattern = line.partition(":")
+        options = [option.strip().lower() for option in prefix.split(",")]
+        # A line like "Error: 5" is a pattern, not a list of actions
+        if colon and all(option in TRIGGER_ACTIONS or
+                         option == TRIGGER_IGNORE_CASE_OPTION
+                         for option in options):
+            actions = 0
+            for option in options:
+                if option == TRIGGER_IGNORE_CASE_OPTION:
+                    ignore_case = True
+                else:
+                    actions |= TRIGGER_ACTIONS[option]
+            if not actions:
+                actions = DEFAULT_TRIGGER_ACTIONS
+            pattern = pattern.strip()
+            if not pattern:
+                raise ValueError(f"No string to watch for in {line!r}")
+        else:
+            pattern = line.strip()
+        triggers.append(Trigger(pattern, actions, ignore_case))
+    return triggers
+
+
+class MultiPatternMatcher:
+    """
+    An Aho-Corasick automaton that finds every occurrence of many patterns
+    in a stream in one pass. Each byte is looked at once no matter how many
+    patterns there are, and runs of bytes that can't start a pattern are
+    skipped over by a regex. Matches split across chunks are still found.
+    """
+
+    def __init__(self, patterns: list[tuple[bytes, bool]]):
+        """
+        Initialize the matcher.
+
+        :param patterns: A list of tuples of a pattern, which is not empty,
+         and whether to ignore the case of ASCII letters in it.
+        """
+        self.patterns = [pattern for pattern, _ in patterns]
+        self.ignore_case = [ignore for _, ignore in patterns]
+        # If any pattern ignores case the automaton runs over lowercased
+        # data, and patterns that don't are checked against the original
+        self.fold = any(self.ignore_case)
+        self.max_length = max(map(len, self.patterns), default=0)
+        self.delta = []
+        self.outputs = []
+        self.build()
+        starts = bytes(b for b in range(256) if self.delta[0][b] != 0)
+        self.start_regex = re.compile(b"[" + b"".join(
+            re.escape(bytes((b,))) for b in starts) + b"]") \
+            if starts else None
+        self.reset()
+
+    def build(self):
+        """
+        Builds the automaton's transition table, so every state has a next
+        state for every byte.
+        """
+        goto = [{}]
+        outputs = [[]]
+        for i, pattern in enumerate(self.patterns):
+            if self.fold:
+                pattern = pattern.lower()
+            state = 0
+            for b in pattern:
+                if b not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][b] = len(goto) - 1
+                state = goto[state][b]
+            outputs[state].append(i)
+        fail = [0] * len(goto)
+        delta = [[0] * 256 for _ in goto]
+        for b, state in goto[0].items():
+            delta[0][b] = state
+        # Breadth first, so a state's failure state is always done first
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state].extend(outputs[fail[state]])
+            row = delta[state]
+            row[:] = delta[fail[state]]
+            for b, child in goto[state].items():
+                fail[child] = delta[fail[state]][b] if state else 0
+                row[b] = child
+                queue.append(child)
+        self.delta = delta
+        self.outputs = [tuple(output) for output in outputs]
+        logger.debug(f"Built matcher with {len(delta)} states for "
+                     f"{len(self.patterns)} patterns")
+
+    def reset(self):
+        """
+        Forgets the stream so far, for when a new stream starts.
+        """
+        self.state = 0
+        self.tail = b""
+
+    def feed(self, data: bytes) -> list[tuple[int, int]]:
+        """
+        Finds the matches that end in the next chunk of the stream.
+
+        :param data: The chunk.
+        :return: A list of tuples of the index of the pattern and the offset
+         in the chunk just after where the match ends.
+        """
+        matches = []
+        if self.start_regex is None:
+            return matches
+        original = data
+        if self.fold:
+            data = data.lower()
+        delta = self.delta
+        outputs = self.outputs
+        search = self.start_regex.search
+        state = self.state
+        i = 0
+        n = len(data)
+        while i < n:
+            if state == 0:
+                # Skip ahead to the next byte that can start a pattern
+                found = search(data, i)
+                if found is None:
+                    break
+                i = found.start()
+            state = delta[state][data[i]]
+            i += 1
+            if outputs[state]:
+                for pattern in outputs[state]:
+                    matches.append((pattern, i))
+        self.state = state
+        if self.fold:
+            matches = self.check_case(original, matches)
+        return matches
+
+    def check_case(self, data: bytes,
+                   matches: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Drops the matches of patterns that don't ignore case, but only
+        matched because the data was lowercased.
+
+        :param data: The chunk, as it was received.
+        :param matches: The matches found in the lowercased chunk.
+        :return: The matches that are left.
+        """
+        window = self.tail + data
+        offset = len(self.tail)
+        kept = []
+        for pattern, end in matches:
+            if not self.ignore_case[pattern]:
+                expected = self.patterns[pattern]
+                stop = offset + end
+                if window[stop - len(expected):stop] != expected:
+                    continue
+            kept.append((pattern, end))
+        if self.max_length > 1:
+            self.tail = window[-(self.max_length - 1):]
+        return kept
+
+
+class TriggerEngine:
+    """
+    Watches the data received for triggers, and works out which line each
+    match is on, as the line's start timestamp and its position among the
+    lines that started at the same time (the same way the receive batcher
+    stamps lines).
+    """
+
+    def __init__(self, triggers: list[Trigger]):
+        """
+        Initialize the engine.
+
+        :param triggers: A list of Trigger.
+        """
+        self.triggers = triggers
+        self.matcher = MultiPatternMatcher(
+            [(trigger.pattern.encode("utf-8"), trigger.ignore_case)
+             for trigger in triggers])
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the stream so far, for when a new connection starts.
+        """
+        self.matcher.reset()
+        self.at_line_start = True
+        self.line_start_time = 0
+        self.line_start_index = 0
+
+    def feed(self, data: bytes,
+             timestamp: int) -> list[tuple[Trigger, int, int]]:
+        """
+        Finds the triggers in the next chunk of the stream, which should
+        already have its line endings translated to "\\n".
+
+        :param data: The chunk.
+        :param timestamp: When it was received, from time.monotonic_ns().
+        :return: A list of tuples of the Trigger, when its line started
+         and the index of its line among the lines that started then.
+        """
+        hits = []
+        for pattern, end in self.matcher.feed(data):
+            # A match ending in a newline is on the line the newline ends
+            newlines = data.count(b"\n", 0, max(end - 1, 0))
+            if newlines:
+                hits.append((self.triggers[pattern], timestamp,
+                             self.at_line_start + newlines - 1))
+            elif self.at_line_start:
+                hits.append((self.triggers[pattern], timestamp, 0))
+            else:
+                hits.append((self.triggers[pattern], self.line_start_time,
+                             self.line_start_index))
+        starts = self.at_line_start + data.count(b"\n")
+        self.at_line_start = data.endswith(b"\n")
+        starts -= self.at_line_start
+        if starts > 0:
+            self.line_start_time = timestamp
+            self.line_start_index = starts - 1
+        return hits
+
+
+def make_engine(triggers: list[Trigger]) -> Optional[TriggerEngine]:
+    """
+    Makes a trigger engine, if there are any triggers.
+
+    :param triggers: A list of Trigger.
+    :return: A TriggerEngine, or None if the list is empty.
+    """
+    if not triggers:
+        return None
+    return TriggerEngine(triggers)
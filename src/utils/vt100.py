@@ -0,0 +1,272 @@
+import logging
+import re
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# The operations the parser turns a stream into, each a tuple of one of
+# these and an argument. OP_TEXT has the str to write at the cursor, which
+# may contain "\n"s. OP_ERASE_LINE has 0 to erase to the end of the line, 1
+# to erase to the start of the line, or 2 to erase the whole line. The rest
+# have how many times to do it.
+OP_TEXT = 0
+OP_CARRIAGE_RETURN = 1
+OP_CURSOR_UP = 2
+OP_CURSOR_DOWN = 3
+OP_CURSOR_RIGHT = 4
+OP_CURSOR_LEFT = 5
+OP_ERASE_LINE = 6
+
+# The states of the parser, named after the ones in Paul Williams' parser
+# for DEC's VT500 series: https://vt100.net/emu/dec_ansi_parser
+STATE_GROUND = 0
+STATE_ESCAPE = 1
+STATE_ESCAPE_INTERMEDIATE = 2
+STATE_CSI_ENTRY = 3
+STATE_CSI_PARAM = 4
+STATE_CSI_INTERMEDIATE = 5
+STATE_CSI_IGNORE = 6
+# OSC, DCS, SOS, PM and APC strings, which are all skipped
+STATE_STRING = 7
+
+CSI_PARAM_REGEX = re.compile(r"[0-9:;<=>?]+")
+INTERMEDIATE_REGEX = re.compile(r"[\x20-\x2f]+")
+STRING_REGEX = re.compile(r"[^\x07\x18\x1a\x1b\x9c]+")
+# What the ground state is made of: a run of text (everything but the C0
+# controls other than tab and newline, and delete), a complete ordinary CSI
+# sequence (which is most of them) or any other single character, which
+# might start a sequence the other states have to take care of
+GROUND_TOKEN_REGEX = re.compile(
+    r"([^\x00-\x08\x0b-\x1f\x7f]+)"
+    r"|\x1b\[([0-9;:]{0,64})([\x40-\x7e])"
+    r"|(.)",
+    re.DOTALL
+)
+# Anything longer is garbage, so the sequence is ignored
+MAX_CSI_PARAM_LENGTH = 64
+
+CSI_CURSOR_OPS = {
+    "A": OP_CURSOR_UP,
+    "B": OP_CURSOR_DOWN,
+    "C": OP_CURSOR_RIGHT,
+    "D": OP_CURSOR_LEFT
+}
+CURSOR_OPS = frozenset(CSI_CURSOR_OPS.values())
+# The most a cursor can be moved by one operation, as QTextCursor takes the
+# count as a C int
+MAX_CURSOR_MOVE = 2 ** 31 - 1
+
+
+class VT100Parser:
+    """
+    An incremental parser for VT100/ANSI escape sequences. Each character
+    is looked at once, and runs of text and parameters are consumed in one
+    go, so parsing is linear in the size of the stream. Sequences split
+    across chunks are picked up where they left off.
+    """
+
+    def __init__(self):
+        """
+        Initialize the parser.
+        """
+        self.state = STATE_GROUND
+        self.params = ""
+        self.intermediates = ""
+        self.text = []
+        self.ops = []
+
+    def feed(self, data: str) -> list[tuple[int, object]]:
+        """
+        Parses the next chunk of the stream.
+
+        :param data: The chunk, already decoded.
+        :return: A list of operations, see the OP_* constants.
+        """
+        i = 0
+        n = len(data)
+        state = self.state
+        while i < n:
+            if state == STATE_GROUND:
+                # The tokens cover everything, so this runs to the end of
+                # the data unless an escape sequence needs another state
+                start = i
+                i = n
+                for token in GROUND_TOKEN_REGEX.finditer(data, start):
+                    kind = token.lastindex
+                    if kind == 1:
+                        self.text.append(token.group(1))
+                    elif kind == 3:
+                        final = token.group(3)
+                        if final != "m":
+                            self.params = token.group(2)
+                            self.intermediates = ""
+                            self.dispatch_csi(final)
+                    else:
+                        c = token.group(4)
+                        if c == "\x1b":
+                            state = STATE_ESCAPE
+                            i = token.end()
+                            break
+                        self.execute(c)
+            elif state == STATE_ESCAPE:
+                c = data[i]
+                i += 1
+                self.params = ""
+                self.intermediates = ""
+                if c == "[":
+                    state = STATE_CSI_ENTRY
+                elif c in "]PX^_":
+                    state = STATE_STRING
+                elif "\x20" <= c <= "\x2f":
+                    self.intermediates = c
+                    state = STATE_ESCAPE_INTERMEDIATE
+                elif c == "\x1b":
+                    pass
+                elif c < "\x20":
+                    self.execute(c)
+                else:
+                    # Other escape sequences (like saving the cursor) aren't
+                    # supported
+                    state = STATE_GROUND
+            elif state == STATE_ESCAPE_INTERMEDIATE:
+                run = INTERMEDIATE_REGEX.match(data, i)
+                if run is not None:
+                    i = run.end()
+                    continue
+                c = data[i]
+                i += 1
+                if c == "\x1b":
+                    state = STATE_ESCAPE
+                elif c < "\x20":
+                    self.execute(c)
+                else:
+                    state = STATE_GROUND
+            elif state in (STATE_CSI_ENTRY, STATE_CSI_PARAM):
+                run = CSI_PARAM_REGEX.match(data, i)
+                if run is not None:
+                    self.params += run.group()
+                    i = run.end()
+                    state = STATE_CSI_PARAM
+                    if len(self.params) > MAX_CSI_PARAM_LENGTH:
+                        state = STATE_CSI_IGNORE
+                    continue
+                c = data[i]
+                i += 1
+                if "\x40" <= c <= "\x7e":
+                    self.dispatch_csi(c)
+                    state = STATE_GROUND
+                elif "\x20" <= c <= "\x2f":
+                    self.intermediates += c
+                    state = STATE_CSI_INTERMEDIATE
+                elif c == "\x1b":
+                    state = STATE_ESCAPE
+                elif c < "\x20":
+                    self.execute(c)
+                else:
+                    state = STATE_CSI_IGNORE
+            elif state == STATE_CSI_INTERMEDIATE:
+                run = INTERMEDIATE_REGEX.match(data, i)
+                if run is not None:
+                    self.intermediates += run.group()
+                    i = run.end()
+                    continue
+                c = data[i]
+                i += 1
+                if "\x40" <= c <= "\x7e":
+                    self.dispatch_csi(c)
+                    state = STATE_GROUND
+                elif c == "\x1b":
+                    state = STATE_ESCAPE
+                elif c < "\x20":
+                    self.execute(c)
+                else:
+                    state = STATE_CSI_IGNORE
+            elif state == STATE_CSI_IGNORE:
+                c = data[i]
+                i += 1
+                if "\x40" <= c <= "\x7e":
+                    state = STATE_GROUND
+                elif c == "\x1b":
+                    state = STATE_ESCAPE
+                elif c < "\x20":
+                    self.execute(c)
+            elif state == STATE_STRING:
+                run = STRING_REGEX.match(data, i)
+                if run is not None:
+                    i = run.end()
+                    continue
+                c = data[i]
+                i += 1
+                # The string terminator is ESC \, which the escape state
+                # takes care of
+                state = STATE_ESCAPE if c == "\x1b" else STATE_GROUND
+        self.state = state
+        self.flush_text()
+        ops = self.ops
+        self.ops = []
+        return ops
+
+    def flush_text(self):
+        """
+        Turns the text collected so far into one operation.
+        """
+        if self.text:
+            self.ops.append((OP_TEXT, "".join(self.text)))
+            self.text.clear()
+
+    def add_op(self, op: int, arg: int):
+        """
+        Adds an operation after the text collected so far.
+
+        :param op: One of the OP_* constants.
+        :param arg: Its argument.
+        """
+        if self.text:
+            self.flush_text()
+        elif (op in CURSOR_OPS and self.ops and
+              self.ops[-1][0] == op):
+            # Runs of the same movement (like a few backspaces) are one move
+            self.ops[-1] = (op, min(self.ops[-1][1] + arg, MAX_CURSOR_MOVE))
+            return
+        self.ops.append((op, arg))
+
+    def execute(self, c: str):
+        """
+        Handles a C0 control character.
+
+        :param c: The character.
+        """
+        if c == "\r":
+            self.add_op(OP_CARRIAGE_RETURN, 1)
+        elif c == "\b":
+            self.add_op(OP_CURSOR_LEFT, 1)
+        elif c == "\n":
+            self.text.append(c)
+        # Others (like the bell) are ignored
+
+    def dispatch_csi(self, final: str):
+        """
+        Handles a complete CSI sequence, like "<Esc>[2K".
+
+        :param final: The final character of the sequence.
+        """
+        if final == "m":
+            # Colors and text styles aren't shown
+            return
+        if self.intermediates or self.params[:1] in ("<", "=", ">", "?"):
+            # Private sequences (like hiding the cursor) aren't supported
+            return
+        first = self.params.split(";", 1)[0].split(":", 1)[0]
+        if first and not first.isdigit():
+            # A private marker after the first digit (like "<Esc>[1<A") is
+            # malformed, so it is ignored like the other private sequences
+            return
+        if final in CSI_CURSOR_OPS:
+            self.add_op(CSI_CURSOR_OPS[final],
+                        min(max(int(first or 1), 1), MAX_CURSOR_MOVE))
+        elif final == "K":
+            self.add_op(OP_ERASE_LINE, int(first or 0))
+        else:
+            logger.warning(f"Received unsupported VT100 command: "
+                           f"<Esc>[{self.params}{final}")
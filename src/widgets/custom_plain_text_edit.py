@@ -1,13 +1,22 @@
 import logging
-import re
+from array import array
+from collections import deque
 from codecs import getincrementaldecoder
 from platform import system
+from time import monotonic_ns
+from typing import Optional
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QKeyEvent, QMouseEvent, QTextCursor, QFont
-from PyQt5.QtWidgets import QPlainTextEdit, QFrame
+from PyQt5.QtCore import Qt, QRect, QMimeData
+from PyQt5.QtGui import QKeyEvent, QMouseEvent, QTextCursor, QFont, \
+    QResizeEvent, QColor, QTextFormat
+from PyQt5.QtWidgets import QPlainTextEdit, QFrame, QApplication, QTextEdit
 
 from utils.logger import create_logger
+from utils.scrollback import ScrollbackSpill
+from utils.vt100 import VT100Parser, OP_TEXT, OP_CARRIAGE_RETURN, \
+    OP_CURSOR_UP, OP_CURSOR_DOWN, OP_CURSOR_RIGHT, OP_CURSOR_LEFT, \
+    OP_ERASE_LINE
+from widgets.timestamp_gutter import TimestampGutter
 
 logger = create_logger(name=__name__, level=logging.DEBUG)
 
@@ -23,6 +32,19 @@ VT100_LEFT = b"\x1B[D"
 VT100_HOME = b"\x1B[H"
 VT100_END = b"\x1B[F"
 
+# 0 means no limit
+DEFAULT_SCROLLBACK_LINES = 100000
+DEFAULT_SCROLLBACK_CHARS = 0
+# How many times a second received data is drawn, at most
+DEFAULT_RENDER_FPS = 60
+MAX_RENDER_FPS = 240
+
+# The most lines kept highlighted by triggers, the oldest are unhighlighted
+MAX_HIGHLIGHTED_LINES = 1000
+# How many of the latest lines to look through for a line to highlight
+HIGHLIGHT_SEARCH_LINES = 10000
+HIGHLIGHT_COLOR = QColor(255, 64, 64, 96)
+
 
 def get_default_font() -> QFont:
     """
@@ -56,21 +78,68 @@ class CustomPlainTextEdit(QPlainTextEdit):
         self.setUndoRedoEnabled(False)
         self.setLineWrapMode(QPlainTextEdit.NoWrap)
         self.setPlaceholderText("Not connected to a port.")
+        # When each line (block) in the document started arriving, from
+        # time.monotonic_ns()
+        self.line_timestamps = array("q")
+        self.timestamp_gutter = TimestampGutter(self)
+        self.set_show_timestamps(False)
         self.setFont(get_default_font())
         # Copied from Mu at
         # https://github.com/mu-editor/mu/blob/9bc3e5cc7a480ea6a8084ed53ac135d5dc7b7167/mu/interface/panes.py#L180
         self.device_cursor_pos = self.textCursor().position()
         self.decoder = getincrementaldecoder("utf8")("replace")
-        self.vt100_regex = re.compile(
-            r"\x1B\[(?P<count>[\d]*)(;?[\d]*)*(?P<action>[A-Za-z])"
-        )
-        self.unprocessed_input = b""
+        self.parser = VT100Parser()
+        self.scrollback_lines = DEFAULT_SCROLLBACK_LINES
+        self.scrollback_chars = DEFAULT_SCROLLBACK_CHARS
+        self.spill = ScrollbackSpill()
+        # The first line (counting the lines spilled to disk) that changed
+        # since take_changed_line() was last called, or None
+        self.first_changed_line = None
+        # Cursors at the start of the lines highlighted by triggers
+        self.highlights = deque(maxlen=MAX_HIGHLIGHTED_LINES)
+        self.search_selections = []
 
     def after_controller_initialization(self):
         """
         Stuff to run after the controller is initialized.
         """
 
+    def set_show_timestamps(self, show: bool):
+        """
+        Sets whether the timestamp gutter is shown.
+
+        :param show: Whether to show the gutter or not.
+        """
+        self.timestamp_gutter.setVisible(show)
+        self.update_gutter_geometry()
+
+    def update_gutter_geometry(self):
+        """
+        Makes room for the timestamp gutter and moves it into place.
+        """
+        if self.timestamp_gutter.isVisibleTo(self):
+            width = self.timestamp_gutter.gutter_width()
+        else:
+            width = 0
+        self.setViewportMargins(width, 0, 0, 0)
+        rect = self.contentsRect()
+        self.timestamp_gutter.setGeometry(
+            QRect(rect.left(), rect.top(), width, rect.height()))
+
+    def setFont(self, font: QFont):
+        """
+        Sets the font, for both the terminal and the timestamp gutter.
+
+        :param font: The new QFont.
+        """
+        super().setFont(font)
+        self.timestamp_gutter.setFont(font)
+        self.update_gutter_geometry()
+
+    def resizeEvent(self, e: QResizeEvent):
+        super().resizeEvent(e)
+        self.update_gutter_geometry()
+
     def keyPressEvent(self, e: QKeyEvent) -> None:
         """
         Handles the on key press event for the text edit.
@@ -213,97 +282,286 @@ class CustomPlainTextEdit(QPlainTextEdit):
         if not self.textCursor().hasSelection():
             self.sync_device_cursor_to_our_cursor()
 
-    def process_tty_data(self, data: bytes):
+    def insertFromMimeData(self, source: QMimeData):
+        """
+        Called when something is pasted or dropped. Instead of inserting it
+        locally, it's streamed to the device (which should echo it back) just
+        like a file would be, so big pastes don't overrun the device.
+        """
+        if source.hasText():
+            self.send_text(source.text())
+
+    def send_clipboard(self):
+        """
+        Streams the text on the clipboard to the device.
+        """
+        self.send_text(QApplication.clipboard().text())
+
+    def send_text(self, text: str):
+        """
+        Streams some text to the device, with every line ending sent as if
+        return was pressed.
+
+        :param text: The text to send.
+        """
+        if not text or not self.controller.model.connected:
+            return
+        text = text.replace("\r\n", "\n").replace("\n", "\r")
+        self.controller.send_stream(text.encode("utf-8"))
+
+    def process_tty_data(self, data: bytes,
+                         timestamps: Optional[array] = None):
         """
         Given some incoming bytes of data, work out how to handle / display
         them in the REPL widget.
-        If received input is incomplete, stores remainder in
-        self.unprocessed_input.
+        Escape sequences that are incomplete are picked up by the parser when
+        the rest of them arrives.
         Updates the self.device_cursor_position to match that of the device
         for every input received.
 
-        Copied from Mu at
+        Based off of Mu at
         https://github.com/mu-editor/mu/blob/9bc3e5cc7a480ea6a8084ed53ac135d5dc7b7167/mu/interface/panes.py#L360
 
         :param data: The data received.
+        :param timestamps: An array of when each line that starts in the data
+         started arriving. If not given, new lines are stamped with the
+         current time.
+        """
+        self.apply_ops(self.parser.feed(self.decoder.decode(data)),
+                       timestamps)
+
+    def apply_ops(self, ops: list[tuple[int, object]],
+                  timestamps: Optional[array] = None):
         """
-        i = 0
-        data = self.decoder.decode(data)
-        if len(self.unprocessed_input) > 0:
-            data = self.unprocessed_input + data
-            self.unprocessed_input = ""
+        Applies operations from the VT100 parser to the document, all as one
+        edit.
 
+        :param ops: A list of operations, see the OP_* constants in
+         utils/vt100.
+        :param timestamps: An array of when each line that starts in the
+         operations started arriving.
+        """
         self.sync_our_cursor_to_device_cursor()
         cursor = self.textCursor()
+        cursor.beginEditBlock()
+        # Nothing above where the cursor goes is touched
+        top = cursor.blockNumber()
+
+        for op, arg in ops:
+            if op == OP_TEXT:
+                if cursor.atEnd():
+                    # Nothing to overwrite, so it's all one edit
+                    cursor.insertText(arg)
+                    continue
+                # Overwrite the rest of the line, and put anything after a
+                # newline at the end
+                line, newline, rest = arg.partition("\n")
+                remaining = cursor.block().length() - 1 - \
+                    cursor.positionInBlock()
+                if remaining > 0:
+                    cursor.movePosition(QTextCursor.Right,
+                                        QTextCursor.KeepAnchor,
+                                        min(len(line), remaining))
+                cursor.insertText(line)
+                if newline:
+                    cursor.movePosition(QTextCursor.End)
+                    cursor.insertText(newline + rest)
+            elif op == OP_CARRIAGE_RETURN:
+                cursor.movePosition(QTextCursor.StartOfBlock)
+            elif op == OP_CURSOR_LEFT:
+                # No further than the document goes, so a huge count from
+                # the device doesn't step through it one by one
+                cursor.movePosition(QTextCursor.Left,
+                                    n=min(arg, cursor.position()))
+            elif op == OP_CURSOR_RIGHT:
+                end = self.document().characterCount() - 1
+                cursor.movePosition(QTextCursor.Right,
+                                    n=min(arg, end - cursor.position()))
+            elif op == OP_CURSOR_UP:
+                cursor.movePosition(QTextCursor.Up, n=arg)
+                top = min(top, cursor.blockNumber())
+            elif op == OP_CURSOR_DOWN:
+                cursor.movePosition(QTextCursor.Down, n=arg)
+            elif op == OP_ERASE_LINE:
+                column = cursor.positionInBlock()
+                if arg == 0:
+                    cursor.movePosition(QTextCursor.EndOfBlock,
+                                        QTextCursor.KeepAnchor)
+                    cursor.removeSelectedText()
+                elif arg == 1:
+                    # Blank out the start of the line, keeping the cursor
+                    # where it was
+                    cursor.movePosition(QTextCursor.StartOfBlock,
+                                        QTextCursor.KeepAnchor)
+                    cursor.insertText(" " * column)
+                elif arg == 2:
+                    cursor.movePosition(QTextCursor.StartOfBlock)
+                    cursor.movePosition(QTextCursor.EndOfBlock,
+                                        QTextCursor.KeepAnchor)
+                    cursor.insertText(" " * column)
+
+        self.device_cursor_pos = cursor.position()
+        cursor.endEditBlock()
+        self.setTextCursor(cursor)
+        top += self.spill.line_count
+        if self.first_changed_line is None or top < self.first_changed_line:
+            self.first_changed_line = top
+        self.stamp_new_lines(timestamps)
+        self.trim_scrollback()
 
-        while i < len(data):
-            if data[i] == "\b":
-                cursor.movePosition(QTextCursor.Left)
-                self.device_cursor_pos = cursor.position()
-            # elif data[i] == "\r":
-            #     # Carriage return. Do nothing, we handle newlines when
-            #     # reading \n
-            #     pass
-            elif data[i] == "\x1b":
-                # Escape
-                if len(data) > i + 1 and data[i + 1] == "[":
-                    # VT100 cursor detected: <Esc>[
-                    match = self.vt100_regex.search(data[i:])
-                    if match:
-                        # move to (almost) after control seq
-                        # (will ++ at end of loop)
-                        i += match.end() - 1
-                        count_string = match.group("count")
-                        count = 1 if count_string == "" else int(count_string)
-                        action = match.group("action")
-                        if action == "A":  # up
-                            cursor.movePosition(QTextCursor.Up, n=count)
-                            self.device_cursor_pos = cursor.position()
-                        elif action == "B":  # down
-                            cursor.movePosition(QTextCursor.Down, n=count)
-                            self.device_cursor_pos = cursor.position()
-                        elif action == "C":  # right
-                            cursor.movePosition(QTextCursor.Right, n=count)
-                            self.device_cursor_pos = cursor.position()
-                        elif action == "D":  # left
-                            cursor.movePosition(QTextCursor.Left, n=count)
-                            self.device_cursor_pos = cursor.position()
-                        elif action == "K":  # delete things
-                            if count_string == "":  # delete to end of line
-                                cursor.movePosition(
-                                    QTextCursor.EndOfLine,
-                                    mode=QTextCursor.KeepAnchor,
-                                )
-                                cursor.removeSelectedText()
-                                self.device_cursor_pos = cursor.position()
-                        else:
-                            # Unknown action, log warning and ignore
-                            command = match.group(0).replace("\x1B", "<Esc>")
-                            msg = "Received unsupported VT100 command: {}"
-                            logger.warning(msg.format(command))
-                    else:
-                        # Cursor detected, but no match, must be
-                        # incomplete input
-                        self.unprocessed_input = data[i:]
-                        break
-                elif len(data) == i + 1:
-                    # Escape received as end of transmission. Perhaps
-                    # the transmission is incomplete, wait until next
-                    # bytes are received to determine what to do
-                    self.unprocessed_input = data[i:]
-                    break
-            elif data[i] == "\n":
-                cursor.movePosition(QTextCursor.End)
-                self.device_cursor_pos = cursor.position() + 1
-                self.setTextCursor(cursor)
-                self.insertPlainText(data[i])
-            else:
-                # Char received, with VT100 that should be interpreted
-                # as overwrite the char in front of the cursor
-                cursor.deleteChar()
-                self.device_cursor_pos = cursor.position() + 1
-                self.insertPlainText(data[i])
-            self.setTextCursor(cursor)
-            i += 1
-        # # Scroll textarea if necessary to see cursor
-        # self.ensureCursorVisible()
+    def stamp_new_lines(self, timestamps: Optional[array]):
+        """
+        Gives the lines that were added to the document a timestamp.
+
+        A line that was just started with a newline doesn't have any text
+        yet, so it gets its timestamp from the data its text comes in.
+
+        :param timestamps: An array of line start timestamps, or None to
+         use the current time.
+        """
+        missing = self.blockCount() - len(self.line_timestamps)
+        if self.document().lastBlock().length() <= 1:
+            # The last line is empty, wait for its text
+            missing -= 1
+        if missing <= 0:
+            return
+        if timestamps is None:
+            timestamps = array("q", (monotonic_ns(),))
+        new = timestamps[:missing]
+        if len(new) < missing:
+            # Lines moved around by escape sequences can throw the count
+            # off, so reuse the latest time we know of
+            latest = new[-1] if new else monotonic_ns()
+            new.extend(array("q", (latest,)) * (missing - len(new)))
+        self.line_timestamps.extend(new)
+
+    def trim_scrollback(self):
+        """
+        Trims the oldest lines off the document if it is over the scrollback
+        limits, and spills them to disk. The document is allowed to grow
+        10% over the limit before it is trimmed, so that lines are trimmed in
+        bulk and not one at a time.
+        """
+        doc = self.document()
+        excess = 0
+        if self.scrollback_lines > 0:
+            over = doc.blockCount() - self.scrollback_lines
+            if over > self.scrollback_lines // 10:
+                excess = over
+        if self.scrollback_chars > 0:
+            over = doc.characterCount() - self.scrollback_chars
+            if over > self.scrollback_chars // 10:
+                excess = max(excess, doc.findBlock(over).blockNumber())
+        if excess <= 0:
+            return
+        end = doc.findBlockByNumber(excess).position()
+        cursor = QTextCursor(doc)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        self.spill.append(cursor.selection().toPlainText())
+        highlights = len(self.highlights)
+        while self.highlights and self.highlights[0].position() < end:
+            self.highlights.popleft()
+        cursor.removeSelectedText()
+        if len(self.highlights) != highlights:
+            self.update_extra_selections()
+        del self.line_timestamps[:excess]
+        self.device_cursor_pos = max(self.device_cursor_pos - end, 0)
+        # Happens every frame once the scrollback is full
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Trimmed {excess} lines off the scrollback")
+
+    def highlight_line(self, timestamp: int, index: int) -> bool:
+        """
+        Highlights a line, found by when it started arriving.
+
+        :param timestamp: When the line started arriving.
+        :param index: Which of the lines that started arriving then it is.
+        :return: Whether the line was found. It might not have been drawn
+         yet, or might have been trimmed already.
+        """
+        stamps = self.line_timestamps
+        start = max(len(stamps) - HIGHLIGHT_SEARCH_LINES, 0)
+        try:
+            number = start + stamps[start:].index(timestamp) + index
+        except ValueError:
+            return False
+        if number >= len(stamps) or stamps[number] != timestamp:
+            return False
+        block = self.document().findBlockByNumber(number)
+        self.highlights.append(QTextCursor(block))
+        self.update_extra_selections()
+        return True
+
+    def set_search_selections(self, selections: list):
+        """
+        Sets the extra selections that show a search match.
+
+        :param selections: A list of QTextEdit.ExtraSelection.
+        """
+        self.search_selections = selections
+        self.update_extra_selections()
+
+    def update_extra_selections(self):
+        """
+        Shows the lines highlighted by triggers and the search match.
+        """
+        selections = []
+        for cursor in self.highlights:
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setBackground(HIGHLIGHT_COLOR)
+            selection.format.setProperty(QTextFormat.FullWidthSelection, True)
+            selection.cursor = cursor
+            selections.append(selection)
+        self.setExtraSelections(selections + self.search_selections)
+
+    def line_count(self) -> int:
+        """
+        Returns how many lines there are in this session, counting the ones
+        spilled to disk.
+
+        :return: An int.
+        """
+        return self.spill.line_count + self.blockCount()
+
+    def take_changed_line(self) -> Optional[int]:
+        """
+        Returns the first line that changed since this was last called, and
+        starts tracking changes again.
+
+        :return: A line number counting the lines spilled to disk, or None
+         if nothing changed.
+        """
+        line = self.first_changed_line
+        self.first_changed_line = None
+        return line
+
+    def lines_from(self, line: int) -> tuple[int, list[str]]:
+        """
+        Returns the text of the lines in the document from a line on.
+
+        :param line: A line number counting the lines spilled to disk.
+        :return: A tuple of the line number of the first line returned (which
+         is later than asked for if the line was spilled) and a list of str.
+        """
+        first = max(line, self.spill.line_count)
+        number = first - self.spill.line_count
+        if number == 0:
+            return first, self.toPlainText().split("\n")
+        lines = []
+        block = self.document().findBlockByNumber(number)
+        while block.isValid():
+            lines.append(block.text())
+            block = block.next()
+        return first, lines
+
+    def export_scrollback(self, path: str):
+        """
+        Writes the whole history of this session (the lines spilled to disk
+        and everything still in the document) to a file.
+
+        :param path: The path of the file to write to.
+        """
+        logger.debug(f"Exporting scrollback to {path}")
+        with open(path, "wb") as file:
+            self.spill.export(file)
+            file.write(self.toPlainText().encode("utf-8"))
@@ -0,0 +1,153 @@
+import logging
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QPaintEvent, QResizeEvent, QFont
+from PyQt5.QtWidgets import QAbstractScrollArea, QFrame
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+HEX_DUMP_BYTES_PER_ROW = 16
+# 0 means no limit
+DEFAULT_HEX_DUMP_MAX_BYTES = 16 * 1024 * 1024
+
+# Maps every byte that isn't printable ASCII to a "."
+ASCII_TABLE = bytes(b if 0x20 <= b < 0x7F else ord(".") for b in range(256))
+
+
+class HexDumpView(QAbstractScrollArea):
+    """
+    A view that shows the bytes received as a hex dump. The bytes are kept
+    in one compact buffer, and only the rows visible in the viewport are
+    ever formatted, so scrolling through lots of data stays smooth.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.setObjectName("hex_dump_view")
+        self.setFrameShape(QFrame.NoFrame)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.data = bytearray()
+        # How many bytes have been trimmed off the front, so the offsets
+        # shown stay the same as the data is trimmed
+        self.trimmed = 0
+        self.max_bytes = DEFAULT_HEX_DUMP_MAX_BYTES
+        self.auto_scroll = True
+
+    def setFont(self, font: QFont):
+        """
+        Sets the font, and updates the scroll bar to the new row height.
+
+        :param font: The new QFont.
+        """
+        super().setFont(font)
+        self.viewport().setFont(font)
+        self.update_scroll_bar()
+        self.viewport().update()
+
+    def row_height(self) -> int:
+        """
+        Returns the height of one row in pixels.
+
+        :return: An int.
+        """
+        return self.fontMetrics().lineSpacing()
+
+    def row_count(self) -> int:
+        """
+        Returns the number of rows in the dump.
+
+        :return: An int.
+        """
+        return -(-len(self.data) // HEX_DUMP_BYTES_PER_ROW)
+
+    def visible_row_count(self) -> int:
+        """
+        Returns how many rows fit in the viewport.
+
+        :return: An int.
+        """
+        return max(self.viewport().height() // self.row_height(), 1)
+
+    def update_scroll_bar(self):
+        """
+        Updates the range of the scroll bar to the number of rows.
+        """
+        bar = self.verticalScrollBar()
+        visible = self.visible_row_count()
+        bar.setPageStep(visible)
+        bar.setRange(0, max(self.row_count() - visible, 0))
+
+    def append(self, data: bytes):
+        """
+        Adds some bytes to the end of the dump.
+
+        :param data: A bytes-like object.
+        """
+        self.data += data
+        if 0 < self.max_bytes < len(self.data):
+            # Trim whole rows, and only once 10% over so it's done in bulk
+            over = len(self.data) - self.max_bytes
+            if over > self.max_bytes // 10:
+                over -= over % HEX_DUMP_BYTES_PER_ROW
+                del self.data[:over]
+                self.trimmed += over
+        bar = self.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum()
+        self.update_scroll_bar()
+        if self.auto_scroll and at_bottom:
+            bar.setValue(bar.maximum())
+        self.viewport().update()
+
+    def clear(self):
+        """
+        Removes all the bytes in the dump.
+        """
+        self.data.clear()
+        self.trimmed = 0
+        self.update_scroll_bar()
+        self.viewport().update()
+
+    def format_rows(self, first: int, last: int) -> list[str]:
+        """
+        Formats some rows of the dump, each like
+        "00000010  48 65 6c 6c 6f 0a ...  Hello.". The bytes for all the rows
+        are converted to hex and ASCII in one go, and then sliced into rows.
+
+        :param first: The first row number.
+        :param last: The row number after the last row.
+        :return: A list of str.
+        """
+        per_row = HEX_DUMP_BYTES_PER_ROW
+        start = first * per_row
+        region = bytes(self.data[start:last * per_row])
+        hex_all = region.hex(" ")
+        ascii_all = region.translate(ASCII_TABLE).decode("ascii")
+        width = per_row * 3 - 1
+        rows = []
+        for i in range(last - first):
+            hex_part = hex_all[i * per_row * 3:i * per_row * 3 + width]
+            ascii_part = ascii_all[i * per_row:(i + 1) * per_row]
+            offset = self.trimmed + start + i * per_row
+            rows.append(f"{offset:08x}  {hex_part.ljust(width)}  "
+                        f"{ascii_part}")
+        return rows
+
+    def resizeEvent(self, e: QResizeEvent):
+        super().resizeEvent(e)
+        self.update_scroll_bar()
+
+    def paintEvent(self, e: QPaintEvent):
+        """
+        Paints the rows that are visible.
+        """
+        painter = QPainter(self.viewport())
+        height = self.row_height()
+        ascent = self.fontMetrics().ascent()
+        first = self.verticalScrollBar().value()
+        last = min(first + self.visible_row_count() + 1, self.row_count())
+        painter.setPen(self.palette().text().color())
+        for i, text in enumerate(self.format_rows(first, last)):
+            painter.drawText(4, i * height + ascent, text)
+        painter.end()
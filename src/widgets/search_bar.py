@@ -0,0 +1,430 @@
+import logging
+import re
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QKeyEvent, QTextCursor, QTextCharFormat, QFont
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QLineEdit, QCheckBox, \
+    QPushButton, QLabel, QPlainTextEdit, QFrame, QTextEdit
+
+from utils.logger import create_logger
+from utils.search import SearchWorker, SearchRequest, make_pattern
+from widgets.custom_plain_text_edit import CustomPlainTextEdit
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# How long to wait after the last keystroke before searching, in ms
+SEARCH_DEBOUNCE_MS = 150
+# How often to search the lines that changed as data streams in, in ms
+SEARCH_UPDATE_INTERVAL_MS = 250
+
+
+class SearchBar(QWidget):
+    """
+    A bar to find text (or a regular expression) in the whole session,
+    including the lines spilled to disk, and jump between the matches or
+    show only the matching lines. The searching happens on a SearchWorker
+    thread, which only searches the lines that changed as data arrives.
+    """
+
+    # Emitted on the worker thread, see SearchWorker
+    results_ready = pyqtSignal(object)
+    # Emitted when filter mode is turned on or off
+    filter_toggled = pyqtSignal(bool)
+
+    def __init__(self, text_edit: CustomPlainTextEdit):
+        """
+        Initialize the search bar.
+
+        :param text_edit: The terminal to search.
+        """
+        super().__init__()
+        self.setObjectName("search_bar")
+        self.text_edit = text_edit
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Find")
+        self.query_edit.setClearButtonEnabled(True)
+        self.regex_check_box = QCheckBox("Rege&x")
+        self.case_check_box = QCheckBox("Match ca&se")
+        self.filter_check_box = QCheckBox("Fil&ter")
+        self.filter_check_box.setToolTip("Show only the matching lines.")
+        self.previous_button = QPushButton("P&revious")
+        self.next_button = QPushButton("&Next")
+        self.status_label = QLabel()
+        self.close_button = QPushButton("Close")
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(4, 2, 4, 2)
+        for widget in (self.query_edit, self.regex_check_box,
+                       self.case_check_box, self.filter_check_box,
+                       self.previous_button, self.next_button,
+                       self.status_label):
+            layout.addWidget(widget)
+        layout.addStretch()
+        layout.addWidget(self.close_button)
+        # Shows only the matching lines, one per match
+        self.filter_view = QPlainTextEdit()
+        self.filter_view.setObjectName("filter_view")
+        self.filter_view.setReadOnly(True)
+        self.filter_view.setUndoRedoEnabled(False)
+        self.filter_view.setFrameShape(QFrame.NoFrame)
+        self.filter_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.filter_view.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+
+        self.worker = SearchWorker(self.results_ready.emit)
+        self.worker.start()
+        self.generation = 0
+        # The query searched for, as a tuple of the text, whether it is a
+        # regex and whether to match case, or None
+        self.query = None
+        self.highlight_pattern = None
+        self.searching = False
+        self.complete = False
+        # The matching line numbers, counting the lines spilled to disk
+        self.matches = array("q")
+        self.current = None
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(SEARCH_UPDATE_INTERVAL_MS)
+        self.connect_signals()
+
+    def connect_signals(self):
+        """
+        Connects the signals and slots together.
+        """
+        self.results_ready.connect(self.on_results)
+        self.query_edit.textChanged.connect(
+            lambda: self.debounce_timer.start())
+        self.query_edit.returnPressed.connect(self.find_next)
+        self.regex_check_box.toggled.connect(lambda: self.start_search())
+        self.case_check_box.toggled.connect(lambda: self.start_search())
+        self.filter_check_box.toggled.connect(self.set_filter)
+        self.previous_button.clicked.connect(self.find_previous)
+        self.next_button.clicked.connect(self.find_next)
+        self.close_button.clicked.connect(self.hide)
+        self.debounce_timer.timeout.connect(lambda: self.start_search())
+        self.update_timer.timeout.connect(self.update_search)
+
+    def open(self):
+        """
+        Shows the search bar and focuses it.
+        """
+        self.show()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+        self.start_search()
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self.update_timer.start()
+
+    def hideEvent(self, e):
+        super().hideEvent(e)
+        self.update_timer.stop()
+        # Nothing is searched while hidden, so start over when shown again
+        self.generation += 1
+        self.worker.cancel()
+        self.searching = False
+        self.complete = False
+        self.current = None
+        self.text_edit.set_search_selections([])
+        if self.filter_check_box.isChecked():
+            self.filter_check_box.blockSignals(True)
+            self.filter_check_box.setChecked(False)
+            self.filter_check_box.blockSignals(False)
+            self.filter_view.clear()
+            self.filter_toggled.emit(False)
+        self.text_edit.setFocus()
+
+    def keyPressEvent(self, e: QKeyEvent):
+        if e.key() == Qt.Key_Escape:
+            self.hide()
+        elif e.key() in (Qt.Key_Return, Qt.Key_Enter) and \
+                e.modifiers() & Qt.ShiftModifier:
+            self.find_previous()
+        else:
+            super().keyPressEvent(e)
+
+    def close_worker(self):
+        """
+        Stops the worker thread, for when the session is closed.
+        """
+        self.worker.stop()
+
+    def filtering(self) -> bool:
+        """
+        Returns whether only the matching lines are being shown.
+
+        :return: A bool.
+        """
+        return self.isVisible() and self.filter_check_box.isChecked()
+
+    def holding_scroll(self) -> bool:
+        """
+        Returns whether the terminal is showing a match, so it shouldn't be
+        scrolled to the cursor as data arrives.
+
+        :return: A bool.
+        """
+        return self.isVisible() and self.current is not None and \
+            not self.filtering()
+
+    def set_filter(self, do: bool):
+        """
+        Turns filter mode on or off.
+
+        :param do: Whether to show only the matching lines.
+        """
+        logger.debug(f"Set search filter to {do}")
+        self.filter_view.clear()
+        # The text of the matches is only collected while filtering
+        self.start_search(refine=False)
+        self.filter_toggled.emit(do)
+
+    def start_search(self, refine: bool = True):
+        """
+        Starts a new search for what is in the search bar.
+
+        :param refine: Whether the search can just narrow down the last
+         search's matches, if the query allows it.
+        """
+        self.debounce_timer.stop()
+        text = self.query_edit.text()
+        query = (text, self.regex_check_box.isChecked(),
+                 self.case_check_box.isChecked())
+        last_query = self.query
+        last_complete = self.complete and not self.searching
+        self.generation += 1
+        self.query = None
+        self.matches = array("q")
+        self.current = None
+        self.complete = False
+        self.searching = False
+        self.filter_view.clear()
+        self.text_edit.set_search_selections([])
+        if not text:
+            self.worker.cancel()
+            self.status_label.clear()
+            return
+        try:
+            pattern = make_pattern(*query)
+            self.highlight_pattern = make_pattern(*query, binary=False)
+        except re.error as e:
+            self.worker.cancel()
+            logger.debug(f"Invalid search regex {text!r}: {e}")
+            self.status_label.setText(f"Invalid regex: {e}")
+            return
+        self.query = query
+        refine_below = 0
+        if refine and last_complete and \
+                can_refine(last_query, query):
+            changed = self.text_edit.first_changed_line
+            refine_below = self.text_edit.line_count() if changed is None \
+                else changed
+        self.text_edit.take_changed_line()
+        logger.debug(f"Searching for {query} (generation {self.generation}, "
+                     f"refining below line {refine_below})")
+        self.send_request(pattern, 0, refine_below)
+        self.status_label.setText("Searching...")
+
+    def update_search(self):
+        """
+        Searches the lines that changed since the last results, if the last
+        search is done.
+        """
+        if self.query is None or self.searching or not self.complete:
+            return
+        line = self.text_edit.take_changed_line()
+        if line is None:
+            return
+        self.send_request(make_pattern(*self.query), line, 0)
+
+    def send_request(self, pattern: re.Pattern, from_line: int,
+                     refine_below: int):
+        """
+        Snapshots the lines to search and hands them to the worker.
+
+        :param pattern: The pattern from make_pattern().
+        :param from_line: The first line that needs searching.
+        :param refine_below: See SearchRequest.
+        """
+        doc_first, doc_lines = self.text_edit.lines_from(from_line)
+        self.searching = True
+        self.worker.search(SearchRequest(
+            self.generation, pattern, self.filter_check_box.isChecked(),
+            from_line, refine_below, self.text_edit.spill, doc_first,
+            doc_lines))
+
+    def on_results(self, results: tuple):
+        """
+        Callback when the worker has results.
+
+        :param results: See SearchWorker.
+        """
+        generation, from_line, found, texts = results
+        if generation != self.generation:
+            return
+        self.searching = False
+        self.complete = True
+        keep = bisect_left(self.matches, from_line)
+        del self.matches[keep:]
+        self.matches.extend(found)
+        if self.current is not None and self.current >= len(self.matches):
+            self.current = None
+        if texts is not None:
+            self.replace_filter_lines(keep, texts)
+        self.update_status()
+
+    def replace_filter_lines(self, keep: int, texts: list[str]):
+        """
+        Replaces the lines in the filter view after the first few.
+
+        :param keep: How many lines to keep.
+        :param texts: The lines to put after them.
+        """
+        bar = self.filter_view.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum()
+        doc = self.filter_view.document()
+        cursor = QTextCursor(doc)
+        if keep > 0:
+            cursor.setPosition(doc.findBlockByNumber(keep - 1).position())
+            cursor.movePosition(QTextCursor.EndOfBlock)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.beginEditBlock()
+        cursor.removeSelectedText()
+        if texts:
+            cursor.insertText(("\n" if keep > 0 else "") + "\n".join(texts))
+        cursor.endEditBlock()
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
+    def update_status(self):
+        """
+        Shows how many matches there are, and which one is current.
+        """
+        count = len(self.matches)
+        if count == 0:
+            self.status_label.setText("No matches")
+            return
+        text = f"{count} match{'es' if count != 1 else ''}"
+        if self.current is not None:
+            text = f"{self.current + 1} of {count}"
+        spilled = bisect_left(self.matches, self.text_edit.spill.line_count)
+        if spilled and not self.filtering():
+            text += f" ({spilled} in trimmed history, shown when filtering)"
+        self.status_label.setText(text)
+
+    def find_next(self):
+        """
+        Jumps to the next match.
+        """
+        self.jump(1)
+
+    def find_previous(self):
+        """
+        Jumps to the previous match.
+        """
+        self.jump(-1)
+
+    def jump(self, step: int):
+        """
+        Jumps to the next or previous match, wrapping around.
+
+        :param step: 1 for the next match, -1 for the previous one.
+        """
+        if self.debounce_timer.isActive():
+            self.start_search()
+        # Matches that were trimmed off the terminal are only in the filter
+        # view
+        first = 0 if self.filtering() else \
+            bisect_left(self.matches, self.text_edit.spill.line_count)
+        count = len(self.matches) - first
+        if count <= 0:
+            return
+        if self.current is None or self.current < first:
+            if self.filtering():
+                line = self.filter_view.firstVisibleBlock().blockNumber()
+                index = line if step > 0 else line - 1
+            else:
+                line = self.text_edit.spill.line_count + \
+                    self.text_edit.firstVisibleBlock().blockNumber()
+                index = bisect_left(self.matches, line)
+                if step < 0:
+                    index -= 1
+        else:
+            index = self.current + step
+        self.current = first + (index - first) % count
+        self.show_match(self.current)
+        self.update_status()
+
+    def show_match(self, index: int):
+        """
+        Scrolls to a match and highlights it.
+
+        :param index: The index of the match.
+        """
+        if self.filtering():
+            block = self.filter_view.document().findBlockByNumber(index)
+            cursor = QTextCursor(block)
+            cursor.movePosition(QTextCursor.EndOfBlock,
+                                QTextCursor.KeepAnchor)
+            self.filter_view.setTextCursor(cursor)
+            self.filter_view.centerCursor()
+            return
+        number = self.matches[index] - self.text_edit.spill.line_count
+        block = self.text_edit.document().findBlockByNumber(number)
+        selections = []
+        for match in self.highlight_pattern.finditer(block.text()):
+            if match.end() == match.start():
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.format = self.highlight_format()
+            selection.cursor = QTextCursor(block)
+            selection.cursor.setPosition(block.position() + match.start())
+            selection.cursor.setPosition(block.position() + match.end(),
+                                         QTextCursor.KeepAnchor)
+            selections.append(selection)
+        line = QTextEdit.ExtraSelection()
+        line.format.setBackground(
+            self.palette().alternateBase().color())
+        line.format.setProperty(QTextCharFormat.FullWidthSelection, True)
+        line.cursor = QTextCursor(block)
+        self.text_edit.set_search_selections([line] + selections)
+        # Without line wrap the scroll bar counts lines
+        visible = self.text_edit.viewport().height() // \
+            self.text_edit.fontMetrics().lineSpacing()
+        self.text_edit.verticalScrollBar().setValue(
+            max(number - visible // 2, 0))
+
+    def highlight_format(self) -> QTextCharFormat:
+        """
+        Returns how to highlight the text that matched.
+
+        :return: A QTextCharFormat.
+        """
+        fmt = QTextCharFormat()
+        fmt.setBackground(self.palette().highlight())
+        fmt.setForeground(self.palette().highlightedText())
+        fmt.setFontWeight(QFont.Bold)
+        return fmt
+
+
+def can_refine(last: Optional[tuple], query: tuple) -> bool:
+    """
+    Returns whether the matches of one query are sure to include all the
+    matches of another, so only they need to be checked.
+
+    :param last: The last query, a tuple of the text, whether it is a regex
+     and whether to match case, or None.
+    :param query: The new query.
+    :return: A bool.
+    """
+    if last is None or last[1] or query[1] or last[2] != query[2]:
+        return False
+    if query[2]:
+        return last[0] in query[0]
+    # Only ASCII letters ignore case in the patterns the worker uses
+    return last[0].encode("utf-8").lower() in query[0].encode("utf-8").lower()
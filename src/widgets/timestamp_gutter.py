@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+from time import time_ns, monotonic_ns
+
+from PyQt5.QtCore import Qt, QRect, QSize
+from PyQt5.QtGui import QPainter, QPaintEvent
+from PyQt5.QtWidgets import QWidget, QPlainTextEdit
+
+from utils.logger import create_logger
+
+logger = create_logger(name=__name__, level=logging.DEBUG)
+
+# Add this to a time.monotonic_ns() timestamp to get nanoseconds since the
+# epoch
+MONOTONIC_TO_EPOCH_NS = time_ns() - monotonic_ns()
+
+
+def format_timestamp(timestamp: int) -> str:
+    """
+    Formats a time.monotonic_ns() timestamp as the local wall clock time.
+
+    :param timestamp: The timestamp in nanoseconds.
+    :return: A str, like "13:37:00.123456".
+    """
+    ns = timestamp + MONOTONIC_TO_EPOCH_NS
+    return datetime.fromtimestamp(ns / 1_000_000_000).strftime("%H:%M:%S.%f")
+
+
+class TimestampGutter(QWidget):
+    """
+    A gutter on the left side of the terminal that shows when each line
+    started arriving. Only the lines that are visible are ever painted.
+
+    Based off of Qt's code editor example:
+    https://doc.qt.io/qt-5/qtwidgets-widgets-codeeditor-example.html
+    """
+
+    def __init__(self, editor: QPlainTextEdit):
+        """
+        Initialize the gutter.
+
+        :param editor: The CustomPlainTextEdit to show the timestamps of.
+        """
+        super().__init__(editor)
+        self.editor = editor
+        editor.updateRequest.connect(self.on_update_request)
+
+    def gutter_width(self) -> int:
+        """
+        Returns the width the gutter needs, in pixels.
+
+        :return: An int.
+        """
+        return self.fontMetrics().horizontalAdvance("00:00:00.000000") + 8
+
+    def sizeHint(self) -> QSize:
+        return QSize(self.gutter_width(), 0)
+
+    def on_update_request(self, rect: QRect, dy: int):
+        """
+        Scrolls or repaints the gutter along with the editor.
+
+        :param rect: The area of the editor that needs an update.
+        :param dy: How many pixels the editor scrolled by.
+        """
+        if not self.isVisible():
+            return
+        if dy != 0:
+            self.scroll(0, dy)
+        else:
+            self.update(0, rect.y(), self.width(), rect.height())
+
+    def paintEvent(self, e: QPaintEvent):
+        """
+        Paints the timestamps of the visible lines.
+        """
+        painter = QPainter(self)
+        painter.fillRect(e.rect(), self.palette().window())
+        painter.setPen(self.palette().text().color())
+        timestamps = self.editor.line_timestamps
+        block = self.editor.firstVisibleBlock()
+        offset = self.editor.contentOffset()
+        height = self.fontMetrics().height()
+        bottom = e.rect().bottom()
+        while block.isValid():
+            top = self.editor.blockBoundingGeometry(block).translated(
+                offset).top()
+            if top > bottom:
+                break
+            number = block.blockNumber()
+            if block.isVisible() and number < len(timestamps):
+                painter.drawText(0, int(top), self.width() - 4, height,
+                                 Qt.AlignRight | Qt.AlignVCenter,
+                                 format_timestamp(timestamps[number]))
+            block = block.next()
+        painter.end()